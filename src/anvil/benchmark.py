@@ -0,0 +1,696 @@
+'''
+Throughput benchmarks of the event core.
+
+Each workload reports events per second, nanoseconds per event and the
+peak memory allocated while it runs. Results are saved as JSON and can be
+compared against a stored baseline to catch regressions:
+
+    python -m anvil.benchmark --output bench.json
+    python -m anvil.benchmark --baseline bench.json --tolerance 0.1
+
+Timings are the best of several repeats. Peak memory is measured in a
+separate pass under tracemalloc, since tracing slows allocation heavy code
+down and would distort the timings.
+'''
+import argparse
+from datetime import datetime, timedelta
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+from time import perf_counter_ns
+import tracemalloc
+from typing import Callable, NamedTuple, Sequence
+
+import numpy as np
+
+from anvil.clock import SimulationClock
+from anvil.core import Execution, MbteProcessor, Portfolio, Strategy
+from anvil.event_processing import (
+    ArrayEventStore,
+    EventProcessor,
+    EventSequencer,
+    EventStore,
+    MbtePriorityQueue,
+)
+from anvil.events import (
+    Event,
+    FillEvent,
+    InternalSchedulingEvent,
+    MarketCloseEvent,
+    MarketSliceEvent,
+    OrderEvent,
+    SignalEvent,
+)
+from anvil.execution import ExecutionSimulator
+from anvil.partition import run_partitioned
+from anvil.portfolio import ArrayPortfolio
+from anvil.routing import Subscription, SubscriptionRouter
+from anvil.synthetic import GBMStore
+
+logger = logging.getLogger(__name__)
+
+RESULT_FORMAT = 'anvil-benchmark'
+RESULT_VERSION = 1
+DEFAULT_EVENTS = 200_000
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.1
+START = np.datetime64('2025-12-24T09:30', 'ns')
+
+# prepares the inputs of one repeat and returns the timed callable, which
+# returns the number of events it processed
+Workload = Callable[[int], Callable[[], int]]
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    events: int
+    seconds: float
+    events_per_sec: float
+    ns_per_event: float
+    peak_memory_bytes: int
+
+
+class Comparison(NamedTuple):
+    name: str
+    baseline_events_per_sec: float
+    events_per_sec: float
+    change: float
+    regressed: bool
+
+
+##################### workloads #####################
+
+def synthetic_stores(
+        n_stores: int,
+        n_events: int,
+        seed: int = 0,
+) -> list[ArrayEventStore]:
+    '''
+    n_stores stores of random walk close prices, n_events in total, with
+    random gaps so the stores interleave in the merge
+    '''
+    rng = np.random.default_rng(seed)
+    per_store = max(n_events // n_stores, 1)
+    stores = []
+    for i in range(n_stores):
+        gaps = rng.integers(1, 1_000_000, size=per_store)
+        stores.append(ArrayEventStore.from_columns(
+            f'store-{i}',
+            timestamps=START + np.cumsum(gaps).astype('timedelta64[ns]'),
+            symbols=[f'S{i}'] * per_store,
+            prices=100.0 + np.cumsum(rng.standard_normal(per_store)),
+            volumes=np.ones(per_store),
+        ))
+    return stores
+
+
+class _CountingProcessor(EventProcessor):
+    def __init__(self):
+        self.count = 0
+
+    def process(self, event: Event) -> None:
+        self.count += 1
+
+
+class _SliceCountingProcessor(EventProcessor):
+    '''
+    Counts market events, whether delivered one by one or in slices
+    '''
+    def __init__(self):
+        self.count = 0
+
+    def process(self, event: Event) -> None:
+        self.count += len(event) if isinstance(event, MarketSliceEvent) else 1
+
+
+class _SchedulingProcessor(EventProcessor):
+    '''
+    Schedules a timer a little after every market event and cancels every
+    cancel_every-th one, the pattern of a strategy managing order timeouts
+    '''
+    def __init__(self, sequencer: EventSequencer, cancel_every: int | None = None):
+        self._sequencer = sequencer
+        self._cancel_every = cancel_every
+        self._scheduled = 0
+        self.count = 0
+
+    def process(self, event: Event) -> None:
+        self.count += 1
+        if isinstance(event, InternalSchedulingEvent):
+            return
+        schedule_id = self._sequencer.schedule(InternalSchedulingEvent(
+            timestamp=event.timestamp + timedelta(milliseconds=5),
+            symbol=event.symbol,
+        ))
+        self._scheduled += 1
+        if self._cancel_every is not None and self._scheduled % self._cancel_every == 0:
+            self._sequencer.cancel(schedule_id)
+
+
+class _AlwaysLongStrategy(Strategy):
+    def on_event(self, event: Event) -> SignalEvent | None:
+        if not isinstance(event, MarketCloseEvent):
+            return None
+        return SignalEvent(timestamp=event.timestamp, symbol=event.symbol, value=1.0)
+
+
+class _PerSymbolLongStrategy(_AlwaysLongStrategy):
+    def symbol_independent(self) -> bool:
+        return True
+
+
+def _partitioned_components() -> tuple[Strategy, Portfolio, Execution]:
+    # module level, so that the workers of a partitioned run can unpickle it
+    return _PerSymbolLongStrategy(), ArrayPortfolio(initial_capital=1e6), ExecutionSimulator()
+
+
+class _PassThroughPortfolio(Portfolio):
+    def on_signal(self, signal: SignalEvent) -> OrderEvent | None:
+        return OrderEvent(
+            timestamp=signal.timestamp,
+            symbol=signal.symbol,
+            price=None,
+            qty=1,
+        )
+
+    def on_fill(self, fill: FillEvent) -> OrderEvent | None:
+        return None
+
+
+class _CountingExecution(Execution):
+    def __init__(self):
+        self.count = 0
+
+    def receive(self, order: OrderEvent) -> None:
+        self.count += 1
+
+
+def _queue_workload(size: int | None) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        # without a size all events go through one queue
+        queue_size = n_events if size is None else size
+        rng = np.random.default_rng(queue_size)
+        keys = rng.integers(0, 1 << 40, size=queue_size).tolist()
+        rounds = max(n_events // queue_size, 1)
+
+        def run() -> int:
+            for _ in range(rounds):
+                queue = MbtePriorityQueue[int, None]()
+                for key in keys:
+                    queue.add(key, None)
+                while queue.pop() is not None:
+                    pass
+            return rounds * queue_size
+        return run
+    return prepare
+
+
+def _merge_workload(n_stores: int, time_ns: bool = False) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        stores = synthetic_stores(n_stores, n_events)
+        processor = _CountingProcessor()
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=stores,  # type: ignore
+            time_ns=time_ns,
+        )
+        sequencer.set_processor(processor)
+
+        def run() -> int:
+            sequencer.run()
+            return processor.count
+        return run
+    return prepare
+
+
+def _synthetic_workload() -> Workload:
+    '''
+    A GBM path generated in blocks while the sequencer drains it
+    '''
+    def prepare(n_events: int) -> Callable[[], int]:
+        store = GBMStore(n_events, seed=0, start=datetime(2025, 12, 24))
+        processor = _CountingProcessor()
+        sequencer = EventSequencer(SimulationClock(datetime(2025, 12, 24)), [store])
+        sequencer.set_processor(processor)
+
+        def run() -> int:
+            sequencer.run()
+            return processor.count
+        return run
+    return prepare
+
+
+def _scheduling_workload(
+        cancel_every: int | None,
+        timer_resolution: timedelta | None = None,
+) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        # every market event schedules a timer, so halve the market data
+        stores = synthetic_stores(10, n_events // 2)
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=stores,  # type: ignore
+            timer_resolution=timer_resolution,
+        )
+        processor = _SchedulingProcessor(sequencer, cancel_every)
+        sequencer.set_processor(processor)
+
+        def run() -> int:
+            sequencer.run()
+            return processor.count
+        return run
+    return prepare
+
+
+def _queued_workload(timer_resolution: timedelta | None = None) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        # everything is queued before the run, so the peak memory over 
+        # n_events is the footprint of a queued event
+        timestamps = [datetime(2025, 12, 24) + timedelta(microseconds=i) for i in range(n_events)]
+        symbols = [f'S{i}' for i in range(100)]
+        processor = _CountingProcessor()
+
+        def run() -> int:
+            sequencer = EventSequencer(
+                sim_clock=SimulationClock(datetime(2025, 12, 24)),
+                event_stores=[],
+                timer_resolution=timer_resolution,
+            )
+            sequencer.set_processor(processor)
+            for i in range(n_events - 1, -1, -1):
+                sequencer.schedule(InternalSchedulingEvent(timestamps[i], symbols[i % 100]))
+            sequencer.run()
+            return n_events
+        return run
+    return prepare
+
+
+def _cross_section_workload(n_symbols: int, slices: bool) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        # one store holding a bar of every symbol at each timestamp
+        n_bars = max(n_events // n_symbols, 1)
+        n = n_bars * n_symbols
+        rng = np.random.default_rng(n_symbols)
+        store = ArrayEventStore.from_columns(
+            'universe',
+            timestamps=np.repeat(START + np.arange(n_bars) * np.timedelta64(1, 'D'), n_symbols),
+            symbols=np.tile(np.array([f'S{i}' for i in range(n_symbols)]), n_bars),
+            prices=100.0 + rng.standard_normal(n),
+            volumes=np.ones(n),
+        )
+        processor = _SliceCountingProcessor()
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=[store],
+            slices=slices,
+        )
+        sequencer.set_processor(processor)
+
+        def run() -> int:
+            sequencer.run()
+            return processor.count
+        return run
+    return prepare
+
+
+def _portfolio_workload(n_symbols: int) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        n_bars = max(n_events // n_symbols, 1)
+        symbols = np.array([f'S{i}' for i in range(n_symbols)])
+        rng = np.random.default_rng(n_symbols)
+        prices = 100.0 + rng.standard_normal((n_bars, n_symbols))
+        timestamp = datetime(2025, 12, 24)
+        bars = [
+            MarketSliceEvent.from_arrays(
+                timestamp, symbols, prices[i], np.ones(n_symbols), np.ones(n_symbols, dtype=np.int8),
+            )
+            for i in range(n_bars)
+        ]
+
+        def run() -> int:
+            portfolio = ArrayPortfolio(capacity=n_symbols)
+            for i, symbol in enumerate(symbols.tolist()):
+                portfolio.on_fill(FillEvent(timestamp, symbol, 100.0, 1 + i % 10))
+            for bar in bars:
+                portfolio.on_market(bar)
+                portfolio.equity()
+            return n_bars * n_symbols
+        return run
+    return prepare
+
+
+def _rebalance_workload(n_symbols: int) -> Workload:
+    '''
+    Orders for every name on every slice, all filled in bulk at the next one
+    '''
+    def prepare(n_events: int) -> Callable[[], int]:
+        n_bars = max(n_events // n_symbols, 2)
+        symbols = np.array([f'S{i}' for i in range(n_symbols)], dtype=object)
+        rng = np.random.default_rng(n_symbols)
+        prices = 100.0 + rng.standard_normal((n_bars, n_symbols))
+        start = datetime(2025, 12, 24)
+        bars = [
+            MarketSliceEvent.from_arrays(
+                start + timedelta(minutes=i), symbols, prices[i],
+                np.ones(n_symbols), np.ones(n_symbols, dtype=np.int8),
+            )
+            for i in range(n_bars)
+        ]
+        sides = np.where(rng.random((n_bars, n_symbols)) < 0.5, -1.0, 1.0).tolist()
+
+        def run() -> int:
+            execution = ExecutionSimulator()
+            fills = 0
+            for bar, bar_sides in zip(bars, sides):
+                fills += len(execution.on_market(bar))
+                for symbol, side in zip(bar.symbols.tolist(), bar_sides):
+                    execution.receive(OrderEvent(bar.timestamp, symbol, None, side)) # type: ignore
+            return fills + execution.pending()
+        return run
+    return prepare
+
+
+class _FewSymbolsStrategy(Strategy):
+    '''
+    Trades a handful of names of a large feed, checking the symbol itself
+    when events are broadcast to it
+    '''
+    def __init__(self, symbols: Sequence[str]):
+        self._symbols = frozenset(symbols)
+
+    def subscription(self) -> Subscription:
+        return Subscription.of(MarketCloseEvent, symbols=self._symbols)
+
+    def on_event(self, event: Event) -> SignalEvent | None:
+        if event.symbol not in self._symbols:
+            return None
+        return SignalEvent(timestamp=event.timestamp, symbol=event.symbol, value=1.0)
+
+
+def _routing_workload(n_symbols: int, n_subscribed: int, mode: str) -> Workload:
+    '''
+    mode is 'broadcast' for every event reaching the strategy, 'routed' 
+    for a SubscriptionRouter in front of it and 'selected' for the router
+    also pruning the store
+    '''
+    def prepare(n_events: int) -> Callable[[], int]:
+        n_bars = max(n_events // n_symbols, 1)
+        n = n_bars * n_symbols
+        store = ArrayEventStore.from_columns(
+            'universe',
+            timestamps=np.repeat(START + np.arange(n_bars) * np.timedelta64(1, 'D'), n_symbols),
+            symbols=np.tile(np.array([f'S{i}' for i in range(n_symbols)]), n_bars),
+            prices=np.full(n, 100.0),
+            volumes=np.ones(n),
+        )
+        processor: EventProcessor = MbteProcessor(
+            _FewSymbolsStrategy([f'S{i}' for i in range(n_subscribed)]),
+            _PassThroughPortfolio(),
+            _CountingExecution(),
+        )
+        stores: list[EventStore] = [store]
+        if mode != 'broadcast':
+            router = SubscriptionRouter()
+            router.subscribe(processor)
+            processor = router
+            if mode == 'selected':
+                stores = router.select(stores)
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=stores,
+        )
+        sequencer.set_processor(processor)
+
+        def run() -> int:
+            sequencer.run()
+            return n
+        return run
+    return prepare
+
+
+def _end_to_end_workload(n_stores: int) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        stores = synthetic_stores(n_stores, n_events)
+        execution = _CountingExecution()
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=stores,  # type: ignore
+        )
+        sequencer.set_processor(MbteProcessor(
+            _AlwaysLongStrategy(),
+            _PassThroughPortfolio(),
+            execution,
+        ))
+
+        def run() -> int:
+            sequencer.run()
+            return execution.count
+        return run
+    return prepare
+
+
+def _partitioned_workload(n_symbols: int, n_shards: int) -> Workload:
+    def prepare(n_events: int) -> Callable[[], int]:
+        # scaling over shards needs as many cores, compare with 1 shard
+        n_bars = max(n_events // n_symbols, 1)
+        symbols = [f'S{i}' for i in range(n_symbols)]
+        store = ArrayEventStore.from_columns(
+            'universe',
+            timestamps=np.repeat(START + np.arange(n_bars) * np.timedelta64(1, 'D'), n_symbols),
+            symbols=np.tile(np.array(symbols), n_bars),
+            prices=100.0 + np.random.default_rng(n_symbols).standard_normal(n_bars * n_symbols),
+            volumes=np.ones(n_bars * n_symbols),
+        )
+
+        def run() -> int:
+            run_partitioned(_partitioned_components, [store], symbols, 1e6, n_shards=n_shards)
+            return n_bars * n_symbols
+        return run
+    return prepare
+
+
+WORKLOADS: dict[str, Workload] = {
+    'queue_add_pop_100': _queue_workload(100),
+    'queue_add_pop_10k': _queue_workload(10_000),
+    'queue_add_pop_all': _queue_workload(None),
+    'merge_1_store': _merge_workload(1),
+    'merge_10_stores': _merge_workload(10),
+    'merge_1000_stores': _merge_workload(1000),
+    'merge_1000_stores_ns': _merge_workload(1000, time_ns=True),
+    'merge_synthetic_gbm': _synthetic_workload(),
+    'schedule_heavy': _scheduling_workload(None),
+    'schedule_heavy_timers': _scheduling_workload(None, timedelta(milliseconds=1)),
+    'cancel_heavy': _scheduling_workload(2),
+    'cancel_heavy_timers': _scheduling_workload(2, timedelta(milliseconds=1)),
+    'queued_scheduled': _queued_workload(),
+    'queued_scheduled_timers': _queued_workload(timedelta(milliseconds=1)),
+    'cross_section_3000_events': _cross_section_workload(3000, slices=False),
+    'cross_section_3000_slices': _cross_section_workload(3000, slices=True),
+    'portfolio_mark_5000_symbols': _portfolio_workload(5000),
+    'rebalance_3000_symbols': _rebalance_workload(3000),
+    'route_5_of_3000_broadcast': _routing_workload(3000, 5, 'broadcast'),
+    'route_5_of_3000_routed': _routing_workload(3000, 5, 'routed'),
+    'route_5_of_3000_selected': _routing_workload(3000, 5, 'selected'),
+    'end_to_end_1_store': _end_to_end_workload(1),
+    'end_to_end_10_stores': _end_to_end_workload(10),
+    'partitioned_1000_symbols_1_shard': _partitioned_workload(1000, 1),
+    'partitioned_1000_symbols_4_shards': _partitioned_workload(1000, 4),
+}
+
+
+##################### running #####################
+
+def run_benchmark(
+        name: str,
+        workload: Workload,
+        n_events: int = DEFAULT_EVENTS,
+        repeat: int = DEFAULT_REPEAT,
+) -> BenchmarkResult:
+    '''
+    Best of repeat timed runs, each on freshly prepared inputs, followed by
+    one traced run for the peak memory
+    '''
+    best_ns = None
+    events = 0
+    for _ in range(max(repeat, 1)):
+        run = workload(n_events)
+        gc.collect()
+        start = perf_counter_ns()
+        events = run()
+        elapsed_ns = perf_counter_ns() - start
+        if best_ns is None or elapsed_ns < best_ns:
+            best_ns = elapsed_ns
+
+    run = workload(n_events)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = max(best_ns, 1) / 1e9 # type: ignore
+    return BenchmarkResult(
+        name=name,
+        events=events,
+        seconds=seconds,
+        events_per_sec=events / seconds,
+        ns_per_event=seconds * 1e9 / events if events else 0.0,
+        peak_memory_bytes=peak,
+    )
+
+
+def run_benchmarks(
+        names: Sequence[str] | None = None,
+        n_events: int = DEFAULT_EVENTS,
+        repeat: int = DEFAULT_REPEAT,
+        progress: Callable[[BenchmarkResult], None] | None = None,
+) -> list[BenchmarkResult]:
+    '''
+    Run the named workloads, all of WORKLOADS by default, in order
+    '''
+    if names is None:
+        names = list(WORKLOADS)
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        raise ValueError(f'unknown benchmarks: {", ".join(unknown)}')
+
+    results = []
+    for name in names:
+        result = run_benchmark(name, WORKLOADS[name], n_events, repeat)
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    return results
+
+
+##################### results #####################
+
+def save_results(path: str | os.PathLike, results: Sequence[BenchmarkResult]) -> None:
+    document = {
+        'format': RESULT_FORMAT,
+        'version': RESULT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': [result._asdict() for result in results],
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+
+
+def load_results(path: str | os.PathLike) -> list[BenchmarkResult]:
+    with open(path) as f:
+        document = json.load(f)
+    if document.get('format') != RESULT_FORMAT or document.get('version') != RESULT_VERSION:
+        raise ValueError(f'unsupported benchmark result format in {os.fspath(path)}')
+    return [BenchmarkResult(**result) for result in document['results']]
+
+
+def compare(
+        results: Sequence[BenchmarkResult],
+        baseline: Sequence[BenchmarkResult],
+        tolerance: float = DEFAULT_TOLERANCE,
+) -> list[Comparison]:
+    '''
+    Relative throughput change of every benchmark present in both, flagged
+    as regressed when it dropped by more than tolerance
+    '''
+    by_name = {result.name: result for result in baseline}
+    comparisons = []
+    for result in results:
+        base = by_name.get(result.name)
+        if base is None:
+            continue
+        change = result.events_per_sec / base.events_per_sec - 1.0
+        comparisons.append(Comparison(
+            name=result.name,
+            baseline_events_per_sec=base.events_per_sec,
+            events_per_sec=result.events_per_sec,
+            change=change,
+            regressed=change < -tolerance,
+        ))
+    return comparisons
+
+
+def format_results(results: Sequence[BenchmarkResult]) -> str:
+    lines = [
+        f'{"benchmark":<30}{"events":>12}{"events/sec":>14}{"ns/event":>12}'
+        f'{"peak MiB":>12}{"B/event":>10}'
+    ]
+    for r in results:
+        lines.append(
+            f'{r.name:<30}{r.events:>12}{r.events_per_sec:>14,.0f}'
+            f'{r.ns_per_event:>12.0f}{r.peak_memory_bytes / 2**20:>12.2f}'
+            f'{r.peak_memory_bytes / max(r.events, 1):>10.0f}'
+        )
+    return '\n'.join(lines)
+
+
+def format_comparison(comparisons: Sequence[Comparison]) -> str:
+    lines = [f'{"benchmark":<30}{"baseline/sec":>14}{"events/sec":>14}{"change":>10}']
+    for c in comparisons:
+        flag = '  REGRESSED' if c.regressed else ''
+        lines.append(
+            f'{c.name:<30}{c.baseline_events_per_sec:>14,.0f}'
+            f'{c.events_per_sec:>14,.0f}{c.change:>+10.1%}{flag}'
+        )
+    return '\n'.join(lines)
+
+
+##################### command line #####################
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m anvil.benchmark',
+        description='Throughput benchmarks of the anvil event core',
+    )
+    parser.add_argument('benchmarks', nargs='*', help='benchmarks to run, all by default')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    parser.add_argument('--events', type=int, default=DEFAULT_EVENTS, help='events per benchmark')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timed runs, the best is kept')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='relative throughput drop flagged as a regression',
+    )
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(WORKLOADS))
+        return 0
+
+    results = run_benchmarks(
+        args.benchmarks or None,
+        n_events=args.events,
+        repeat=args.repeat,
+        progress=lambda r: print(f'{r.name}: {r.events_per_sec:,.0f} events/sec', file=sys.stderr),
+    )
+    print(format_results(results))
+    if args.output:
+        save_results(args.output, results)
+
+    if args.baseline:
+        comparisons = compare(results, load_results(args.baseline), args.tolerance)
+        print()
+        print(format_comparison(comparisons))
+        if any(c.regressed for c in comparisons):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,360 @@
+'''
+On-disk cache of backtest results.
+
+Results are content addressed: the key is a hash of the market data, the
+configuration of the run and the code version, so a cached result is only
+reused when all three are unchanged, and stale entries are never looked up
+again rather than invalidated. Entries are compressed .npz files holding
+the scalar metrics as JSON and the arrays, e.g. the equity curve, as is.
+
+    cache = ResultCache('~/.cache/anvil', max_bytes=2 << 30)
+    key = make_key(store.fingerprint(), params, code_version(MyStrategy))
+    entry = cache.get_or_compute(key, lambda: run_backtest(store, params))
+
+Several processes can share a directory: entries are written to a
+temporary file and renamed into place, so readers see whole entries or
+none, and the least recently used entries are evicted under a file lock
+once the directory grows past max_bytes. CachedBacktest wraps a sweep
+backtest function so that unchanged cells of a sweep come from the cache.
+'''
+from contextlib import contextmanager
+import dataclasses
+import hashlib
+import inspect
+import io
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, Callable, Iterator, Mapping, NamedTuple
+import weakref
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover - not available on Windows
+    fcntl = None # type: ignore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+# array name of the JSON encoded metrics inside an entry
+_METRICS = '__metrics__'
+_LOCK_FILE = '.lock'
+_SUFFIX = '.npz'
+
+
+class CacheEntry(NamedTuple):
+    metrics: dict[str, Any]
+    arrays: dict[str, np.ndarray]
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+
+
+def fingerprint_arrays(arrays: Mapping[str, np.ndarray]) -> str:
+    '''
+    Hex digest of named arrays, covering names, dtypes, shapes and values
+    '''
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f'{name}\0{array.dtype.str}\0{array.shape}\0'.encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def config_fingerprint(config: Any) -> str:
+    '''
+    Hex digest of a run configuration made of mappings, sequences, named
+    tuples, dataclasses, scalars and arrays. Mapping order does not matter.
+    '''
+    text = json.dumps(_canonical(config), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def code_version(*objects: Any) -> str:
+    '''
+    Hex digest of the anvil sources and of the source of the given objects,
+    e.g. the Strategy classes or the backtest function of a run
+    '''
+    digest = hashlib.sha256()
+    package = Path(__file__).parent
+    for path in sorted(package.rglob('*.py')):
+        digest.update(path.relative_to(package).as_posix().encode())
+        digest.update(path.read_bytes())
+    for obj in objects:
+        try:
+            source = inspect.getsource(obj)
+        except (OSError, TypeError):
+            # e.g. defined interactively, fall back to its name
+            source = f'{getattr(obj, "__module__", "")}.{getattr(obj, "__qualname__", repr(obj))}'
+        digest.update(source.encode())
+    return digest.hexdigest()
+
+
+def make_key(data_fingerprint: str, config: Any, code: str) -> str:
+    digest = hashlib.sha256()
+    for part in (data_fingerprint, config_fingerprint(config), code):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    '''
+    Size bounded LRU cache of results in a directory, safe to share between
+    processes. Recency is the modification time of an entry, refreshed on
+    every hit, so it is shared by all the processes using the directory.
+    '''
+    def __init__(self, directory: str | os.PathLike, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 1:
+            raise ValueError(f'max_bytes must be positive, got {max_bytes}')
+        self._directory = Path(directory).expanduser()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def directory(self) -> Path:
+        return self._directory
+
+    def stats(self) -> CacheStats:
+        '''
+        Counts of this instance, not of the other processes
+        '''
+        return CacheStats(self._hits, self._misses, self._evictions)
+
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def get(self, key: str) -> CacheEntry | None:
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except FileNotFoundError:
+            self._misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process since, the result read is still good
+            pass
+        self._hits += 1
+        metrics = json.loads(arrays.pop(_METRICS).tobytes().decode())
+        return CacheEntry(metrics, arrays)
+
+    def put(
+            self,
+            key: str,
+            metrics: Mapping[str, Any],
+            arrays: Mapping[str, np.ndarray] | None = None,
+    ) -> None:
+        '''
+        Store the JSON serializable metrics and the arrays of a result under
+        key, replacing any previous entry
+        '''
+        arrays = dict(arrays or {})
+        if _METRICS in arrays:
+            raise ValueError(f'array name {_METRICS} is reserved')
+        text = json.dumps(_canonical(dict(metrics)))
+        arrays[_METRICS] = np.frombuffer(text.encode(), dtype=np.uint8)
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(buffer.getbuffer())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> CacheEntry:
+        '''
+        The cached entry of key, or the result of compute() after storing
+        it. The result is split into metrics and arrays like in
+        CachedBacktest.
+        '''
+        entry = self.get(key)
+        if entry is None:
+            entry = split_result(compute())
+            self.put(key, entry.metrics, entry.arrays)
+        return entry
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def clear(self) -> None:
+        with self._lock():
+            for path, _, _ in self._entries():
+                path.unlink(missing_ok=True)
+
+    def _path(self, key: str) -> Path:
+        if len(key) < 3 or not key.isalnum():
+            raise ValueError(f'invalid cache key {key!r}')
+        return self._directory / key[:2] / (key + _SUFFIX)
+
+    def _entries(self) -> Iterator[tuple[Path, float, int]]:
+        for path in self._directory.glob(f'*/*{_SUFFIX}'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_mtime, stat.st_size
+
+    def _evict(self) -> None:
+        with self._lock():
+            entries = list(self._entries())
+            total = sum(size for _, _, size in entries)
+            if total <= self._max_bytes:
+                return
+            entries.sort(key=lambda entry: entry[1])
+            for path, _, size in entries:
+                if total <= self._max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                self._evictions += 1
+            logger.debug(
+                'evicted cache entries',
+                extra={'directory': str(self._directory), 'size': total},
+            )
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self._directory / _LOCK_FILE, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CachedBacktest(object):
+    '''
+    Wraps a sweep backtest function, see anvil.sweep.run_sweep, so that its
+    results are read from and stored to a ResultCache in directory. The key
+    covers the parameters, the shared data and the code version, which is
+    computed once from the anvil sources and the backtest function unless
+    given. Picklable as long as backtest is.
+
+    Returns a dict of the scalar metrics and the arrays of the result.
+    '''
+    def __init__(
+            self,
+            backtest: Callable[[Mapping[str, Any], Mapping[str, np.ndarray]], Any],
+            directory: str | os.PathLike,
+            max_bytes: int = DEFAULT_MAX_BYTES,
+            code: str | None = None,
+            data_fingerprint: str | None = None,
+    ):
+        self._backtest = backtest
+        self._directory = os.fspath(directory)
+        self._max_bytes = max_bytes
+        self._code = code if code is not None else code_version(backtest)
+        self._data_fingerprint = data_fingerprint
+        self._cache: ResultCache | None = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        # every process opens its own cache
+        return {**self.__dict__, '_cache': None}
+
+    def cache(self) -> ResultCache:
+        if self._cache is None:
+            self._cache = ResultCache(self._directory, self._max_bytes)
+        return self._cache
+
+    def __call__(self, params: Mapping[str, Any], data: Mapping[str, np.ndarray]) -> dict[str, Any]:
+        data_fingerprint = self._data_fingerprint or _data_fingerprint(data)
+        key = make_key(data_fingerprint, dict(params), self._code)
+        entry = self.cache().get_or_compute(key, lambda: self._backtest(params, data))
+        return {**entry.metrics, **entry.arrays}
+
+
+def split_result(result: Any) -> CacheEntry:
+    '''
+    Split a result, a mapping or a named tuple such as Metrics or
+    VectorizedResult, into JSON serializable metrics and arrays. Nested
+    named tuples are flattened into it.
+    '''
+    if hasattr(result, '_asdict'):
+        result = result._asdict()
+    metrics: dict[str, Any] = {}
+    arrays: dict[str, np.ndarray] = {}
+    for name, value in dict(result).items():
+        if isinstance(value, np.ndarray):
+            arrays[name] = value
+        elif hasattr(value, '_asdict') or isinstance(value, Mapping):
+            nested = split_result(value)
+            metrics.update(nested.metrics)
+            arrays.update(nested.arrays)
+        else:
+            metrics[name] = _canonical(value)
+    return CacheEntry(metrics, arrays)
+
+
+# digests of read-only arrays by id, sweep workers call a CachedBacktest
+# with the same shared arrays for every run. An entry goes away with its
+# array. Writable arrays can change in place and are hashed on every call.
+_readonly_fingerprints: dict[int, tuple[weakref.ref, str]] = {}
+
+
+def _data_fingerprint(data: Mapping[str, np.ndarray]) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(data):
+        array = data[name]
+        readonly = isinstance(array, np.ndarray) and not array.flags.writeable
+        if not readonly:
+            # made writable again, its digest may go stale
+            _readonly_fingerprints.pop(id(array), None)
+        cached = _readonly_fingerprints.get(id(array)) if readonly else None
+        if cached is not None and cached[0]() is array:
+            fingerprint = cached[1]
+        else:
+            fingerprint = fingerprint_arrays({'': array})
+            if readonly:
+                key = id(array)
+                ref = weakref.ref(array, lambda _, key=key: _readonly_fingerprints.pop(key, None))
+                _readonly_fingerprints[key] = (ref, fingerprint)
+        digest.update(f'{name}\0{fingerprint}\0'.encode())
+    return digest.hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    '''
+    JSON compatible form of a configuration or metric value
+    '''
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return _canonical(value.item())
+    if isinstance(value, np.ndarray):
+        return {'__array__': fingerprint_arrays({'': value})}
+    if hasattr(value, '_asdict'):
+        return _canonical(value._asdict())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {
+            '__type__': type(value).__qualname__,
+            **_canonical(dataclasses.asdict(value)),
+        }
+    if isinstance(value, Mapping):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    raise TypeError(f'cannot fingerprint {type(value).__name__} value {value!r}')
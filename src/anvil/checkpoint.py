@@ -0,0 +1,122 @@
+'''
+Checkpoint and restore of a simulation.
+
+A Checkpointer snapshots an EventSequencer (clock, queues, scheduled
+items, counters and store cursors, see EventSequencer.get_state()) together
+with the state of any registered component into compressed bytes. The
+bytes can be restored into a sequencer and components built the same way,
+to resume a failed run, or restored several times to fork what-if branches
+off one warmed-up state:
+
+    checkpointer = Checkpointer(sequencer)
+    checkpointer.register('strategy', strategy)
+    checkpointer.register('portfolio', portfolio)
+    sequencer.run_until(warmup_end)
+    checkpointer.save('warm.ckpt')
+    # or every n events of a long run
+    while sequencer.run_for(n):
+        checkpointer.save('run.ckpt')
+    ...
+    checkpointer.load('warm.ckpt')
+    sequencer.run()
+
+Events of scheduled items and component states are pickled, so they must
+be picklable and their classes importable when restoring. Only restore
+checkpoints from trusted sources.
+'''
+from abc import ABC, abstractmethod
+import os
+import pickle
+import tempfile
+from typing import Any
+import zlib
+
+from anvil.event_processing import EventSequencer
+
+MAGIC = b'ANVILCKP'
+# 2: one-off scheduled entries are the bare event and their schedule id is
+# the sequence number of the queue entry
+FORMAT_VERSION = 2
+
+
+class Stateful(ABC):
+    '''
+    A component that can be checkpointed. get_state() returns picklable
+    data and set_state() restores it on an instance built the same way.
+    '''
+    @abstractmethod
+    def get_state(self) -> Any:
+        pass
+
+    @abstractmethod
+    def set_state(self, state: Any) -> None:
+        pass
+
+
+class Checkpointer(object):
+    '''
+    Snapshots and restores an EventSequencer and the registered components.
+    Components only need get_state()/set_state(), subclassing Stateful is
+    optional.
+    '''
+    def __init__(self, sequencer: EventSequencer, compression_level: int = 6):
+        self._sequencer = sequencer
+        self._compression_level = compression_level
+        self._components: dict[str, Stateful] = {}
+
+    def register(self, name: str, component: Stateful) -> None:
+        if name in self._components:
+            raise ValueError(f'component {name} is already registered')
+        if not callable(getattr(component, 'get_state', None)) or \
+                not callable(getattr(component, 'set_state', None)):
+            raise TypeError(f'component {name} has no get_state()/set_state()')
+        self._components[name] = component
+
+    def snapshot(self) -> bytes:
+        state = {
+            'sequencer': self._sequencer.get_state(),
+            'components': {
+                name: component.get_state()
+                for name, component in self._components.items()
+            },
+        }
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        return MAGIC + bytes([FORMAT_VERSION]) + zlib.compress(payload, self._compression_level)
+
+    def restore(self, data: bytes) -> None:
+        header = len(MAGIC) + 1
+        if len(data) < header or data[:len(MAGIC)] != MAGIC:
+            raise ValueError('not an anvil checkpoint')
+        if data[len(MAGIC)] != FORMAT_VERSION:
+            raise ValueError(f'unsupported checkpoint version {data[len(MAGIC)]}')
+        try:
+            payload = zlib.decompress(data[header:])
+        except zlib.error as e:
+            raise ValueError('truncated or corrupt checkpoint') from e
+        state = pickle.loads(payload)
+
+        missing = self._components.keys() - state['components'].keys()
+        if missing:
+            raise ValueError(f'checkpoint has no state for {", ".join(sorted(missing))}')
+        self._sequencer.set_state(state['sequencer'])
+        for name, component in self._components.items():
+            component.set_state(state['components'][name])
+
+    def save(self, path: str | os.PathLike) -> None:
+        '''
+        Write a snapshot to path, atomically replacing any previous one
+        '''
+        path = os.fspath(path)
+        data = self.snapshot()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, path: str | os.PathLike) -> None:
+        with open(path, 'rb') as f:
+            self.restore(f.read())
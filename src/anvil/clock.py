@@ -1,16 +1,83 @@
 '''
 Clock for simulation owns the current time of the system.
 '''
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+# naive UTC epoch used for integer nanosecond timestamps
+EPOCH = datetime(1970, 1, 1)
+NANOS_PER_SECOND = 1_000_000_000
+
+
+def datetime_to_ns(t: datetime) -> int:
+    '''
+    Convert a datetime into integer nanoseconds since the epoch. Naive
+    datetimes are taken as UTC, aware ones are converted to UTC first.
+    '''
+    if t.tzinfo is not None:
+        t = t.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = t - EPOCH
+    return (
+        (delta.days * 86400 + delta.seconds) * NANOS_PER_SECOND
+        + delta.microseconds * 1000
+    )
+
+
+def ns_to_datetime(ns: int) -> datetime:
+    '''
+    Convert integer nanoseconds since the epoch into a naive UTC datetime.
+    datetime only has microsecond resolution, so sub-microsecond digits are
+    truncated.
+    '''
+    return EPOCH + timedelta(microseconds=ns // 1000)
+
 
 class SimulationClock(object):
-    def __init__(self, init_time: datetime):
-        self._time = init_time
+    '''
+    The current time is kept either as a datetime or as int epoch 
+    nanoseconds, whichever was set last, and the other representation is
+    derived lazily. An int init_time starts the clock in nanoseconds. 
+    
+    Simulations keyed by nanoseconds should use set_time_ns()/now_ns() on 
+    the hot path, which only compare ints and keep sub-microsecond 
+    resolution; now() still returns a datetime for strategy code.
+    '''
+    def __init__(self, init_time: datetime | int):
+        self._time: datetime | None = None
+        self._time_ns: int | None = None
+        if isinstance(init_time, datetime):
+            self._time = init_time
+        else:
+            self._time_ns = int(init_time)
 
     def set_time(self, new_time: datetime):
-        if new_time > self._time:
+        if new_time > self.now():
             self._time = new_time
+            self._time_ns = None
 
-    def now(self):
+    def now(self) -> datetime:
+        if self._time is None:
+            self._time = ns_to_datetime(self._time_ns) # type: ignore
         return self._time
-    
+
+    def set_time_ns(self, new_time_ns: int):
+        time_ns = self._time_ns
+        if time_ns is None:
+            time_ns = self.now_ns()
+        if new_time_ns > time_ns:
+            self._time_ns = new_time_ns
+            self._time = None
+
+    def now_ns(self) -> int:
+        if self._time_ns is None:
+            self._time_ns = datetime_to_ns(self._time) # type: ignore
+        return self._time_ns
+
+    def get_state(self) -> tuple[datetime | None, int | None]:
+        return self._time, self._time_ns
+
+    def set_state(self, state: tuple[datetime | None, int | None]):
+        '''
+        Restore a get_state() result, unlike set_time() this can move the
+        clock backwards
+        '''
+        self._time, self._time_ns = state
@@ -1,19 +1,47 @@
 
 
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Sequence
 from anvil.event_processing import EventProcessor
-from anvil.events import Event, FillEvent, OrderEvent, SignalEvent
+from anvil.events import (
+    MARKET_EVENT_TYPES,
+    Event,
+    FillEvent,
+    MarketSliceEvent,
+    OrderEvent,
+    SignalEvent,
+)
+from anvil.routing import Subscription
+
+if TYPE_CHECKING:
+    from anvil.instrumentation import Instrumentation
 
 
 class Strategy(ABC):
     '''
     The role of a strategy is to process external events and produces a
-    trading signal that can be actioned by the portfolio
+    trading signal that can be actioned by the portfolio. A strategy that
+    receives MarketSliceEvents can return one signal per name in the slice.
     '''
     @abstractmethod
-    def on_event(self, event: Event) -> SignalEvent | None:
+    def on_event(self, event: Event) -> SignalEvent | Sequence[SignalEvent] | None:
         pass
 
+    def subscription(self) -> Subscription:
+        '''
+        The events this strategy wants when run behind a
+        SubscriptionRouter, every event by default
+        '''
+        return Subscription()
+
+    def symbol_independent(self) -> bool:
+        '''
+        Whether the signals of each symbol depend only on the events of 
+        that symbol, which lets anvil.partition run the universe in shards
+        of symbols. False by default.
+        '''
+        return False
+
 
 class Portfolio(ABC):
     @abstractmethod
@@ -24,34 +52,77 @@ class Portfolio(ABC):
     def on_fill(self, fill: FillEvent) -> OrderEvent | None:
         pass
 
+    def on_market(self, event: Event) -> None:
+        '''
+        Market event or slice, after the fills it triggered, to mark 
+        positions. Does nothing by default.
+        '''
+        pass
+
 
 class Execution(ABC):
     @abstractmethod
     def receive(self, order: OrderEvent) -> None:
         pass
 
+    def on_market(self, event: Event) -> Sequence[FillEvent]:
+        '''
+        Market event or slice, before the strategy sees it. Returns the 
+        fills of pending orders it triggered, none by default.
+        '''
+        return ()
+
+
+# events that reach Execution.on_market() and Portfolio.on_market()
+_MARKET_EVENT_TYPES = MARKET_EVENT_TYPES + (MarketSliceEvent,)
+
 
 class MbteProcessor(EventProcessor):
+    '''
+    Runs the Strategy -> Portfolio -> Execution chain. A market event first
+    goes to the execution, whose fills are applied to the portfolio before
+    the portfolio is marked and the strategy sees the event, so an order
+    placed on one bar fills on a later one.
+    '''
     def __init__(
             self, 
             strategy: Strategy, 
             portfolio: Portfolio, 
             execution: Execution,
+            instrumentation: 'Instrumentation | None' = None,
     ):
+        if instrumentation is not None:
+            # time each stage of the chain through proxies
+            strategy = instrumentation.wrap_strategy(strategy)
+            portfolio = instrumentation.wrap_portfolio(portfolio)
+            execution = instrumentation.wrap_execution(execution)
         self._strategy = strategy
         self._portfolio = portfolio
         self._execution = execution
 
+    def subscription(self) -> Subscription:
+        return self._strategy.subscription()
+
     def process(self, event: Event) -> None:
-        # process the event to generate signal
-        signal = self._strategy.on_event(event)
-        if signal is None:
-            return
-        
-        # process the signal event
-        order = self._portfolio.on_signal(signal)
-        if order is None:
+        if isinstance(event, _MARKET_EVENT_TYPES):
+            for fill in self._execution.on_market(event):
+                order = self._portfolio.on_fill(fill)
+                if order is not None:
+                    self._execution.receive(order)
+            self._portfolio.on_market(event)
+
+        # process the event to generate signals
+        signals = self._strategy.on_event(event)
+        if signals is None:
             return
+        if isinstance(signals, SignalEvent):
+            signals = (signals,)
+
+        for signal in signals:
+            # process the signal event
+            order = self._portfolio.on_signal(signal)
+            if order is None:
+                continue
 
-        # trade the order out        
-        self._execution.receive(order)
+            # trade the order out
+            self._execution.receive(order)
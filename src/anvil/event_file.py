@@ -0,0 +1,282 @@
+'''
+On-disk columnar event format read through numpy.memmap.
+
+An event file is a directory holding one raw little-endian file per column
+plus a small JSON header:
+
+    meta.json       {"format": "anvil-events", "version": 1, "count": n,
+                     "symbols": [...], "index_stride": s}
+    timestamp.i8    int64 nanoseconds since the epoch, non-decreasing
+    symbol_id.i4    int32 index into meta["symbols"]
+    price.f8        float64
+    volume.f8       float64
+    kind.i1         int8 index into ArrayEventStore.EVENT_TYPES
+    index.i8        sparse timestamp index, timestamp of every s-th row
+
+meta.json is written last by EventFileWriter.close(), so a directory
+without it is an incomplete write and is rejected by the reader.
+
+Columns are mapped read-only, so pages are loaded on demand and several
+backtest processes reading the same file share the OS page cache instead
+of each holding a private copy. Time range selection only touches the
+sparse index and one index block of the timestamp column per bound, and
+the resulting store works on views of the mapped columns without copying.
+'''
+from datetime import datetime
+import json
+import os
+from typing import Sequence
+
+import numpy as np
+
+from anvil.clock import datetime_to_ns
+from anvil.event_processing import ArrayEventStore, to_ns_array
+
+FORMAT_NAME = 'anvil-events'
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.i8'
+DEFAULT_INDEX_STRIDE = 4096
+
+# column name -> (file name, little-endian dtype)
+COLUMNS: dict[str, tuple[str, str]] = {
+    'timestamp': ('timestamp.i8', '<i8'),
+    'symbol_id': ('symbol_id.i4', '<i4'),
+    'price': ('price.f8', '<f8'),
+    'volume': ('volume.f8', '<f8'),
+    'kind': ('kind.i1', '<i1'),
+}
+
+
+class EventFileWriter(object):
+    '''
+    Appends chunks of market data rows to an event file directory.
+    Rows must be appended in non-decreasing timestamp order.
+    '''
+    def __init__(self, path: str | os.PathLike, index_stride: int = DEFAULT_INDEX_STRIDE):
+        if index_stride < 1:
+            raise ValueError('index_stride must be positive')
+        self._path = os.fspath(path)
+        self._index_stride = index_stride
+        self._symbol_ids: dict[str, int] = {}
+        self._count = 0
+        self._last_timestamp: int | None = None
+        self._closed = False
+
+        os.makedirs(self._path, exist_ok=True)
+        # drop a stale header first so a half rewritten file is never read
+        meta_path = os.path.join(self._path, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self._files = {
+            column: open(os.path.join(self._path, file_name), 'wb')
+            for column, (file_name, _) in COLUMNS.items()
+        }
+
+    def __enter__(self) -> 'EventFileWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb): # type: ignore
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self._files.values():
+                f.close()
+            self._closed = True
+
+    def append(
+            self,
+            timestamps: np.ndarray | Sequence[datetime],
+            symbols: np.ndarray | Sequence[str],
+            prices: np.ndarray,
+            volumes: np.ndarray,
+            kinds: np.ndarray | None = None,
+    ) -> None:
+        if self._closed:
+            raise ValueError('writer is closed')
+        ts = to_ns_array(timestamps)
+        n = len(ts)
+        if n == 0:
+            return
+        if np.any(ts[1:] < ts[:-1]) or (
+                self._last_timestamp is not None and ts[0] < self._last_timestamp):
+            raise ValueError('timestamps must be appended in non-decreasing order')
+
+        if kinds is None:
+            kinds = np.full(n, ArrayEventStore.CLOSE, dtype=np.int8)
+        symbols = np.asarray(symbols)
+        # validate and convert everything before the first byte is written,
+        # a rejected chunk must leave the file and the symbols untouched
+        chunk = {'timestamp': np.ascontiguousarray(ts, dtype=COLUMNS['timestamp'][1])}
+        for column, values in (('symbol', symbols), ('price', prices), ('volume', volumes), ('kind', kinds)):
+            if len(values) != n:
+                raise ValueError(f'column {column} has length {len(values)} != {n}')
+            if column != 'symbol':
+                chunk[column] = np.ascontiguousarray(values, dtype=COLUMNS[column][1])
+
+        uniques, inverse = np.unique(symbols, return_inverse=True)
+        mapping = np.array(
+            [self._intern(str(symbol)) for symbol in uniques], dtype=np.int32
+        )
+        chunk['symbol_id'] = np.ascontiguousarray(mapping[inverse], dtype=COLUMNS['symbol_id'][1])
+        for column, values in chunk.items():
+            values.tofile(self._files[column])
+
+        self._count += n
+        self._last_timestamp = int(ts[-1])
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        for f in self._files.values():
+            f.close()
+        self._closed = True
+
+        # sparse index: the timestamp of every index_stride-th row
+        if self._count:
+            timestamps = np.memmap(
+                os.path.join(self._path, COLUMNS['timestamp'][0]),
+                dtype=COLUMNS['timestamp'][1],
+                mode='r',
+                shape=(self._count,),
+            )
+            index = np.array(timestamps[::self._index_stride])
+            del timestamps
+        else:
+            index = np.empty(0, dtype='<i8')
+        index.astype('<i8').tofile(os.path.join(self._path, INDEX_FILE))
+
+        symbols = [None] * len(self._symbol_ids)
+        for symbol, symbol_id in self._symbol_ids.items():
+            symbols[symbol_id] = symbol # type: ignore
+        meta = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'count': self._count,
+            'symbols': symbols,
+            'index_stride': self._index_stride,
+        }
+        with open(os.path.join(self._path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    def _intern(self, symbol: str) -> int:
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self._symbol_ids)
+            self._symbol_ids[symbol] = symbol_id
+        return symbol_id
+
+
+class EventFileReader(object):
+    '''
+    Read-only memory mapping of an event file directory
+    '''
+    def __init__(self, path: str | os.PathLike):
+        self._path = os.fspath(path)
+        meta_path = os.path.join(self._path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise ValueError(f'{self._path} is not a complete event file')
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_NAME or meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f'unsupported event file format in {self._path}')
+
+        self._count: int = meta['count']
+        self._symbols: list[str] = meta['symbols']
+        self._index_stride: int = meta['index_stride']
+        self._columns = {
+            column: self._map(file_name, dtype, self._count)
+            for column, (file_name, dtype) in COLUMNS.items()
+        }
+        n_index = (self._count + self._index_stride - 1) // self._index_stride
+        self._index = self._map(INDEX_FILE, '<i8', n_index)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def path(self) -> str:
+        return self._path
+
+    def symbols(self) -> list[str]:
+        return list(self._symbols)
+
+    def column(self, column: str) -> np.ndarray:
+        return self._columns[column]
+
+    def row_range(
+            self,
+            start: datetime | int | None = None,
+            end: datetime | int | None = None,
+    ) -> tuple[int, int]:
+        '''
+        Row range [lo, hi) of the events with start <= timestamp < end
+        '''
+        lo = 0 if start is None else self._lower_bound(_as_ns(start))
+        hi = self._count if end is None else self._lower_bound(_as_ns(end))
+        return lo, max(lo, hi)
+
+    def _lower_bound(self, ts: int) -> int:
+        # the sparse index narrows the search down to a single block, so
+        # only that block of the timestamp column is paged in
+        block = int(np.searchsorted(self._index, ts, side='left'))
+        if block == 0:
+            return 0
+        lo = (block - 1) * self._index_stride
+        hi = min(block * self._index_stride, self._count)
+        timestamps = self._columns['timestamp'][lo:hi]
+        return lo + int(np.searchsorted(timestamps, ts, side='left'))
+
+    def _map(self, file_name: str, dtype: str, count: int) -> np.ndarray:
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(
+            os.path.join(self._path, file_name),
+            dtype=dtype,
+            mode='r',
+            shape=(count,),
+        )
+
+
+class MmapEventStore(ArrayEventStore):
+    '''
+    ArrayEventStore over a memory mapped event file, optionally restricted
+    to the time range [start, end). The columns are views of the mapping,
+    nothing is read until the sequencer reaches it.
+    '''
+    def __init__(
+            self,
+            source: str | os.PathLike | EventFileReader,
+            start: datetime | int | None = None,
+            end: datetime | int | None = None,
+            name: str | None = None,
+    ):
+        if isinstance(source, EventFileReader):
+            reader = source
+        else:
+            reader = EventFileReader(source)
+        self._reader = reader
+        lo, hi = reader.row_range(start, end)
+        super().__init__(
+            name=reader.path() if name is None else name,
+            timestamps=reader.column('timestamp')[lo:hi],
+            symbol_ids=reader.column('symbol_id')[lo:hi],
+            prices=reader.column('price')[lo:hi],
+            volumes=reader.column('volume')[lo:hi],
+            symbols=reader.symbols(),
+            kinds=reader.column('kind')[lo:hi],
+            validate=False,
+        )
+
+    def slice(
+            self,
+            start: datetime | int | None = None,
+            end: datetime | int | None = None,
+    ) -> 'MmapEventStore':
+        '''
+        A new store over [start, end) sharing this store's mapping
+        '''
+        return MmapEventStore(self._reader, start=start, end=end, name=self.name())
+
+
+def _as_ns(t: datetime | int) -> int:
+    return datetime_to_ns(t) if isinstance(t, datetime) else int(t)
@@ -1,14 +1,30 @@
 '''
 Event Processing related implementations
 '''
-from datetime import datetime
+from datetime import datetime, timedelta
 from abc import ABC, abstractmethod 
+import bisect
+import dataclasses
+import hashlib
 import heapq
-from typing import Generic, TypeVar, NamedTuple
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Callable, Collection, Generic, TypeVar, NamedTuple, Sequence
 import logging
+import warnings
 
-from anvil.clock import SimulationClock
-from anvil.events import Event, InternalSchedulingEvent
+import numpy as np
+
+from anvil.clock import SimulationClock, datetime_to_ns, ns_to_datetime
+from anvil.events import (
+    MARKET_EVENT_TYPES,
+    Event, 
+    InternalSchedulingEvent, 
+    MarketSliceEvent,
+)
+from anvil.symbols import intern_symbol
+
+if TYPE_CHECKING:
+    from anvil.instrumentation import Instrumentation
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +35,7 @@ class MbtePriorityQueue(Generic[K, V]):
     '''
     A wrapper around python native heap queue. 
     A monotonic sequence number is used to break key tie.
+    Keys can be anything comparable, e.g. datetime or int epoch nanoseconds.
 
     :var streams: Description
     :var Data: Description
@@ -31,9 +48,22 @@ class MbtePriorityQueue(Generic[K, V]):
         self._queue: list[tuple[K, int, V]] = []
         logger.debug("constructed PQ", extra={'init_seq': init_seq})
 
-    def add(self, key: K, value: V):
+    def add(self, key: K, value: V, seq: int | None = None):
+        '''
+        Add value under key, with the next sequence number unless seq, 
+        taken from next_seq() before, is given
+        '''
+        if seq is None:
+            seq = self.next_seq()
+        heapq.heappush(self._queue, (key, seq, value))
+
+    def next_seq(self) -> int:
+        '''
+        Take the next sequence number, for entries ordered alongside this
+        queue but kept elsewhere
+        '''
         self._seq += 1 # leave the init_seq untouched
-        heapq.heappush(self._queue, (key, self._seq, value))
+        return self._seq
 
     def pop(self) -> tuple[K, int, V] | None:
         if self._queue:
@@ -47,6 +77,189 @@ class MbtePriorityQueue(Generic[K, V]):
         else:
             return None
 
+    def retain(self, keep: Callable[[V], bool]) -> int:
+        '''
+        Drop every entry whose value fails keep() and restore the heap, 
+        returns the number of dropped entries. Sequence numbers are kept so
+        the relative order of the remaining entries does not change.
+        '''
+        return self.retain_entries(lambda entry: keep(entry[2]))
+
+    def retain_entries(self, keep: Callable[[tuple[K, int, V]], bool]) -> int:
+        '''
+        Same as retain(), keep() is given the whole (key, seq, value) entry
+        '''
+        size = len(self._queue)
+        self._queue = [entry for entry in self._queue if keep(entry)]
+        heapq.heapify(self._queue)
+        return size - len(self._queue)
+
+    def seq(self) -> int:
+        '''
+        The sequence number of the latest add, it changes on every add
+        '''
+        return self._seq
+
+    def entries(self) -> list[tuple[K, int, V]]:
+        '''
+        All (key, seq, value) entries, in no particular order
+        '''
+        return list(self._queue)
+
+    def restore(self, entries: list[tuple[K, int, V]], seq: int):
+        '''
+        Replace the content with entries() of another queue, continuing 
+        from sequence number seq
+        '''
+        self._queue = list(entries)
+        heapq.heapify(self._queue)
+        self._seq = seq
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+class CalendarQueue(Generic[K, V]):
+    '''
+    A calendar queue for timers. Entries are appended in O(1) to the bucket
+    of their time slot, (key - origin) // resolution, and a bucket is only 
+    sorted once it becomes the earliest one. A small heap of occupied slots 
+    locates the next bucket. 
+
+    Entries are (key, seq, value) tuples handed out in exactly the same 
+    order as MbtePriorityQueue. The caller provides seq so that both queues
+    can share one sequence, see MbtePriorityQueue.next_seq().
+
+    resolution is a timedelta for datetime keys or an int for int keys, the
+    origin is the first key added.
+    '''
+    def __init__(self, resolution: timedelta | int):
+        zero = timedelta(0) if isinstance(resolution, timedelta) else 0
+        if not resolution > zero: # type: ignore
+            raise ValueError(f'resolution must be positive, got {resolution}')
+        self._resolution = resolution
+        self._origin: K | None = None
+        self._buckets: dict[int, list[tuple[K, int, V]]] = {}
+        # occupied slots, may hold stale slots whose bucket is gone
+        self._slots: list[int] = []
+        # sorted entries of the earliest slot, consumed from _pos
+        self._current: list[tuple[K, int, V]] = []
+        self._current_slot: int | None = None
+        self._pos = 0
+        self._size = 0
+
+    def add(self, key: K, seq: int, value: V):
+        slot = self._slot(key)
+        entry = (key, seq, value)
+        self._size += 1
+        if self._current_slot is not None:
+            if slot == self._current_slot:
+                bisect.insort(self._current, entry, lo=self._pos)
+                return
+            if slot < self._current_slot:
+                self._stash_current()
+
+        bucket = self._buckets.get(slot)
+        if bucket is None:
+            self._buckets[slot] = [entry]
+            heapq.heappush(self._slots, slot)
+        else:
+            bucket.append(entry)
+
+    def pop(self) -> tuple[K, int, V] | None:
+        head = self.peek()
+        if head is not None:
+            self._pos += 1
+            self._size -= 1
+        return head
+
+    def peek(self) -> tuple[K, int, V] | None:
+        if self._pos >= len(self._current) and not self._load():
+            return None
+        return self._current[self._pos]
+
+    def retain(self, keep: Callable[[V], bool]) -> int:
+        '''
+        Same as MbtePriorityQueue.retain()
+        '''
+        return self.retain_entries(lambda entry: keep(entry[2]))
+
+    def retain_entries(self, keep: Callable[[tuple[K, int, V]], bool]) -> int:
+        '''
+        Same as MbtePriorityQueue.retain_entries()
+        '''
+        self._current = [entry for entry in self._current[self._pos:] if keep(entry)]
+        self._pos = 0
+        size = len(self._current)
+        for slot in list(self._buckets):
+            bucket = [entry for entry in self._buckets[slot] if keep(entry)]
+            if bucket:
+                self._buckets[slot] = bucket
+                size += len(bucket)
+            else:
+                del self._buckets[slot]
+        self._slots = list(self._buckets)
+        heapq.heapify(self._slots)
+
+        dropped = self._size - size
+        self._size = size
+        return dropped
+
+    def entries(self) -> list[tuple[K, int, V]]:
+        '''
+        Same as MbtePriorityQueue.entries()
+        '''
+        entries = self._current[self._pos:]
+        for bucket in self._buckets.values():
+            entries.extend(bucket)
+        return entries
+
+    def restore(self, entries: list[tuple[K, int, V]]):
+        '''
+        Replace the content with entries() of another queue
+        '''
+        self._origin = None
+        self._buckets = {}
+        self._slots = []
+        self._current = []
+        self._current_slot = None
+        self._pos = 0
+        self._size = 0
+        for key, seq, value in sorted(entries, key=lambda entry: entry[:2]):
+            self.add(key, seq, value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slot(self, key: K) -> int:
+        if self._origin is None:
+            self._origin = key
+        return (key - self._origin) // self._resolution # type: ignore
+
+    def _stash_current(self):
+        # an earlier slot showed up, put the current one back as a bucket
+        remaining = self._current[self._pos:]
+        if remaining:
+            self._buckets[self._current_slot] = remaining # type: ignore
+            heapq.heappush(self._slots, self._current_slot) # type: ignore
+        self._current = []
+        self._current_slot = None
+        self._pos = 0
+
+    def _load(self) -> bool:
+        self._current = []
+        self._current_slot = None
+        self._pos = 0
+        while self._slots:
+            slot = heapq.heappop(self._slots)
+            bucket = self._buckets.pop(slot, None)
+            if bucket:
+                bucket.sort()
+                self._current = bucket
+                self._current_slot = slot
+                return True
+        return False
+
 
 class EventStore(ABC):
     '''
@@ -88,6 +301,488 @@ class EventStore(ABC):
         '''
         pass
 
+    def peek_batch(
+            self, 
+            until: datetime | None = None, 
+            max_count: int = 1,
+    ) -> Sequence[Event]:
+        '''
+        Return up to max_count upcoming events with timestamp < until (no 
+        bound if until is None), without consuming them. The first one is
+        the current peek(). 
+
+        Stores that can look ahead cheaply should override this together 
+        with pop_batch(), the default only ever returns the head event.
+        '''
+        head = self.peek()
+        if head is None or max_count < 1:
+            return []
+        if until is not None and not head.timestamp < until:
+            return []
+        return [head]
+
+    def pop_batch(self, count: int) -> int:
+        '''
+        Consume the next count events, returns how many were consumed
+        '''
+        popped = 0
+        while popped < count and self.pop() is not None:
+            popped += 1
+        return popped
+
+    def peek_ns(self) -> int | None:
+        '''
+        Timestamp of the head event in int epoch nanoseconds. Stores that 
+        keep nanosecond timestamps should override this, the default 
+        converts the head event's datetime.
+        '''
+        head = self.peek()
+        if head is None:
+            return None
+        return datetime_to_ns(head.timestamp)
+
+    def peek_batch_ns(
+            self, 
+            until_ns: int | None = None, 
+            max_count: int = 1,
+    ) -> tuple[Sequence[int], Sequence[Event]]:
+        '''
+        Nanosecond counterpart of peek_batch(), returning the events together 
+        with their int epoch nanosecond timestamps
+        '''
+        head_ns = self.peek_ns()
+        if head_ns is None or max_count < 1:
+            return [], []
+        if until_ns is not None and not head_ns < until_ns:
+            return [], []
+        return [head_ns], [self.peek()] # type: ignore
+
+    def seek(self, timestamp: datetime) -> None:
+        '''
+        Position the store at its first event with timestamp >= timestamp.
+        Stores with a timestamp index should override this with a binary
+        search, which can also move backwards. The default pops events and
+        can only move forward.
+        '''
+        head = self.peek()
+        while head is not None and head.timestamp < timestamp:
+            self.pop()
+            head = self.peek()
+
+    def get_state(self) -> object:
+        '''
+        Picklable cursor of the store, for checkpoints. set_state() on a 
+        store built from the same data resumes at the same event. Stores 
+        are not required to support this, the default raises.
+        '''
+        raise NotImplementedError(f'event store {self.name()} does not support checkpoints')
+
+    def set_state(self, state: object) -> None:
+        raise NotImplementedError(f'event store {self.name()} does not support checkpoints')
+
+    def _stream_state(self) -> dict:
+        '''
+        get_state() of a store that can only be read forward: the head
+        timestamp and how many events of that timestamp were consumed,
+        which needs consumed_at()
+        '''
+        head_ns = self.peek_ns()
+        return {
+            'head': head_ns,
+            'consumed': 0 if head_ns is None else self.consumed_at(head_ns),
+        }
+
+    def _restore_stream_state(self, state: dict) -> None:
+        '''
+        set_state() for _stream_state(), by reading forward to the cursor.
+        A store that is already past it cannot go back, restore into a
+        newly built one instead.
+        '''
+        head_ns, consumed = state['head'], state['consumed']
+        if head_ns is None:
+            while self.pop_batch(1 << 16):
+                pass
+            return
+        current = self.peek_ns()
+        if current is None or current > head_ns or (
+                current == head_ns and self.consumed_at(head_ns) > consumed):
+            raise ValueError(f'event store {self.name()} is past the checkpoint and reads forward only')
+        self.seek(ns_to_datetime(head_ns))
+        # seek() has microsecond resolution
+        while (current := self.peek_ns()) is not None and current < head_ns:
+            self.pop_batch(1)
+        skip = consumed - self.consumed_at(head_ns)
+        if self.pop_batch(skip) != skip or self.peek_ns() is None:
+            raise ValueError(f'event store {self.name()} does not hold the checkpointed events')
+
+    def consumed_at(self, timestamp_ns: int) -> int:
+        '''
+        Number of events with timestamp timestamp_ns before the head, the
+        cursor of forward only stores, see _stream_state(). Stores are not
+        required to support this, the default raises.
+        '''
+        raise NotImplementedError(f'event store {self.name()} does not support checkpoints')
+
+    def fingerprint(self) -> str:
+        '''
+        Hex digest of the store's whole data, independent of its cursor, 
+        for caching results computed from it. Stores are not required to 
+        support this, the default raises.
+        '''
+        raise NotImplementedError(f'event store {self.name()} does not support fingerprints')
+
+    def select(
+            self,
+            symbols: Collection[str] | None = None,
+            event_types: Sequence[type[Event]] | None = None,
+    ) -> 'EventStore':
+        '''
+        A store of the remaining events limited to symbols and to instances
+        of event_types, None meaning no limit, so that unwanted events are 
+        never built. It replaces this store, which should not be used 
+        afterwards. Stores that cannot filter their source return 
+        themselves, the default, and leave filtering to the consumer.
+        '''
+        return self
+
+    def pop_slice(self) -> MarketSliceEvent | None:
+        '''
+        Consume the upcoming market events sharing the head event's 
+        timestamp and return them as one slice, None if the head is not a
+        market event. Array backed stores should override this to slice 
+        their columns, the default pops event by event.
+        '''
+        head = self.peek()
+        if not isinstance(head, MARKET_EVENT_TYPES):
+            return None
+        timestamp = head.timestamp
+        symbols, prices, volumes, kinds = [], [], [], []
+        while isinstance(head, MARKET_EVENT_TYPES) and head.timestamp == timestamp:
+            symbols.append(head.symbol)
+            prices.append(head.price) # type: ignore
+            volumes.append(head.volume) # type: ignore
+            kinds.append(MARKET_EVENT_TYPES.index(type(head)))
+            self.pop()
+            head = self.peek()
+        return MarketSliceEvent.from_arrays(
+            timestamp=timestamp,
+            symbols=np.array(symbols, dtype=object),
+            prices=np.array(prices, dtype=np.float64),
+            volumes=np.array(volumes, dtype=np.float64),
+            kinds=np.array(kinds, dtype=np.int8),
+        )
+
+
+class ArrayEventStore(EventStore):
+    '''
+    EventStore backed by contiguous NumPy columns instead of a list of 
+    Event objects. 
+
+    Each row is one market data event:
+        timestamps: int64 nanoseconds since the epoch, non-decreasing
+        symbol_ids: index into the interned symbols sequence
+        prices:     float64
+        volumes:    float64
+        kinds:      optional int8 index into EVENT_TYPES, defaults to 
+                    MarketCloseEvent for every row
+
+    The Event object is only built when the head row is peeked, so a long
+    history costs a few bytes per row rather than one Python object per row.
+    '''
+    OPEN = 0
+    CLOSE = 1
+    EVENT_TYPES: tuple[type[Event], ...] = MARKET_EVENT_TYPES
+
+    def __init__(
+            self,
+            name: str,
+            timestamps: np.ndarray,
+            symbol_ids: np.ndarray,
+            prices: np.ndarray,
+            volumes: np.ndarray,
+            symbols: Sequence[str],
+            kinds: np.ndarray | None = None,
+            validate: bool = True,
+    ):
+        super().__init__()
+        self._name = name
+        self._timestamps = np.asarray(timestamps, dtype=np.int64)
+        self._symbol_ids = np.asarray(symbol_ids)
+        self._prices = np.asarray(prices, dtype=np.float64)
+        self._volumes = np.asarray(volumes, dtype=np.float64)
+        # shared with every other store holding the same symbols
+        self._symbols = tuple(intern_symbol(symbol) for symbol in symbols)
+        # symbol strings by id, to build slices by fancy indexing
+        self._symbol_array = np.array(self._symbols, dtype=object)
+        if kinds is None:
+            kinds = np.full(len(self._timestamps), self.CLOSE, dtype=np.int8)
+        self._kinds = np.asarray(kinds, dtype=np.int8)
+
+        self._size = len(self._timestamps)
+        self._index = 0
+        # materialized head event, built lazily by peek()
+        self._head: Event | None = None
+
+        if validate:
+            self._validate()
+
+    @classmethod
+    def from_columns(
+            cls,
+            name: str,
+            timestamps: np.ndarray,
+            symbols: np.ndarray | Sequence[str],
+            prices: np.ndarray,
+            volumes: np.ndarray,
+            kinds: np.ndarray | None = None,
+    ) -> 'ArrayEventStore':
+        '''
+        Build the store from per-row symbol strings, interning them into
+        symbol ids. timestamps can be datetime64 or int64 nanoseconds.
+        '''
+        uniques, symbol_ids = np.unique(np.asarray(symbols), return_inverse=True)
+        return cls(
+            name=name,
+            timestamps=to_ns_array(timestamps),
+            symbol_ids=symbol_ids.astype(np.int32),
+            prices=prices,
+            volumes=volumes,
+            symbols=[str(symbol) for symbol in uniques],
+            kinds=kinds,
+        )
+
+    @classmethod
+    def from_events(cls, name: str, events: Sequence[Event]) -> 'ArrayEventStore':
+        '''
+        Build the store from MarketOpenEvent/MarketCloseEvent objects
+        '''
+        kinds = np.empty(len(events), dtype=np.int8)
+        for i, event in enumerate(events):
+            kinds[i] = cls.EVENT_TYPES.index(type(event))
+        return cls.from_columns(
+            name=name,
+            timestamps=np.array(
+                [datetime_to_ns(event.timestamp) for event in events], 
+                dtype=np.int64,
+            ),
+            symbols=[event.symbol for event in events],
+            prices=np.array([event.price for event in events]), # type: ignore
+            volumes=np.array([event.volume for event in events]), # type: ignore
+            kinds=kinds,
+        )
+
+    def name(self) -> str:
+        return self._name
+
+    def peek(self) -> Event | None:
+        if self._head is None:
+            if self._index >= self._size:
+                return None
+            self._head = self._materialize(self._index)
+        return self._head
+
+    def pop(self) -> Event | None:
+        head = self.peek()
+        if head is not None:
+            self._index += 1
+            self._head = None
+        return head
+
+    def peek_ns(self) -> int | None:
+        if self._index >= self._size:
+            return None
+        return int(self._timestamps[self._index])
+
+    def peek_batch(
+            self, 
+            until: datetime | None = None, 
+            max_count: int = 1,
+    ) -> Sequence[Event]:
+        until_ns = None if until is None else datetime_to_ns(until)
+        return self._peek_range(*self._batch_range(until_ns, max_count))
+
+    def peek_batch_ns(
+            self, 
+            until_ns: int | None = None, 
+            max_count: int = 1,
+    ) -> tuple[Sequence[int], Sequence[Event]]:
+        lo, hi = self._batch_range(until_ns, max_count)
+        return self._timestamps[lo:hi].tolist(), self._peek_range(lo, hi)
+
+    def _batch_range(self, until_ns: int | None, max_count: int) -> tuple[int, int]:
+        lo = self._index
+        hi = min(self._size, lo + max(max_count, 0))
+        if until_ns is not None and lo < hi:
+            hi = lo + int(np.searchsorted(
+                self._timestamps[lo:hi], until_ns, side='left',
+            ))
+        return lo, hi
+
+    def _peek_range(self, lo: int, hi: int) -> list[Event]:
+        if lo >= hi:
+            return []
+        # reuse the already materialized head so peek() and the batch agree
+        if self._head is not None:
+            return [self._head] + self._materialize_range(lo + 1, hi)
+        events = self._materialize_range(lo, hi)
+        self._head = events[0]
+        return events
+
+    def pop_batch(self, count: int) -> int:
+        count = max(0, min(count, self._size - self._index))
+        if count:
+            self._index += count
+            self._head = None
+        return count
+
+    def seek(self, timestamp: datetime) -> None:
+        self.seek_ns(datetime_to_ns(timestamp))
+
+    def seek_ns(self, timestamp_ns: int) -> None:
+        '''
+        seek() to int epoch nanoseconds, in either direction
+        '''
+        self._index = int(np.searchsorted(self._timestamps, timestamp_ns, side='left'))
+        self._head = None
+
+    def get_state(self) -> object:
+        return {'index': self._index, 'size': self._size}
+
+    def set_state(self, state: object) -> None:
+        if state['size'] != self._size: # type: ignore
+            raise ValueError(
+                f'checkpoint of {state["size"]} events does not match ' # type: ignore
+                f'{self._name} of {self._size} events'
+            )
+        self._index = state['index'] # type: ignore
+        self._head = None
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        for column in (self._timestamps, self._symbol_ids, self._prices, self._volumes, self._kinds):
+            digest.update(column.dtype.str.encode())
+            digest.update(np.ascontiguousarray(column).data)
+        digest.update('\0'.join(self._symbols).encode())
+        return digest.hexdigest()
+
+    def select(
+            self,
+            symbols: Collection[str] | None = None,
+            event_types: Sequence[type[Event]] | None = None,
+    ) -> 'ArrayEventStore':
+        lo = self._index
+        mask = np.ones(self._size - lo, dtype=bool)
+        if symbols is not None:
+            wanted = np.array([symbol in symbols for symbol in self._symbols], dtype=bool)
+            mask &= wanted[self._symbol_ids[lo:]]
+        if event_types is not None:
+            types = tuple(event_types)
+            kinds = np.array([issubclass(t, types) for t in self.EVENT_TYPES], dtype=bool)
+            mask &= kinds[self._kinds[lo:]]
+        return ArrayEventStore(
+            name=self._name,
+            timestamps=self._timestamps[lo:][mask],
+            symbol_ids=self._symbol_ids[lo:][mask],
+            prices=self._prices[lo:][mask],
+            volumes=self._volumes[lo:][mask],
+            symbols=self._symbols,
+            kinds=self._kinds[lo:][mask],
+            validate=False,
+        )
+
+    def pop_slice(self) -> MarketSliceEvent | None:
+        head = self.peek()
+        if head is None:
+            return None
+        lo = self._index
+        hi = int(np.searchsorted(self._timestamps, self._timestamps[lo], side='right'))
+        self._index = hi
+        self._head = None
+        return MarketSliceEvent.from_arrays(
+            timestamp=head.timestamp,
+            symbols=self._symbol_array[self._symbol_ids[lo:hi]],
+            prices=self._prices[lo:hi],
+            volumes=self._volumes[lo:hi],
+            kinds=self._kinds[lo:hi],
+        )
+
+    def __len__(self) -> int:
+        return self._size
+
+    def timestamps_ns(self) -> np.ndarray:
+        '''
+        Read-only view of the int64 nanosecond timestamps of all rows
+        '''
+        view = self._timestamps[:]
+        view.flags.writeable = False
+        return view
+
+    def consumed_at(self, timestamp_ns: int) -> int:
+        lo = int(np.searchsorted(self._timestamps[:self._index], timestamp_ns, side='left'))
+        return self._index - lo
+
+    def _materialize_range(self, lo: int, hi: int) -> list[Event]:
+        # converting whole column slices is much cheaper than per row access
+        event_types = self.EVENT_TYPES
+        symbols = self._symbols
+        return [
+            event_types[kind](
+                timestamp=timestamp,
+                symbol=symbols[symbol_id],
+                price=price,
+                volume=volume,
+            ) # type: ignore
+            for timestamp, symbol_id, price, volume, kind in zip(
+                _ns_to_datetimes(self._timestamps[lo:hi]),
+                self._symbol_ids[lo:hi].tolist(),
+                self._prices[lo:hi].tolist(),
+                self._volumes[lo:hi].tolist(),
+                self._kinds[lo:hi].tolist(),
+            )
+        ]
+
+    def _materialize(self, i: int) -> Event:
+        event_type = self.EVENT_TYPES[self._kinds[i]]
+        return event_type(
+            timestamp=_ns_to_datetimes(self._timestamps[i:i + 1])[0],
+            symbol=self._symbols[self._symbol_ids[i]],
+            price=float(self._prices[i]),
+            volume=float(self._volumes[i]),
+        ) # type: ignore
+
+    def _validate(self):
+        n = self._size
+        for column in (self._symbol_ids, self._prices, self._volumes, self._kinds):
+            if len(column) != n:
+                raise ValueError(f'column length {len(column)} != {n}')
+        if n > 1 and np.any(self._timestamps[1:] < self._timestamps[:-1]):
+            raise ValueError(f'timestamps of {self._name} are not sorted')
+        if n and (self._symbol_ids.min() < 0 or self._symbol_ids.max() >= len(self._symbols)):
+            raise ValueError('symbol id out of range')
+        if n and (self._kinds.min() < 0 or self._kinds.max() >= len(self.EVENT_TYPES)):
+            raise ValueError('event kind out of range')
+
+
+def _ns_to_datetimes(timestamps_ns: np.ndarray) -> list[datetime]:
+    '''
+    ns_to_datetime() of a whole int64 column, the one conversion used to
+    materialize events so that single and batched reads agree
+    '''
+    return (timestamps_ns // 1000).astype('datetime64[us]').tolist()
+
+
+def to_ns_array(timestamps: np.ndarray | Sequence[datetime]) -> np.ndarray:
+    '''
+    Convert datetime64 values, datetime objects or int nanoseconds into an
+    int64 nanosecond array
+    '''
+    values = np.asarray(timestamps)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').view(np.int64)
+    if values.dtype == object:
+        return np.array([datetime_to_ns(t) for t in values], dtype=np.int64)
+    return values.astype(np.int64, copy=False)
+
 
 class EventProcessor(ABC):
     @abstractmethod
@@ -95,21 +790,89 @@ class EventProcessor(ABC):
         pass
 
 
-class EventStoreItem(NamedTuple):
-    event: Event
-    event_store: EventStore
+class EventStoreItem(object):
+    '''
+    Merge queue entry of a store's head event. A store has at most one 
+    event in the queue, so each store gets one item that is reused for 
+    every head instead of allocating one per event.
+    '''
+    __slots__ = ('event', 'event_store')
+
+    def __init__(self, event_store: EventStore):
+        self.event: Event | None = None
+        self.event_store = event_store
+
+
+class RecurringItem(object):
+    '''
+    A recurring schedule. The same item is re-armed in the queue after each
+    occurrence, next_time is the timestamp of the upcoming occurrence.
+    '''
+    __slots__ = ('event', 'schedule_id', 'interval', 'end', 'next_time')
+
+    def __init__(
+            self, 
+            event: Event, 
+            schedule_id: int, 
+            interval: timedelta, 
+            end: datetime | None,
+    ):
+        self.event = event
+        self.schedule_id = schedule_id
+        self.interval = interval
+        self.end = end
+        self.next_time = event.timestamp
+
+
+# a one-off scheduled event is queued as is, its schedule id is the
+# sequence number of its queue entry
+QueueItem = EventStoreItem | RecurringItem | InternalSchedulingEvent
 
 
-class ScheduledItem(NamedTuple):
+class _ScheduledItem(NamedTuple):
     event: Event
     schedule_id: int
 
 
+def __getattr__(name: str):
+    # ScheduledItem no longer wraps queued events, kept for imports only
+    if name == 'ScheduledItem':
+        warnings.warn(
+            'ScheduledItem is deprecated, scheduled events are queued as is',
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return _ScheduledItem
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+class SchedulingStats(NamedTuple):
+    queue_size: int
+    live_scheduled: int
+    cancelled_scheduled: int
+    compactions: int
+
+
 class EventScheduler(ABC):
     @abstractmethod
     def schedule(self, internal_event: InternalSchedulingEvent) -> int:
         pass
 
+    def schedule_recurring(
+            self, 
+            internal_event: InternalSchedulingEvent, 
+            interval: timedelta,
+            end: datetime | None = None,
+    ) -> int:
+        '''
+        Schedule internal_event at its timestamp and then every interval
+        until end (exclusive, unbounded if None). Each occurrence is a copy 
+        of internal_event with the occurrence timestamp. The returned id 
+        cancels the whole series. Schedulers are not required to support
+        this, the default raises.
+        '''
+        raise NotImplementedError(f'{type(self).__name__} does not support recurring schedules')
+
     @abstractmethod
     def cancel(self, schedule_id: int) -> bool:
         pass
@@ -150,55 +913,202 @@ class EventSequencer(EventScheduler):
     It uses an algorithm that does a k-way merge of sorted data streams. 
     Each EventStore can lazily propose the next event to be inserted into a
     priority queue that  
+
+    run() additionally drains whole runs of a store without going through
+    the priority queue: after a store event is processed, the store's 
+    following events are processed directly as long as they are strictly 
+    earlier than the queue head. That is exactly when the queue would have
+    handed them out next, since anything already queued carries a smaller
+    sequence number and wins timestamp ties. Events are fetched with 
+    EventStore.peek_batch() up to batch_size at a time.
+
+    With time_ns the merge queue is keyed by int epoch nanoseconds taken 
+    from EventStore.peek_ns() and the clock is driven through 
+    SimulationClock.set_time_ns(), so ordering compares plain ints and 
+    keeps nanosecond resolution. Events keep their datetime timestamp.
+
+    Windows:
+    run_until() processes the events before a timestamp and run_for() a 
+    number of events, both return whether anything is left so a long 
+    simulation can be run in chunks and resumed with either of them or 
+    run(). seek() jumps every store to a timestamp through EventStore.seek()
+    without processing the skipped events, so a window late in the history
+    starts straight away.
+
+    Checkpoints:
+    get_state() captures the clock, both queues with their pending 
+    scheduled items, the live schedule ids, the counters and every store's
+    cursor (EventStore.get_state()) as plain picklable data. set_state() 
+    restores it on a sequencer built the same way, store events are taken
+    back from the restored stores. See anvil.checkpoint.
+
+    Cancellation:
+    cancel() leaves the scheduled entry in the merge queue as a tombstone that
+    is skipped when it reaches the head. Once tombstones exceed 
+    compaction_ratio of the queue (and at least COMPACTION_MIN_CANCELLED), 
+    the queue is compacted, so cancel-and-replace patterns run in bounded
+    memory. See scheduling_stats() for the live and cancelled counts.
+
+    Timers:
+    With timer_resolution, scheduled events are kept in a CalendarQueue 
+    instead of the merge queue, so schedule() is O(1) and the merge queue 
+    only holds one entry per store. Both queues draw from one sequence and
+    the earlier (timestamp, seq) head of the two is processed next, which 
+    gives the same ordering as the single heap.
+
+    Slices:
+    With slices, market events of the same timestamp are delivered in one
+    process() call as a MarketSliceEvent instead of one call per event. 
+    When a store's market event reaches the head of the merge queue, the
+    store hands over all its events of that timestamp via 
+    EventStore.pop_slice(), and so does every other store whose head is 
+    next in the queue at the same timestamp. Any other event that sits 
+    between them in the queue (same timestamp, earlier sequence number), 
+    e.g. a scheduled one, is processed in between and splits the slice in
+    two. Events other than market events are delivered one by one as usual.
+
+    Memory:
+    A queued one-off scheduled event is a single (key, seq, event) heap 
+    entry, its schedule id being the entry's sequence number, which the 
+    live id set shares. Store heads reuse one EventStoreItem per store. 
+    Together with slotted events this keeps the cost of a queued event at
+    about a third of wrapping each one in its own item tuple.
+
+    Instrumentation:
+    An Instrumentation wraps the queues, stores and processor in timing 
+    proxies and collects counts for a report at the end of run(). Without
+    one nothing is wrapped and debug log records are only built when debug
+    logging is enabled, so the hot path pays nothing for it.
     '''
+    COMPACTION_MIN_CANCELLED = 64
     
     def __init__(
             self,
             sim_clock: SimulationClock, 
             event_stores: list[EventStore], 
+            batch_size: int = 256,
+            time_ns: bool = False,
+            compaction_ratio: float = 0.5,
+            timer_resolution: timedelta | None = None,
+            slices: bool = False,
+            instrumentation: 'Instrumentation | None' = None,
     ):
         self._sim_clock = sim_clock
+        if not 0 < compaction_ratio <= 1:
+            raise ValueError(f'compaction_ratio must be in (0, 1], got {compaction_ratio}')
         self._event_stores = list(event_stores)
         self._event_processor: EventProcessor | None = None
+        self._batch_size = batch_size
+        self._time_ns = time_ns
+        self._slices = slices
+        self._instrumentation = instrumentation
 
-        self._merger_queue = MbtePriorityQueue[datetime, EventStoreItem | ScheduledItem]()
-        # internal scheduling id sequence number for ad-hoc timer event
-        self._internal_scheduling_id: int = 1
+        self._merger_queue = MbtePriorityQueue[datetime | int, QueueItem]()
+        self._timers: CalendarQueue[datetime | int, QueueItem] | None = None
+        if timer_resolution is not None:
+            resolution = (
+                timer_resolution // timedelta(microseconds=1) * 1000 
+                if time_ns else timer_resolution
+            )
+            self._timers = CalendarQueue(resolution)
+        if instrumentation is not None:
+            self._merger_queue = instrumentation.priority_queue()
+            if timer_resolution is not None:
+                self._timers = instrumentation.calendar_queue(resolution)
+            self._event_stores = [
+                instrumentation.wrap_store(event_store) 
+                for event_store in self._event_stores
+            ]
+        self._store_items = [EventStoreItem(event_store) for event_store in self._event_stores]
         # active internal ad-hoc timer event id
         self._scheduled_id_set: set[int] = set()
+        # cancelled scheduled entries still sitting in the merge queue
+        self._cancelled_count: int = 0
+        self._compaction_ratio = compaction_ratio
+        self._compaction_count: int = 0
         self._event_count: int = 0
 
         self._init_queue()
-        logger.debug(
-            'constructed EventSequencer', 
-            extra=self._get_extra(),  # type: ignore
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'constructed EventSequencer', 
+                extra=self._get_extra(),  # type: ignore
+            )
 
     def set_processor(self, event_processor: EventProcessor):
+        if self._instrumentation is not None:
+            event_processor = self._instrumentation.wrap_processor(event_processor)
         self._event_processor = event_processor
 
     def schedule(self, internal_event: InternalSchedulingEvent) -> int:
-        scheduled_id = self._get_schedule_id()
-        self._merger_queue.add(
-            internal_event.timestamp,
-            ScheduledItem(event=internal_event, schedule_id=scheduled_id),
-        )
+        scheduled_id = self._enqueue_scheduled(self._event_key(internal_event), internal_event)
         self._scheduled_id_set.add(scheduled_id)
-        logger.debug(
-            'scheduled internal event',
-            extra={
-                'scheduled_at': internal_event.timestamp, 
-                'scheduled_id': scheduled_id
-            },
-        )
+        if self._instrumentation is not None:
+            self._instrumentation.count_schedule()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'scheduled internal event',
+                extra={
+                    'scheduled_at': internal_event.timestamp, 
+                    'scheduled_id': scheduled_id
+                },
+            )
         return scheduled_id
     
+    def schedule_recurring(
+            self, 
+            internal_event: InternalSchedulingEvent, 
+            interval: timedelta,
+            end: datetime | None = None,
+    ) -> int:
+        if not interval > timedelta(0):
+            raise ValueError(f'interval must be positive, got {interval}')
+        scheduled_id = self._merger_queue.next_seq()
+        if end is None or internal_event.timestamp < end:
+            self._enqueue_scheduled(
+                self._event_key(internal_event),
+                RecurringItem(internal_event, scheduled_id, interval, end),
+                scheduled_id,
+            )
+            self._scheduled_id_set.add(scheduled_id)
+        if self._instrumentation is not None:
+            self._instrumentation.count_schedule()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'scheduled recurring internal event',
+                extra={
+                    'scheduled_at': internal_event.timestamp, 
+                    'interval': interval,
+                    'scheduled_id': scheduled_id
+                },
+            )
+        return scheduled_id
+
     def cancel(self, schedule_id: int) -> bool:
-        logger.debug(
-            'removing interal event', 
-            extra=self._get_extra(scheduled_id=schedule_id), # type: ignore
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'removing interal event', 
+                extra=self._get_extra(scheduled_id=schedule_id), # type: ignore
+            )
+        if self._instrumentation is not None:
+            self._instrumentation.count_cancel()
+        if not self._remove_scheduled_id(schedule_id):
+            return False
+        self._cancelled_count += 1
+        if (
+            self._cancelled_count >= self.COMPACTION_MIN_CANCELLED
+            and self._cancelled_count > self._compaction_ratio * self._queue_size()
+        ):
+            self._compact()
+        return True
+
+    def scheduling_stats(self) -> SchedulingStats:
+        return SchedulingStats(
+            queue_size=self._queue_size(),
+            live_scheduled=len(self._scheduled_id_set),
+            cancelled_scheduled=self._cancelled_count,
+            compactions=self._compaction_count,
         )
-        return self._remove_scheduled_id(schedule_id)
 
     def run(self):
         if self._event_processor is None:
@@ -207,17 +1117,190 @@ class EventSequencer(EventScheduler):
                 extra=self._get_extra(), # type: ignore
             )
             return
-        # keep running event by event util it is done
-        while self.advance():
+        start = perf_counter_ns()
+        # keep running util it is done
+        while self._advance(drain=True):
             pass
-        logger.debug(
-            'finished event sequencer run',
-            extra=self._get_extra(event_count=self._event_count), # type: ignore
-        )
+        if self._instrumentation is not None:
+            self._instrumentation.run_finished(perf_counter_ns() - start)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'finished event sequencer run',
+                extra=self._get_extra(event_count=self._event_count), # type: ignore
+            )
+
+    def run_until(self, timestamp: datetime) -> bool:
+        '''
+        Process the events with timestamp < timestamp, returns True if 
+        events remain
+        '''
+        assert self._event_processor is not None
+        until = datetime_to_ns(timestamp) if self._time_ns else timestamp
+        while (head := self._peek_head()) is not None and head[0] < until:
+            self._advance(drain=True, until=until)
+        return head is not None
+
+    def run_for(self, n_events: int) -> bool:
+        '''
+        Process the next n_events events, returns True if events remain.
+        Skipped tombstones of cancelled events do not count.
+        '''
+        assert self._event_processor is not None
+        target = self._event_count + n_events
+        while self._event_count < target:
+            if not self._advance(drain=True, max_events=target - self._event_count):
+                return False
+        return self._peek_head() is not None
+
+    def seek(self, timestamp: datetime) -> None:
+        '''
+        Skip to timestamp: every store is moved to its first event at or 
+        after timestamp and the clock is set to it. Scheduled events before
+        timestamp are dropped, recurring ones resume at their first 
+        occurrence at or after it.
+
+        timestamp may be before the current time, the clock then moves 
+        backwards and recurring events rewind. Stores that can only move
+        forward, see EventStore.seek(), stay at their current event.
+        One-off events that were already processed and recurring ones that
+        already ended are not scheduled again.
+        '''
+        key = datetime_to_ns(timestamp) if self._time_ns else timestamp
+        pending = []
+        while (head := self._pop_head()) is not None:
+            pending.append(head)
+        self._cancelled_count = 0
 
-    def _init_queue(self):
         for event_store in self._event_stores:
-            self._replenish_from_store(event_store)
+            event_store.seek(timestamp)
+        self._init_queue()
+
+        for _, seq, item in pending:
+            if isinstance(item, EventStoreItem):
+                continue
+            if isinstance(item, RecurringItem):
+                schedule_id = item.schedule_id
+            else:
+                schedule_id = seq
+            if schedule_id not in self._scheduled_id_set:
+                # a tombstone left by cancel()
+                continue
+            if not isinstance(item, RecurringItem):
+                if item.timestamp < timestamp:
+                    self._remove_scheduled_id(schedule_id)
+                else:
+                    # keep the sequence number, it is the schedule id
+                    self._enqueue_scheduled(self._event_key(item), item, seq)
+                continue
+            # counted from the start of the series, which also rewinds it
+            # on a backward seek
+            start = item.event.timestamp
+            skipped = max(0, -((start - timestamp) // item.interval))
+            item.next_time = start + skipped * item.interval
+            if item.end is not None and not item.next_time < item.end:
+                self._remove_scheduled_id(item.schedule_id)
+            else:
+                self._enqueue_scheduled(
+                    datetime_to_ns(item.next_time) if self._time_ns else item.next_time,
+                    item,
+                )
+
+        # unlike set_time(), set_state() can move the clock backwards
+        if self._time_ns:
+            self._sim_clock.set_state((None, key)) # type: ignore
+        else:
+            self._sim_clock.set_state((timestamp, None))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('sought event sequencer', extra=self._get_extra()) # type: ignore
+
+    def get_state(self) -> dict:
+        '''
+        Picklable state of the sequencer and its stores, see Checkpointer.
+        It cannot be taken while a store event is being processed, the 
+        store is then out of the queue and partly consumed: checkpoint 
+        between calls to run_for() or run_until() instead, or from the 
+        handler of a scheduled event.
+        '''
+        store_index = {id(event_store): i for i, event_store in enumerate(self._event_stores)}
+
+        def item_state(item: QueueItem) -> tuple:
+            if isinstance(item, EventStoreItem):
+                return ('store', store_index[id(item.event_store)])
+            if not isinstance(item, RecurringItem):
+                return ('scheduled', item)
+            return (
+                'recurring', item.event, item.schedule_id, 
+                item.interval, item.end, item.next_time,
+            )
+
+        entries = self._merger_queue.entries()
+        if self._timers is not None:
+            entries += self._timers.entries()
+        queued = {id(item) for _, _, item in entries if isinstance(item, EventStoreItem)}
+        for store_item in self._store_items:
+            if id(store_item) not in queued and store_item.event_store.peek() is not None:
+                raise RuntimeError(
+                    f'cannot checkpoint while an event of {store_item.event_store.name()} '
+                    'is being processed'
+                )
+        return {
+            'time_ns': self._time_ns,
+            'clock': self._sim_clock.get_state(),
+            'seq': self._merger_queue.seq(),
+            'entries': [(key, seq, item_state(item)) for key, seq, item in entries],
+            'scheduled_ids': sorted(self._scheduled_id_set),
+            'cancelled_count': self._cancelled_count,
+            'compaction_count': self._compaction_count,
+            'event_count': self._event_count,
+            'stores': [event_store.get_state() for event_store in self._event_stores],
+        }
+
+    def set_state(self, state: dict) -> None:
+        if 'next_schedule_id' in state:
+            raise ValueError('state of an older sequencer layout, scheduled entries cannot be restored')
+        if state['time_ns'] != self._time_ns:
+            raise ValueError('checkpoint and sequencer differ in time_ns')
+        if len(state['stores']) != len(self._event_stores):
+            raise ValueError(
+                f'checkpoint of {len(state["stores"])} stores does not match '
+                f'{len(self._event_stores)} stores'
+            )
+        for event_store, store_state in zip(self._event_stores, state['stores']):
+            event_store.set_state(store_state)
+        self._sim_clock.set_state(state['clock'])
+
+        queue_entries = []
+        timer_entries = []
+        for key, seq, (kind, *fields) in state['entries']:
+            if kind == 'store':
+                store_item = self._store_items[fields[0]]
+                store_item.event = store_item.event_store.peek()
+                if store_item.event is None:
+                    raise ValueError(f'event store {store_item.event_store.name()} is exhausted')
+                queue_entries.append((key, seq, store_item))
+                continue
+            if kind == 'scheduled':
+                item: QueueItem = fields[0]
+            else:
+                event, schedule_id, interval, end, next_time = fields
+                item = RecurringItem(event, schedule_id, interval, end)
+                item.next_time = next_time
+            if self._timers is None:
+                queue_entries.append((key, seq, item))
+            else:
+                timer_entries.append((key, seq, item))
+        self._merger_queue.restore(queue_entries, state['seq'])
+        if self._timers is not None:
+            self._timers.restore(timer_entries)
+
+        self._scheduled_id_set = set(state['scheduled_ids'])
+        self._cancelled_count = state['cancelled_count']
+        self._compaction_count = state['compaction_count']
+        self._event_count = state['event_count']
+
+    def _init_queue(self):
+        for store_item in self._store_items:
+            self._replenish_from_store(store_item)
             
     def _remove_scheduled_id(self, schedule_id: int) -> bool:
         if schedule_id in self._scheduled_id_set:
@@ -226,23 +1309,103 @@ class EventSequencer(EventScheduler):
         else:
             return False
 
-    def _replenish_from_store(self, event_store: EventStore) -> bool:
+    def _compact(self) -> None:
+        live = self._scheduled_id_set
+
+        def keep(entry: tuple[datetime | int, int, QueueItem]) -> bool:
+            item = entry[2]
+            if isinstance(item, EventStoreItem):
+                return True
+            if isinstance(item, RecurringItem):
+                return item.schedule_id in live
+            return entry[1] in live
+
+        dropped = self._merger_queue.retain_entries(keep)
+        if self._timers is not None:
+            dropped += self._timers.retain_entries(keep)
+        self._cancelled_count -= dropped
+        self._compaction_count += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'compacted merge queue',
+                extra=self._get_extra(dropped=dropped), # type: ignore
+            )
+
+    def _queue_size(self) -> int:
+        size = len(self._merger_queue)
+        if self._timers is not None:
+            size += len(self._timers)
+        return size
+
+    def _enqueue_scheduled(
+            self, 
+            key: datetime | int, 
+            item: QueueItem,
+            seq: int | None = None,
+    ) -> int:
+        '''
+        Queue item under key and return its sequence number, the next one
+        unless seq is given
+        '''
+        if seq is None:
+            seq = self._merger_queue.next_seq()
+        if self._timers is None:
+            self._merger_queue.add(key, item, seq)
+        else:
+            self._timers.add(key, seq, item)
+        return seq
+
+    def _fire_recurring(self, item: RecurringItem) -> Event:
+        '''
+        Build the due occurrence and re-arm the series for the next one, or 
+        retire it after the last occurrence
+        '''
+        timestamp = item.next_time
+        event = item.event
+        if event.timestamp != timestamp:
+            event = dataclasses.replace(event, timestamp=timestamp)
+
+        item.next_time = timestamp + item.interval
+        if item.end is None or item.next_time < item.end:
+            self._enqueue_scheduled(
+                datetime_to_ns(item.next_time) if self._time_ns else item.next_time,
+                item,
+            )
+        else:
+            self._remove_scheduled_id(item.schedule_id)
+        return event
+
+    def _peek_head(self) -> tuple[datetime | int, int, QueueItem] | None:
+        head = self._merger_queue.peek()
+        if self._timers is not None:
+            timer_head = self._timers.peek()
+            if timer_head is not None and (head is None or timer_head[:2] < head[:2]):
+                return timer_head
+        return head
+
+    def _pop_head(self) -> tuple[datetime | int, int, QueueItem] | None:
+        if self._timers is not None:
+            timer_head = self._timers.peek()
+            if timer_head is not None:
+                head = self._merger_queue.peek()
+                if head is None or timer_head[:2] < head[:2]:
+                    return self._timers.pop()
+        return self._merger_queue.pop()
+
+    def _replenish_from_store(self, store_item: EventStoreItem) -> bool:
+        event_store = store_item.event_store
         head = event_store.peek()
         if head is None:
             return False
         
         # put the next one from the event store into the merge queue
+        store_item.event = head
         self._merger_queue.add(
-            head.timestamp, 
-            EventStoreItem(event=head, event_store=event_store)
+            event_store.peek_ns() if self._time_ns else head.timestamp, 
+            store_item,
         )
         return True
 
-    def _get_schedule_id(self) -> int:
-        ret = self._internal_scheduling_id
-        self._internal_scheduling_id += 1
-        return ret
-
     def advance(self) -> bool:
         '''
         advance() does not necessarily process an event. If it encounters
@@ -253,36 +1416,160 @@ class EventSequencer(EventScheduler):
         :return: Description
         :rtype: bool
         '''
+        return self._advance(drain=False)
+
+    def _advance(
+            self, 
+            drain: bool, 
+            until: datetime | int | None = None,
+            max_events: int | None = None,
+    ) -> bool:
+        '''
+        Process the merge queue head. With drain, a store event is followed
+        by a direct drain of that store, see _drain_store(), bounded by the
+        key until and by max_events processed events including the head
+        '''
         assert self._event_processor is not None
 
-        head = self._merger_queue.pop()
+        head = self._pop_head()
         if head is None:
             return False
         
-        timestamp, _, item = head
-        if isinstance(item, ScheduledItem):
-            # if the scheduled_id is still effective, then run it
-            if item.schedule_id in self._scheduled_id_set:
-                self._advance_clock(timestamp)
-                self._event_processor.process(item.event)
-                self._event_count += 1
-                self._remove_scheduled_id(item.schedule_id)
-            return True
-        else: # isinstance(item, EventStoreItem)
-            # process the event (still in the queue) and remove it
+        timestamp, seq, item = head
+        if isinstance(item, EventStoreItem):
+            if self._slices and isinstance(item.event, MARKET_EVENT_TYPES):
+                self._process_slice(timestamp, item)
+                return True
+            # process the event (still in the store) and remove it
             self._advance_clock(timestamp)
-            self._event_processor.process(item.event)
+            self._event_processor.process(item.event) # type: ignore
             self._event_count += 1
             item.event_store.pop()
 
+            # a drain would hand the store's market events over one by
+            # one rather than as slices
+            if drain and not self._slices and (max_events is None or max_events > 1):
+                self._drain_store(
+                    item.event_store, 
+                    until, 
+                    None if max_events is None else max_events - 1,
+                )
+
             # prepare the next event in the queue, without removing it
-            self._replenish_from_store(item.event_store)
+            self._replenish_from_store(item)
+            return True
+        elif isinstance(item, RecurringItem):
+            if item.schedule_id in self._scheduled_id_set:
+                # re-arm first, so the handler can cancel the series
+                event = self._fire_recurring(item)
+                self._advance_clock(timestamp)
+                self._event_processor.process(event)
+                self._event_count += 1
+            else:
+                # a tombstone left by cancel()
+                self._cancelled_count -= 1
             return True
+        else: # a one-off scheduled event, seq is its schedule id
+            if self._remove_scheduled_id(seq):
+                # retired before the handler runs, cancelling it is a no-op
+                self._advance_clock(timestamp)
+                self._event_processor.process(item)
+                self._event_count += 1
+            else:
+                # a tombstone left by cancel()
+                self._cancelled_count -= 1
+            return True
+
+    def _process_slice(self, key: datetime | int, item: EventStoreItem) -> None:
+        '''
+        Collect the slices of all stores at the head of the merge queue with
+        the same key and process them as one event
+        '''
+        assert self._event_processor is not None
+        items = [item]
+        while True:
+            head = self._peek_head()
+            if (
+                head is None 
+                or head[0] != key 
+                or not isinstance(head[2], EventStoreItem) 
+                or not isinstance(head[2].event, MARKET_EVENT_TYPES)
+            ):
+                break
+            self._pop_head()
+            items.append(head[2])
+
+        slices = [store_item.event_store.pop_slice() for store_item in items]
+        event = slices[0] if len(slices) == 1 else MarketSliceEvent.concat(slices) # type: ignore
+        self._advance_clock(key)
+        self._event_processor.process(event) # type: ignore
+        self._event_count += 1
 
-    def _advance_clock(self, timestamp: datetime) -> None:
+        for store_item in items:
+            self._replenish_from_store(store_item)
+
+    def _drain_store(
+            self, 
+            event_store: EventStore,
+            bound: datetime | int | None = None,
+            max_events: int | None = None,
+    ) -> None:
+        '''
+        Process the store's events directly while they come strictly before
+        the merge queue head, i.e. while the queue would pick them anyway,
+        and before bound, at most max_events of them.
+        '''
+        assert self._event_processor is not None
+        queue = self._merger_queue
+        process = self._event_processor.process
+
+        while max_events is None or max_events > 0:
+            queue_head = self._peek_head()
+            until = None if queue_head is None else queue_head[0]
+            if bound is not None and (until is None or bound < until):
+                until = bound
+            batch_size = self._batch_size
+            if max_events is not None and max_events < batch_size:
+                batch_size = max_events
+            if self._time_ns:
+                keys, events = event_store.peek_batch_ns(until, batch_size) # type: ignore
+            else:
+                events = event_store.peek_batch(until, batch_size) # type: ignore
+                keys = [event.timestamp for event in events]
+            if not events:
+                return
+
+            seq = queue.seq()
+            consumed = 0
+            for key, event in zip(keys, events):
+                if queue.seq() != seq:
+                    # the processor scheduled something, re-check the bound
+                    seq = queue.seq()
+                    queue_head = self._peek_head()
+                    if queue_head is not None and not key < queue_head[0]:
+                        break
+                self._advance_clock(key)
+                process(event)
+                consumed += 1
+
+            self._event_count += consumed
+            event_store.pop_batch(consumed)
+            if max_events is not None:
+                max_events -= consumed
+            if consumed < len(events):
+                return
+
+    def _advance_clock(self, timestamp: datetime | int) -> None:
         # advance time if it sees a newer timestamp
-        if self._sim_clock.now() < timestamp:
-            self._sim_clock.set_time(timestamp)
+        if self._time_ns:
+            self._sim_clock.set_time_ns(timestamp) # type: ignore
+        elif self._sim_clock.now() < timestamp: # type: ignore
+            self._sim_clock.set_time(timestamp) # type: ignore
+
+    def _event_key(self, event: Event) -> datetime | int:
+        if self._time_ns:
+            return datetime_to_ns(event.timestamp)
+        return event.timestamp
 
     def _get_extra(self, **kwargs): # type: ignore
         d = {'now': self._sim_clock.now()}
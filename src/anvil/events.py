@@ -1,8 +1,10 @@
 from dataclasses import dataclass
 from datetime import datetime
 
+import numpy as np
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class Event:
     timestamp: datetime
     symbol: str
@@ -10,44 +12,116 @@ class Event:
 
 ################# Market Events ##################
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class MarketOpenEvent(Event):
     price: float
     volume: float
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class MarketCloseEvent(Event):
     price: float
     volume: float
 
 
+# market event types by the int8 kind code of array backed stores and slices
+MARKET_EVENT_TYPES: tuple[type[Event], ...] = (MarketOpenEvent, MarketCloseEvent)
+
+# symbol of a MarketSliceEvent, which spans many symbols
+ALL_SYMBOLS = '*'
+
+
+@dataclass(frozen=True, eq=False, slots=True)
+class MarketSliceEvent(Event):
+    '''
+    All market events of one timestamp delivered together, one array entry
+    per event. kinds holds the index into MARKET_EVENT_TYPES of each entry.
+    The arrays are read-only and may be views of the store's columns.
+    '''
+    symbols: np.ndarray
+    prices: np.ndarray
+    volumes: np.ndarray
+    kinds: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def events(self) -> list[Event]:
+        '''
+        The individual market events of the slice
+        '''
+        return [
+            MARKET_EVENT_TYPES[kind](
+                timestamp=self.timestamp, 
+                symbol=symbol, 
+                price=price, 
+                volume=volume,
+            ) # type: ignore
+            for symbol, price, volume, kind in zip(
+                self.symbols.tolist(),
+                self.prices.tolist(),
+                self.volumes.tolist(),
+                self.kinds.tolist(),
+            )
+        ]
+
+    @classmethod
+    def concat(cls, slices: 'list[MarketSliceEvent]') -> 'MarketSliceEvent':
+        '''
+        One slice of the entries of slices of the same timestamp, in order
+        '''
+        return cls.from_arrays(
+            timestamp=slices[0].timestamp,
+            symbols=np.concatenate([s.symbols for s in slices]),
+            prices=np.concatenate([s.prices for s in slices]),
+            volumes=np.concatenate([s.volumes for s in slices]),
+            kinds=np.concatenate([s.kinds for s in slices]),
+        )
+
+    @classmethod
+    def from_arrays(
+            cls, 
+            timestamp: datetime, 
+            symbols: np.ndarray, 
+            prices: np.ndarray, 
+            volumes: np.ndarray, 
+            kinds: np.ndarray,
+    ) -> 'MarketSliceEvent':
+        columns = []
+        for column in (symbols, prices, volumes, kinds):
+            # a view, so the caller's array stays writeable
+            column = column.view()
+            column.flags.writeable = False
+            columns.append(column)
+        return cls(timestamp, ALL_SYMBOLS, *columns)
+
+
 ###################### Signal ######################
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SignalEvent(Event):
     value: float
 
 
 ##################### Execution ######################
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PortfolioConstruction(Event):
     qty: int
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PortfolioLiquidation(Event):
     pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class OrderEvent(Event):
     price: float | None
     qty: int
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FillEvent(Event):
     last_price: float
     last_qty: int
@@ -55,7 +129,7 @@ class FillEvent(Event):
 
 ############## Internal Scheduling ###################
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class InternalSchedulingEvent(Event):
     '''
     This is used as an internal scheduling event base class
@@ -0,0 +1,193 @@
+'''
+Reference Execution implementation filling orders at the next bar.
+
+ExecutionSimulator implements the execution model of the README: an order
+received on a bar at t fills at the price of the next market event of its
+symbol after t, with fixed and proportional slippage and commission folded
+into the fill price as in anvil.vectorized.CostModel. Orders are not
+scheduled as events. They wait in per-symbol queues until
+MbteProcessor hands the execution a market event or slice, and all the
+orders due on it are priced in one vectorized pass:
+
+    execution = ExecutionSimulator(CostModel(fixed_slippage=0.01, commission=0.0005))
+    processor = MbteProcessor(strategy, ArrayPortfolio(1e6), execution)
+
+With slices, a rebalance of thousands of names costs one pass over the
+arrays of the next slice rather than one queue entry per order. Orders
+with a price are limit orders and stay pending until the market trades
+through their price.
+'''
+from datetime import datetime
+from typing import Sequence
+
+import numpy as np
+
+from anvil.core import Execution
+from anvil.events import (
+    MARKET_EVENT_TYPES,
+    Event,
+    FillEvent,
+    MarketSliceEvent,
+    OrderEvent,
+)
+from anvil.symbols import SYMBOLS
+from anvil.vectorized import CostModel
+
+
+class ExecutionSimulator(Execution):
+    '''
+    Fills pending orders at the next market event of their symbol of one
+    of the fill_on types, market opens and closes by default
+    '''
+    def __init__(
+            self,
+            costs: CostModel = CostModel(),
+            fill_on: Sequence[type[Event]] = MARKET_EVENT_TYPES,
+    ):
+        self._costs = costs
+        self._fill_on = tuple(fill_on)
+        self._fill_kinds = np.array(
+            [issubclass(t, self._fill_on) for t in MARKET_EVENT_TYPES],
+            dtype=bool,
+        )
+        # pending orders by symbol, in arrival order
+        self._pending: dict[str, list[OrderEvent]] = {}
+        # whether a symbol has pending orders, by id in SYMBOLS
+        self._has_pending = np.zeros(0, dtype=bool)
+        self._pending_count = 0
+        self._traded = 0.0
+        self._total_costs = 0.0
+
+    def receive(self, order: OrderEvent) -> None:
+        if order.qty == 0:
+            return
+        orders = self._pending.get(order.symbol)
+        if orders is None:
+            orders = self._pending[order.symbol] = []
+            i = SYMBOLS.intern(order.symbol)
+            if i >= len(self._has_pending):
+                grown = np.zeros(max(2 * len(self._has_pending), i + 1), dtype=bool)
+                grown[:len(self._has_pending)] = self._has_pending
+                self._has_pending = grown
+            self._has_pending[i] = True
+        orders.append(order)
+        self._pending_count += 1
+
+    def on_market(self, event: Event) -> Sequence[FillEvent]:
+        if not self._pending_count:
+            return ()
+        if isinstance(event, MarketSliceEvent):
+            return self._on_slice(event)
+        if not isinstance(event, self._fill_on):
+            return ()
+        orders = self._pending.get(event.symbol)
+        if not orders:
+            return ()
+        return self._fill(event.timestamp, orders, np.full(len(orders), event.price)) # type: ignore
+
+    def pending(self) -> int:
+        '''
+        Number of orders waiting for a fill
+        '''
+        return self._pending_count
+
+    def traded(self) -> float:
+        '''
+        Cumulative absolute filled quantity
+        '''
+        return self._traded
+
+    def costs(self) -> float:
+        '''
+        Cumulative slippage and commission of all fills
+        '''
+        return self._total_costs
+
+    def _on_slice(self, event: MarketSliceEvent) -> Sequence[FillEvent]:
+        ids = SYMBOLS.ids(event.symbols)
+        has_pending = np.zeros(len(ids), dtype=bool)
+        known = ids < len(self._has_pending)
+        has_pending[known] = self._has_pending[ids[known]]
+        rows = np.flatnonzero(has_pending & self._fill_kinds[event.kinds])
+        if not len(rows):
+            return ()
+
+        orders: list[OrderEvent] = []
+        counts: list[int] = []
+        seen: set[str] = set()
+        symbols = event.symbols
+        for row in rows.tolist():
+            symbol = symbols[row]
+            if symbol in seen:
+                # a symbol's orders fill at its first row
+                counts.append(0)
+                continue
+            seen.add(symbol)
+            symbol_orders = self._pending[symbol]
+            orders.extend(symbol_orders)
+            counts.append(len(symbol_orders))
+        prices = np.repeat(event.prices[rows], counts)
+        return self._fill(event.timestamp, orders, prices)
+
+    def _fill(
+            self,
+            timestamp: datetime,
+            orders: list[OrderEvent],
+            prices: np.ndarray,
+    ) -> Sequence[FillEvent]:
+        '''
+        Fill the due orders of orders at prices, one per order. Orders that
+        are not due yet or whose limit is not reached stay pending.
+        '''
+        n = len(orders)
+        qty = np.fromiter((order.qty for order in orders), dtype=np.float64, count=n)
+        limits = np.fromiter(
+            (np.nan if order.price is None else order.price for order in orders),
+            dtype=np.float64,
+            count=n,
+        )
+        due = np.fromiter((order.timestamp < timestamp for order in orders), dtype=bool, count=n)
+        sides = np.sign(qty)
+        # a buy fills at or below its limit, a sell at or above
+        due &= np.isnan(limits) | (sides * (limits - prices) >= 0)
+
+        per_unit = np.asarray(self._costs.per_unit(prices))
+        fill_prices = prices + sides * per_unit
+        filled = np.flatnonzero(due)
+        if not len(filled):
+            return ()
+        abs_qty = np.abs(qty[filled])
+        self._traded += float(np.sum(abs_qty))
+        self._total_costs += float(np.dot(abs_qty, per_unit[filled]))
+
+        fills = [
+            FillEvent(
+                timestamp=timestamp,
+                symbol=orders[i].symbol,
+                last_price=price,
+                last_qty=orders[i].qty,
+            )
+            for i, price in zip(filled.tolist(), fill_prices[filled].tolist())
+        ]
+        self._remove(orders, due)
+        return fills
+
+    def _remove(self, orders: list[OrderEvent], filled: np.ndarray) -> None:
+        if filled.all():
+            for symbol in {order.symbol for order in orders}:
+                del self._pending[symbol]
+                self._has_pending[SYMBOLS.intern(symbol)] = False
+            self._pending_count -= len(orders)
+            return
+        keep: dict[str, list[OrderEvent]] = {}
+        for order, done in zip(orders, filled.tolist()):
+            if not done:
+                keep.setdefault(order.symbol, []).append(order)
+        for symbol in {order.symbol for order in orders}:
+            remaining = keep.get(symbol)
+            self._pending_count -= len(self._pending[symbol]) - (len(remaining) if remaining else 0)
+            if remaining:
+                self._pending[symbol] = remaining
+            else:
+                del self._pending[symbol]
+                self._has_pending[SYMBOLS.intern(symbol)] = False
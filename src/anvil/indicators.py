@@ -0,0 +1,413 @@
+'''
+Streaming indicators for Strategy implementations.
+
+Every indicator takes one observation per update() in O(1), amortized for
+the rolling min/max, and keeps only its window in a NumPy ring buffer, so
+a strategy does not need to keep the price history around:
+
+    class MovingAverageCrossover(Strategy):
+        def __init__(self):
+            self._fast = PerSymbol(lambda: SMA(10))
+            self._slow = PerSymbol(lambda: SMA(50))
+            self._cross = PerSymbol(Crossover)
+
+        def on_event(self, event):
+            fast = self._fast.update(event.symbol, event.price)
+            slow = self._slow.update(event.symbol, event.price)
+            if self._cross.update(event.symbol, fast, slow) == 0:
+                return None
+            ...
+
+Values are nan until an indicator has seen enough observations, see
+ready(). warmup() preloads a history array in one vectorized call and
+leaves the indicator in the same state as updating it value by value.
+
+Running sums drift with floating point error over long series, so the
+rolling sums are recomputed from the buffer every time it wraps around.
+'''
+from abc import ABC, abstractmethod
+from collections import deque
+import math
+from typing import Callable, Generic, TypeVar
+
+import numpy as np
+
+I = TypeVar('I')
+
+
+class RingBuffer(object):
+    '''
+    Fixed capacity buffer of the last capacity float values
+    '''
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f'capacity must be positive, got {capacity}')
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._pos = 0
+        self._count = 0
+
+    def push(self, value: float) -> float:
+        '''
+        Append value and return the one it evicted, nan while not full
+        '''
+        evicted = self._values[self._pos] if self._count == len(self._values) else math.nan
+        self._values[self._pos] = value
+        self._pos += 1
+        if self._pos == len(self._values):
+            self._pos = 0
+        if self._count < len(self._values):
+            self._count += 1
+        return float(evicted)
+
+    def extend(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)[-len(self._values):]
+        n = len(values)
+        if n == 0:
+            return
+        # lay the values out as if pushed one by one
+        idx = (self._pos + np.arange(n)) % len(self._values)
+        self._values[idx] = values
+        self._pos = (self._pos + n) % len(self._values)
+        self._count = min(self._count + n, len(self._values))
+
+    def full(self) -> bool:
+        return self._count == len(self._values)
+
+    def wrapped(self) -> bool:
+        '''
+        True right after the write position went back to the start
+        '''
+        return self._pos == 0 and self.full()
+
+    def values(self) -> np.ndarray:
+        '''
+        Buffered values, oldest first
+        '''
+        if not self.full():
+            return self._values[:self._count].copy()
+        return np.concatenate((self._values[self._pos:], self._values[:self._pos]))
+
+    def capacity(self) -> int:
+        return len(self._values)
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class Indicator(ABC):
+    @abstractmethod
+    def update(self, value: float) -> float:
+        '''
+        Add one observation and return the new indicator value
+        '''
+        pass
+
+    @abstractmethod
+    def warmup(self, values: np.ndarray) -> float:
+        '''
+        Add a whole history of observations at once
+        '''
+        pass
+
+    @abstractmethod
+    def value(self) -> float:
+        pass
+
+    @abstractmethod
+    def ready(self) -> bool:
+        pass
+
+
+class SMA(Indicator):
+    '''
+    Simple moving average over the last window observations
+    '''
+    def __init__(self, window: int):
+        self._buffer = RingBuffer(window)
+        self._sum = 0.0
+
+    def update(self, value: float) -> float:
+        evicted = self._buffer.push(value)
+        if self._buffer.wrapped():
+            self._sum = float(np.sum(self._buffer.values()))
+        else:
+            self._sum += value if math.isnan(evicted) else value - evicted
+        return self.value()
+
+    def warmup(self, values: np.ndarray) -> float:
+        self._buffer.extend(values)
+        self._sum = float(np.sum(self._buffer.values()))
+        return self.value()
+
+    def value(self) -> float:
+        if not self._buffer.full():
+            return math.nan
+        return self._sum / self._buffer.capacity()
+
+    def ready(self) -> bool:
+        return self._buffer.full()
+
+
+class EMA(Indicator):
+    '''
+    Exponential moving average with smoothing factor alpha, or
+    alpha = 2 / (span + 1), started at the first observation.
+    ready() after span observations, or one when given alpha.
+    '''
+    def __init__(self, span: int | None = None, alpha: float | None = None):
+        if (span is None) == (alpha is None):
+            raise ValueError('exactly one of span and alpha is required')
+        if alpha is None:
+            alpha = 2.0 / (span + 1.0) # type: ignore
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError(f'alpha must be in (0, 1], got {alpha}')
+        self._alpha = alpha
+        self._min_count = span if span is not None else 1
+        self._value = math.nan
+        self._count = 0
+
+    def update(self, value: float) -> float:
+        if self._count == 0:
+            self._value = value
+        else:
+            self._value += self._alpha * (value - self._value)
+        self._count += 1
+        return self.value()
+
+    def warmup(self, values: np.ndarray) -> float:
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return self.value()
+        decay = 1.0 - self._alpha
+        # ema_n = decay^n * start + alpha * sum(decay^(n-1-i) * x_i)
+        weights = self._alpha * decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        if self._count == 0:
+            weights[0] = decay ** (n - 1)
+            start = 0.0
+        else:
+            start = self._value * decay ** n
+        self._value = float(start + np.dot(weights, values))
+        self._count += n
+        return self.value()
+
+    def value(self) -> float:
+        return self._value if self.ready() else math.nan
+
+    def ready(self) -> bool:
+        return self._count >= self._min_count
+
+
+class RollingVariance(Indicator):
+    '''
+    Variance over the last window observations with ddof degrees of
+    freedom, updated with Welford's method for a sliding window
+    '''
+    def __init__(self, window: int, ddof: int = 1):
+        if window <= ddof:
+            raise ValueError(f'window must be larger than ddof {ddof}, got {window}')
+        self._buffer = RingBuffer(window)
+        self._ddof = ddof
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value: float) -> float:
+        evicted = self._buffer.push(value)
+        n = len(self._buffer)
+        if self._buffer.wrapped():
+            self._resync()
+        elif math.isnan(evicted):
+            delta = value - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (value - self._mean)
+        else:
+            mean = self._mean
+            self._mean += (value - evicted) / n
+            self._m2 += (value - evicted) * (value - self._mean + evicted - mean)
+        return self.value()
+
+    def warmup(self, values: np.ndarray) -> float:
+        self._buffer.extend(values)
+        self._resync()
+        return self.value()
+
+    def value(self) -> float:
+        if not self._buffer.full():
+            return math.nan
+        return max(self._m2, 0.0) / (len(self._buffer) - self._ddof)
+
+    def ready(self) -> bool:
+        return self._buffer.full()
+
+    def mean(self) -> float:
+        return self._mean if self._buffer.full() else math.nan
+
+    def _resync(self) -> None:
+        values = self._buffer.values()
+        self._mean = float(np.mean(values)) if len(values) else 0.0
+        self._m2 = float(np.sum((values - self._mean) ** 2))
+
+
+class RollingStd(RollingVariance):
+    '''
+    Standard deviation over the last window observations
+    '''
+    def value(self) -> float:
+        return math.sqrt(super().value())
+
+
+class _RollingExtreme(Indicator):
+    '''
+    Monotonic deque of (index, value) candidates for the extreme of the
+    window, the front holding the current one. Each observation enters and
+    leaves the deque once, so updates are amortized O(1).
+    '''
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError(f'window must be positive, got {window}')
+        self._window = window
+        self._count = 0
+        self._candidates: deque[tuple[int, float]] = deque()
+
+    @abstractmethod
+    def _dominates(self, a: float, b: float) -> bool:
+        '''
+        True if a makes an older b irrelevant
+        '''
+        pass
+
+    @abstractmethod
+    def _dominates_array(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def _suffix_extreme(self, values: np.ndarray) -> np.ndarray:
+        '''
+        Extreme of the values strictly after each position
+        '''
+        pass
+
+    def update(self, value: float) -> float:
+        candidates = self._candidates
+        while candidates and self._dominates(value, candidates[-1][1]):
+            candidates.pop()
+        candidates.append((self._count, value))
+        self._count += 1
+        if candidates[0][0] <= self._count - 1 - self._window:
+            candidates.popleft()
+        return self.value()
+
+    def warmup(self, values: np.ndarray) -> float:
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return self.value()
+        if n < self._window:
+            # older candidates may still be in the window
+            for value in values:
+                self.update(float(value))
+            return self.value()
+        tail = values[-self._window:]
+        # a value stays a candidate when no later value in the window
+        # dominates it, i.e. it beats the extreme of everything after it
+        after = self._suffix_extreme(tail)
+        keep = np.flatnonzero(~self._dominates_array(after, tail))
+        start = self._count + n - self._window
+        self._candidates = deque(
+            (start + int(i), float(tail[i])) for i in keep
+        )
+        self._count += n
+        return self.value()
+
+    def value(self) -> float:
+        return self._candidates[0][1] if self.ready() else math.nan
+
+    def ready(self) -> bool:
+        return self._count >= self._window
+
+
+class RollingMin(_RollingExtreme):
+    def _dominates(self, a: float, b: float) -> bool:
+        return a <= b
+
+    def _dominates_array(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return a <= b
+
+    def _suffix_extreme(self, values: np.ndarray) -> np.ndarray:
+        after = np.minimum.accumulate(values[::-1])[::-1]
+        return np.append(after[1:], np.inf)
+
+
+class RollingMax(_RollingExtreme):
+    def _dominates(self, a: float, b: float) -> bool:
+        return a >= b
+
+    def _dominates_array(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return a >= b
+
+    def _suffix_extreme(self, values: np.ndarray) -> np.ndarray:
+        after = np.maximum.accumulate(values[::-1])[::-1]
+        return np.append(after[1:], -np.inf)
+
+
+class Crossover(object):
+    '''
+    Detects a crossing over b: update() returns +1 when a moves from below b
+    to above it, -1 for the opposite and 0 otherwise. Observations with a
+    nan side, e.g. indicators still warming up, are ignored, and touching
+    without crossing keeps the previous side.
+    '''
+    def __init__(self):
+        self._side = 0
+
+    def update(self, a: float, b: float) -> int:
+        if math.isnan(a) or math.isnan(b) or a == b:
+            return 0
+        side = 1 if a > b else -1
+        previous, self._side = self._side, side
+        if previous == 0 or previous == side:
+            return 0
+        return side
+
+    def warmup(self, a: np.ndarray, b: np.ndarray) -> int:
+        diff = np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)
+        sides = np.sign(diff[~np.isnan(diff) & (diff != 0)])
+        if len(sides):
+            self._side = int(sides[-1])
+        return 0
+
+    def side(self) -> int:
+        '''
+        +1 if a was last above b, -1 if below, 0 before any observation
+        '''
+        return self._side
+
+
+class PerSymbol(Generic[I]):
+    '''
+    One indicator per symbol, created by factory on first use
+    '''
+    def __init__(self, factory: Callable[[], I]):
+        self._factory = factory
+        self._indicators: dict[str, I] = {}
+
+    def __getitem__(self, symbol: str) -> I:
+        indicator = self._indicators.get(symbol)
+        if indicator is None:
+            indicator = self._indicators[symbol] = self._factory()
+        return indicator
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._indicators
+
+    def __len__(self) -> int:
+        return len(self._indicators)
+
+    def symbols(self) -> list[str]:
+        return list(self._indicators)
+
+    def update(self, symbol: str, *values: float) -> float:
+        return self[symbol].update(*values) # type: ignore
+
+    def warmup(self, symbol: str, *values: np.ndarray) -> float:
+        return self[symbol].warmup(*values) # type: ignore
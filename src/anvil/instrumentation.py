@@ -0,0 +1,399 @@
+'''
+Opt-in instrumentation of the event core.
+
+Passing an Instrumentation to EventSequencer (and MbteProcessor) makes them
+install timing proxies around the merge queue, the event stores, the event
+processor and the strategy/portfolio/execution chain. Without it nothing is
+wrapped, so the hot path is unchanged.
+
+Stages are named as ';' separated paths so that dump_folded() can write
+them in the folded stack format read by flamegraph.pl and speedscope:
+    queue;add, queue;pop          merge queue operations
+    timers;add, timers;pop        calendar queue operations
+    store;peek, store;pop         EventStore calls, including batch variants
+    store;seek                    EventStore.seek
+    process                       EventProcessor.process
+    process;strategy              Strategy.on_event
+    process;portfolio             Portfolio.on_signal / on_fill
+    process;execution             Execution.receive
+'''
+from collections import Counter
+from datetime import datetime, timedelta
+import logging
+from time import perf_counter_ns
+from typing import Any, Collection, Sequence, TypeVar
+
+from anvil.core import Execution, Portfolio, Strategy
+from anvil.event_processing import (
+    CalendarQueue,
+    EventProcessor,
+    EventStore,
+    MbtePriorityQueue,
+)
+from anvil.events import Event, FillEvent, MarketSliceEvent, OrderEvent, SignalEvent
+from anvil.routing import Subscription
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class Histogram(object):
+    '''
+    Histogram of durations in nanoseconds with power of two buckets
+    '''
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets: Counter[int] = Counter()
+
+    def record(self, duration_ns: int) -> None:
+        self.count += 1
+        self.total_ns += duration_ns
+        if duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+        # bucket b holds durations in [2^(b-1), 2^b)
+        self.buckets[duration_ns.bit_length()] += 1
+
+    def mean_ns(self) -> float:
+        return self.total_ns / self.count if self.count else 0.0
+
+    def percentile_ns(self, q: float) -> int:
+        '''
+        Upper bound of the bucket holding the q-th percentile, 0 <= q <= 100
+        '''
+        if not self.count:
+            return 0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return (1 << bucket) - 1
+        return self.max_ns
+
+
+class Instrumentation(object):
+    '''
+    Collects per-stage wall time histograms, event counts by type and by
+    store, peak queue depths and schedule/cancel counts of a run.
+
+    With folded_path, the folded stacks are written there when
+    EventSequencer.run() finishes. The summary report is logged at INFO.
+    '''
+    def __init__(self, folded_path: str | None = None):
+        self.folded_path = folded_path
+        self.stages: dict[str, Histogram] = {}
+        self.events_by_type: Counter[str] = Counter()
+        self.events_by_store: Counter[str] = Counter()
+        self.peak_depth: Counter[str] = Counter()
+        self.schedule_count = 0
+        self.cancel_count = 0
+        self.run_ns = 0
+
+    def record(self, stage: str, duration_ns: int) -> None:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.record(duration_ns)
+
+    def record_depth(self, queue: str, depth: int) -> None:
+        if depth > self.peak_depth[queue]:
+            self.peak_depth[queue] = depth
+
+    def count_schedule(self) -> None:
+        self.schedule_count += 1
+
+    def count_cancel(self) -> None:
+        self.cancel_count += 1
+
+    def run_finished(self, run_ns: int) -> None:
+        self.run_ns += run_ns
+        if self.folded_path is not None:
+            with open(self.folded_path, 'w') as f:
+                f.write(self.dump_folded())
+        logger.info('event sequencer run profile\n%s', self.report())
+
+    ##################### wrapping #####################
+
+    def priority_queue(self) -> MbtePriorityQueue:
+        return _TimedPriorityQueue(self)
+
+    def calendar_queue(self, resolution: timedelta | int) -> CalendarQueue:
+        return _TimedCalendarQueue(self, resolution)
+
+    def wrap_store(self, event_store: EventStore) -> EventStore:
+        return _TimedEventStore(self, event_store)
+
+    def wrap_processor(self, event_processor: EventProcessor) -> EventProcessor:
+        return _TimedEventProcessor(self, event_processor)
+
+    def wrap_strategy(self, strategy: Strategy) -> Strategy:
+        return _TimedStrategy(self, strategy)
+
+    def wrap_portfolio(self, portfolio: Portfolio) -> Portfolio:
+        return _TimedPortfolio(self, portfolio)
+
+    def wrap_execution(self, execution: Execution) -> Execution:
+        return _TimedExecution(self, execution)
+
+    ##################### output #####################
+
+    def report(self) -> str:
+        lines = [f'run: {self.run_ns / 1e6:.3f} ms']
+        lines.append(
+            f'{"stage":<20}{"count":>12}{"total ms":>12}{"mean ns":>12}'
+            f'{"p50 ns":>12}{"p99 ns":>12}{"max ns":>12}'
+        )
+        for stage in sorted(self.stages):
+            h = self.stages[stage]
+            lines.append(
+                f'{stage:<20}{h.count:>12}{h.total_ns / 1e6:>12.3f}{h.mean_ns():>12.0f}'
+                f'{h.percentile_ns(50):>12}{h.percentile_ns(99):>12}{h.max_ns:>12}'
+            )
+        lines.append('events by type:')
+        lines.extend(f'  {name}: {count}' for name, count in self.events_by_type.most_common())
+        lines.append('events by store:')
+        lines.extend(f'  {name}: {count}' for name, count in self.events_by_store.most_common())
+        lines.append('peak queue depth:')
+        lines.extend(f'  {name}: {depth}' for name, depth in sorted(self.peak_depth.items()))
+        lines.append(f'scheduled: {self.schedule_count}, cancelled: {self.cancel_count}')
+        return '\n'.join(lines)
+
+    def dump_folded(self, root: str = 'run') -> str:
+        '''
+        Folded stacks, one 'frame;frame value' line per stage with the
+        stage's own time in nanoseconds, children excluded. Time of the run
+        not spent in any stage is attributed to the root frame.
+        '''
+        self_ns = {stage: h.total_ns for stage, h in self.stages.items()}
+        top_level_ns = 0
+        for stage, h in self.stages.items():
+            parent = stage.rpartition(';')[0]
+            if parent in self_ns:
+                self_ns[parent] -= h.total_ns
+            else:
+                top_level_ns += h.total_ns
+        lines = []
+        if self.run_ns > top_level_ns:
+            lines.append(f'{root} {self.run_ns - top_level_ns}')
+        lines.extend(
+            f'{root};{stage} {max(ns, 0)}' for stage, ns in sorted(self_ns.items())
+        )
+        return '\n'.join(lines) + '\n'
+
+
+class _Forwarding(object):
+    '''
+    Forwards attributes the proxy does not define to the wrapped object
+    '''
+    _wrapped: Any
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._wrapped, name)
+
+
+class _TimedPriorityQueue(MbtePriorityQueue[K, V]):
+    def __init__(self, instrumentation: Instrumentation):
+        super().__init__()
+        self._instrumentation = instrumentation
+
+    def add(self, key: K, value: V, seq: int | None = None):
+        start = perf_counter_ns()
+        super().add(key, value, seq)
+        self._instrumentation.record('queue;add', perf_counter_ns() - start)
+        self._instrumentation.record_depth('queue', len(self._queue))
+
+    def pop(self) -> tuple[K, int, V] | None:
+        start = perf_counter_ns()
+        head = super().pop()
+        self._instrumentation.record('queue;pop', perf_counter_ns() - start)
+        return head
+
+
+class _TimedCalendarQueue(CalendarQueue[K, V]):
+    def __init__(self, instrumentation: Instrumentation, resolution: timedelta | int):
+        super().__init__(resolution)
+        self._instrumentation = instrumentation
+
+    def add(self, key: K, seq: int, value: V):
+        start = perf_counter_ns()
+        super().add(key, seq, value)
+        self._instrumentation.record('timers;add', perf_counter_ns() - start)
+        self._instrumentation.record_depth('timers', len(self))
+
+    def pop(self) -> tuple[K, int, V] | None:
+        start = perf_counter_ns()
+        head = super().pop()
+        self._instrumentation.record('timers;pop', perf_counter_ns() - start)
+        return head
+
+
+class _TimedEventStore(_Forwarding, EventStore):
+    '''
+    Times and counts the calls into the wrapped store, anything else is
+    forwarded unchanged
+    '''
+    def __init__(self, instrumentation: Instrumentation, event_store: EventStore):
+        self._instrumentation = instrumentation
+        self._wrapped = event_store
+        self._name = event_store.name()
+
+    def name(self) -> str:
+        return self._name
+
+    def peek(self) -> Event | None:
+        start = perf_counter_ns()
+        head = self._wrapped.peek()
+        self._instrumentation.record('store;peek', perf_counter_ns() - start)
+        return head
+
+    def pop(self) -> Event | None:
+        start = perf_counter_ns()
+        head = self._wrapped.pop()
+        self._instrumentation.record('store;pop', perf_counter_ns() - start)
+        if head is not None:
+            self._instrumentation.events_by_store[self._name] += 1
+        return head
+
+    def peek_batch(
+            self,
+            until: datetime | None = None,
+            max_count: int = 1,
+    ) -> Sequence[Event]:
+        start = perf_counter_ns()
+        events = self._wrapped.peek_batch(until, max_count)
+        self._instrumentation.record('store;peek', perf_counter_ns() - start)
+        return events
+
+    def pop_batch(self, count: int) -> int:
+        start = perf_counter_ns()
+        popped = self._wrapped.pop_batch(count)
+        self._instrumentation.record('store;pop', perf_counter_ns() - start)
+        self._instrumentation.events_by_store[self._name] += popped
+        return popped
+
+    def peek_ns(self) -> int | None:
+        start = perf_counter_ns()
+        head_ns = self._wrapped.peek_ns()
+        self._instrumentation.record('store;peek', perf_counter_ns() - start)
+        return head_ns
+
+    def peek_batch_ns(
+            self,
+            until_ns: int | None = None,
+            max_count: int = 1,
+    ) -> tuple[Sequence[int], Sequence[Event]]:
+        start = perf_counter_ns()
+        batch = self._wrapped.peek_batch_ns(until_ns, max_count)
+        self._instrumentation.record('store;peek', perf_counter_ns() - start)
+        return batch
+
+    def fingerprint(self) -> str:
+        return self._wrapped.fingerprint()
+
+    def select(
+            self,
+            symbols: Collection[str] | None = None,
+            event_types: Sequence[type[Event]] | None = None,
+    ) -> EventStore:
+        selected = self._wrapped.select(symbols, event_types)
+        if selected is self._wrapped:
+            return self
+        return _TimedEventStore(self._instrumentation, selected)
+
+    def get_state(self) -> object:
+        return self._wrapped.get_state()
+
+    def consumed_at(self, timestamp_ns: int) -> int:
+        return self._wrapped.consumed_at(timestamp_ns)
+
+    def set_state(self, state: object) -> None:
+        self._wrapped.set_state(state)
+
+    def seek(self, timestamp: datetime) -> None:
+        start = perf_counter_ns()
+        self._wrapped.seek(timestamp)
+        self._instrumentation.record('store;seek', perf_counter_ns() - start)
+
+    def pop_slice(self) -> MarketSliceEvent | None:
+        start = perf_counter_ns()
+        event = self._wrapped.pop_slice()
+        self._instrumentation.record('store;pop', perf_counter_ns() - start)
+        if event is not None:
+            self._instrumentation.events_by_store[self._name] += len(event)
+        return event
+
+
+class _TimedEventProcessor(_Forwarding, EventProcessor):
+    def __init__(self, instrumentation: Instrumentation, event_processor: EventProcessor):
+        self._instrumentation = instrumentation
+        self._wrapped = event_processor
+
+    def process(self, event: Event) -> None:
+        start = perf_counter_ns()
+        self._wrapped.process(event)
+        self._instrumentation.record('process', perf_counter_ns() - start)
+        self._instrumentation.events_by_type[type(event).__name__] += 1
+
+
+class _TimedStrategy(_Forwarding, Strategy):
+    def __init__(self, instrumentation: Instrumentation, strategy: Strategy):
+        self._instrumentation = instrumentation
+        self._wrapped = strategy
+
+    def on_event(self, event: Event) -> SignalEvent | Sequence[SignalEvent] | None:
+        start = perf_counter_ns()
+        signal = self._wrapped.on_event(event)
+        self._instrumentation.record('process;strategy', perf_counter_ns() - start)
+        return signal
+
+    def subscription(self) -> Subscription:
+        return self._wrapped.subscription()
+
+    def symbol_independent(self) -> bool:
+        return self._wrapped.symbol_independent()
+
+
+class _TimedPortfolio(_Forwarding, Portfolio):
+    def __init__(self, instrumentation: Instrumentation, portfolio: Portfolio):
+        self._instrumentation = instrumentation
+        self._wrapped = portfolio
+
+    def on_signal(self, signal: SignalEvent) -> OrderEvent | None:
+        start = perf_counter_ns()
+        order = self._wrapped.on_signal(signal)
+        self._instrumentation.record('process;portfolio', perf_counter_ns() - start)
+        return order
+
+    def on_fill(self, fill: FillEvent) -> OrderEvent | None:
+        start = perf_counter_ns()
+        order = self._wrapped.on_fill(fill)
+        self._instrumentation.record('process;portfolio', perf_counter_ns() - start)
+        return order
+
+    def on_market(self, event: Event) -> None:
+        start = perf_counter_ns()
+        self._wrapped.on_market(event)
+        self._instrumentation.record('process;portfolio', perf_counter_ns() - start)
+
+
+class _TimedExecution(_Forwarding, Execution):
+    def __init__(self, instrumentation: Instrumentation, execution: Execution):
+        self._instrumentation = instrumentation
+        self._wrapped = execution
+
+    def receive(self, order: OrderEvent) -> None:
+        start = perf_counter_ns()
+        self._wrapped.receive(order)
+        self._instrumentation.record('process;execution', perf_counter_ns() - start)
+
+    def on_market(self, event: Event) -> Sequence[FillEvent]:
+        start = perf_counter_ns()
+        fills = self._wrapped.on_market(event)
+        self._instrumentation.record('process;execution', perf_counter_ns() - start)
+        return fills
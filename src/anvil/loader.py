@@ -0,0 +1,411 @@
+'''
+Chunked market data loading from CSV and Parquet files.
+
+MarketDataStore streams MarketOpenEvent/MarketCloseEvent from one file, a
+list of files or a directory of daily partitions, reading CSV in chunks
+and Parquet by row group, so the first event is available long before the
+whole archive is read. Only the requested [start, end) range and symbols
+are kept:
+    - partitions whose date in the file name falls outside the range are
+      skipped without being opened
+    - Parquet row groups are skipped on their timestamp and symbol column
+      statistics, and only the needed columns are read
+    - CSV reading stops at the first chunk past end
+
+Expected columns, renamed through columns= if they differ:
+    timestamp   datetime strings, datetime64 or int64 epoch nanoseconds
+    symbol      str
+    price       float
+    volume      float, optional, 0 if missing
+    kind        optional 'open'/'close' or the int8 codes of
+                MARKET_EVENT_TYPES, close if missing
+
+Rows must be sorted by timestamp within a file and files must not overlap
+in time. Parquet support needs pyarrow.
+
+Wrap the store in a PrefetchingEventStore to also move the decoding off
+the simulation thread.
+'''
+from datetime import datetime, timedelta
+import glob
+import itertools
+import logging
+import os
+import re
+from typing import Collection, Iterable, Iterator, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from anvil.clock import datetime_to_ns, ns_to_datetime
+from anvil.event_processing import ArrayEventStore, EventStore, to_ns_array
+from anvil.events import Event, MarketSliceEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 100_000
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.zip', '.csv.xz')
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+KIND_NAMES = {'open': ArrayEventStore.OPEN, 'close': ArrayEventStore.CLOSE}
+
+# YYYY-MM-DD or YYYYMMDD in the file name, not part of a longer run of
+# letters or digits
+_PARTITION_DATE = re.compile(r'(?<![0-9A-Za-z])(\d{4})(-?)(\d{2})\2(\d{2})(?![0-9A-Za-z])')
+
+
+class ChunkedEventStore(EventStore):
+    '''
+    EventStore over a stream of ArrayEventStore chunks, each taken from the
+    iterable only when the previous one is exhausted. Chunks must follow
+    each other in timestamp order. Batches do not cross chunk boundaries,
+    slices do.
+    '''
+    def __init__(self, name: str, chunks: Iterable[ArrayEventStore]):
+        super().__init__()
+        self._name = name
+        self._chunks: Iterator[ArrayEventStore] = iter(chunks)
+        self._current: ArrayEventStore | None = None
+        self._exhausted = False
+        # events of timestamp _carry_ns at the end of the finished chunks,
+        # for the checkpoint cursor when a timestamp straddles chunks
+        self._carry_ns: int | None = None
+        self._carry = 0
+
+    def name(self) -> str:
+        return self._name
+
+    def peek(self) -> Event | None:
+        chunk = self._ensure_chunk()
+        return None if chunk is None else chunk.peek()
+
+    def pop(self) -> Event | None:
+        chunk = self._ensure_chunk()
+        return None if chunk is None else chunk.pop()
+
+    def peek_ns(self) -> int | None:
+        chunk = self._ensure_chunk()
+        return None if chunk is None else chunk.peek_ns()
+
+    def peek_batch(
+            self,
+            until: datetime | None = None,
+            max_count: int = 1,
+    ) -> Sequence[Event]:
+        chunk = self._ensure_chunk()
+        return [] if chunk is None else chunk.peek_batch(until, max_count)
+
+    def peek_batch_ns(
+            self,
+            until_ns: int | None = None,
+            max_count: int = 1,
+    ) -> tuple[Sequence[int], Sequence[Event]]:
+        chunk = self._ensure_chunk()
+        return ([], []) if chunk is None else chunk.peek_batch_ns(until_ns, max_count)
+
+    def pop_batch(self, count: int) -> int:
+        popped = 0
+        while popped < count:
+            chunk = self._ensure_chunk()
+            if chunk is None:
+                break
+            popped += chunk.pop_batch(count - popped)
+        return popped
+
+    def seek(self, timestamp: datetime) -> None:
+        '''
+        Forward only, chunks before timestamp are skipped as a whole
+        '''
+        timestamp_ns = datetime_to_ns(timestamp)
+        while (chunk := self._ensure_chunk()) is not None:
+            if chunk.peek_ns() >= timestamp_ns: # type: ignore
+                return
+            chunk.seek_ns(timestamp_ns)
+
+    def select(
+            self,
+            symbols: Collection[str] | None = None,
+            event_types: Sequence[type[Event]] | None = None,
+    ) -> 'ChunkedEventStore':
+        '''
+        Chunks are filtered as they are read
+        '''
+        chunk = self._ensure_chunk()
+        remaining = itertools.chain([] if chunk is None else [chunk], self._chunks)
+        self._chunks = iter(())
+        self._exhausted = True
+        return ChunkedEventStore(
+            self._name,
+            (chunk.select(symbols, event_types) for chunk in remaining),
+        )
+
+    def get_state(self) -> object:
+        '''
+        The head timestamp and the events of it already consumed, restored
+        by reading forward from the start of the stream
+        '''
+        return self._stream_state()
+
+    def set_state(self, state: object) -> None:
+        self._restore_stream_state(state) # type: ignore
+
+    def consumed_at(self, timestamp_ns: int) -> int:
+        chunk = self._current
+        if chunk is None:
+            return 0
+        consumed = chunk.consumed_at(timestamp_ns)
+        timestamps = chunk.timestamps_ns()
+        if self._carry_ns == timestamp_ns and (
+                not len(timestamps) or timestamps[0] == timestamp_ns):
+            consumed += self._carry
+        return consumed
+
+    def pop_slice(self) -> MarketSliceEvent | None:
+        chunk = self._ensure_chunk()
+        if chunk is None:
+            return None
+        head_ns = chunk.peek_ns()
+        slices = [chunk.pop_slice()]
+        # the rows of one timestamp can straddle a chunk boundary
+        while (chunk := self._ensure_chunk()) is not None and chunk.peek_ns() == head_ns:
+            slices.append(chunk.pop_slice())
+        return slices[0] if len(slices) == 1 else MarketSliceEvent.concat(slices) # type: ignore
+
+    def _ensure_chunk(self) -> ArrayEventStore | None:
+        while self._current is None or self._current.peek_ns() is None:
+            if self._exhausted:
+                return None
+            if self._current is not None and len(self._current):
+                last_ns = int(self._current.timestamps_ns()[-1])
+                run = self._current.consumed_at(last_ns)
+                if run == len(self._current) and self._carry_ns == last_ns:
+                    self._carry += run
+                else:
+                    self._carry_ns, self._carry = last_ns, run
+            self._current = next(self._chunks, None)
+            if self._current is None:
+                self._exhausted = True
+        return self._current
+
+
+class MarketDataStore(ChunkedEventStore):
+    '''
+    ChunkedEventStore reading market data files, see the module docstring.
+
+    :param paths: a file, a list of files or a directory holding them
+    :param start: first timestamp to include
+    :param end: timestamps from end on are excluded
+    :param symbols: symbols to include, all if None
+    :param columns: maps the expected column names to the file's names
+    :param chunk_size: rows per CSV chunk
+    :param partition_span: time covered by a file with a date in its name
+    '''
+    def __init__(
+            self,
+            paths: str | os.PathLike | Sequence[str | os.PathLike],
+            start: datetime | None = None,
+            end: datetime | None = None,
+            symbols: Sequence[str] | None = None,
+            name: str | None = None,
+            columns: Mapping[str, str] | None = None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            partition_span: timedelta = timedelta(days=1),
+    ):
+        files = _list_files(paths)
+        self._files = [
+            path for path in files
+            if _partition_overlaps(path, start, end, partition_span)
+        ]
+        self._start = start
+        self._partition_span = partition_span
+        self._start_ns = None if start is None else datetime_to_ns(start)
+        self._end_ns = None if end is None else datetime_to_ns(end)
+        self._symbols = None if symbols is None else sorted(set(symbols))
+        self._columns = dict(columns or {})
+        self._chunk_size = chunk_size
+        if name is None:
+            name = os.fspath(paths) if isinstance(paths, (str, os.PathLike)) else 'market-data'
+        super().__init__(name, self._read_chunks())
+        logger.debug(
+            'selected market data files',
+            extra={'event_store': name, 'selected': len(self._files), 'total': len(files)},
+        )
+
+    def files(self) -> list[str]:
+        '''
+        Files left to read after partition pruning
+        '''
+        return list(self._files)
+
+    def seek(self, timestamp: datetime) -> None:
+        '''
+        Forward only. Files and rows before timestamp that have not been 
+        read yet are skipped without being read.
+        '''
+        timestamp_ns = datetime_to_ns(timestamp)
+        if self._start_ns is None or timestamp_ns > self._start_ns:
+            self._start = timestamp
+            self._start_ns = timestamp_ns
+        super().seek(timestamp)
+
+    def _read_chunks(self) -> Iterator[ArrayEventStore]:
+        last_ns: int | None = None
+        for path in self._files:
+            # seek() may have moved start past the partition
+            if not _partition_overlaps(path, self._start, None, self._partition_span):
+                continue
+            if path.endswith(PARQUET_SUFFIXES):
+                frames = self._read_parquet(path)
+            else:
+                frames = self._read_csv(path)
+            for frame in frames:
+                chunk = self._to_store(frame)
+                if chunk is None:
+                    continue
+                first_ns = chunk.peek_ns()
+                if last_ns is not None and first_ns < last_ns: # type: ignore
+                    raise ValueError(f'{path} overlaps the data read before it')
+                last_ns = int(frame['timestamp'].iloc[-1])
+                yield chunk
+
+    def _read_csv(self, path: str) -> Iterator[pd.DataFrame]:
+        usecols = lambda column: column in self._source_columns()
+        with pd.read_csv(path, usecols=usecols, chunksize=self._chunk_size) as reader:
+            for frame in reader:
+                frame = self._convert(frame)
+                yield self._filter(frame)
+                if self._end_ns is not None and len(frame) and frame['timestamp'].iloc[-1] >= self._end_ns:
+                    # rows are sorted, nothing further can be in range
+                    return
+
+    def _read_parquet(self, path: str) -> Iterator[pd.DataFrame]:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError('reading Parquet market data requires pyarrow') from e
+
+        parquet_file = pq.ParquetFile(path)
+        schema_names = parquet_file.schema_arrow.names
+        read_columns = [column for column in self._source_columns() if column in schema_names]
+        metadata = parquet_file.metadata
+        for i in range(metadata.num_row_groups):
+            if not self._row_group_overlaps(metadata.row_group(i), schema_names):
+                continue
+            frame = parquet_file.read_row_group(i, columns=read_columns).to_pandas()
+            yield self._filter(self._convert(frame))
+
+    def _row_group_overlaps(self, row_group, schema_names: list[str]) -> bool: # type: ignore
+        timestamp = self._columns.get('timestamp', 'timestamp')
+        symbol = self._columns.get('symbol', 'symbol')
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            stats = column.statistics
+            if stats is None or not stats.has_min_max:
+                continue
+            name = column.path_in_schema
+            if name == timestamp:
+                lo, hi = _stat_ns(stats.min), _stat_ns(stats.max)
+                if hi is not None and isinstance(stats.max, datetime):
+                    # datetime statistics are truncated to microseconds
+                    hi += 999
+                if self._start_ns is not None and hi is not None and hi < self._start_ns:
+                    return False
+                if self._end_ns is not None and lo is not None and lo >= self._end_ns:
+                    return False
+            elif name == symbol and self._symbols is not None:
+                lo, hi = str(stats.min), str(stats.max)
+                if not any(lo <= s <= hi for s in self._symbols):
+                    return False
+        return True
+
+    def _source_columns(self) -> set[str]:
+        return {
+            self._columns.get(column, column)
+            for column in ('timestamp', 'symbol', 'price', 'volume', 'kind')
+        }
+
+    def _convert(self, frame: pd.DataFrame) -> pd.DataFrame:
+        '''
+        Rename to the expected columns and convert timestamps to int64 ns
+        '''
+        frame = frame.rename(columns={v: k for k, v in self._columns.items()})
+        timestamps = frame['timestamp']
+        if timestamps.dtype == object or pd.api.types.is_string_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps)
+        if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+            timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+        return frame.assign(timestamp=to_ns_array(timestamps.to_numpy()))
+
+    def _filter(self, frame: pd.DataFrame) -> pd.DataFrame:
+        mask = np.ones(len(frame), dtype=bool)
+        timestamps = frame['timestamp'].to_numpy()
+        if self._start_ns is not None:
+            mask &= timestamps >= self._start_ns
+        if self._end_ns is not None:
+            mask &= timestamps < self._end_ns
+        if self._symbols is not None:
+            mask &= frame['symbol'].isin(self._symbols).to_numpy()
+        return frame if mask.all() else frame[mask]
+
+    def _to_store(self, frame: pd.DataFrame) -> ArrayEventStore | None:
+        if not len(frame):
+            return None
+        n = len(frame)
+        kinds = None
+        if 'kind' in frame:
+            kinds = frame['kind'].to_numpy()
+            if kinds.dtype == object or pd.api.types.is_string_dtype(frame['kind']):
+                kinds = np.array([KIND_NAMES[str(kind).lower()] for kind in kinds], dtype=np.int8)
+        return ArrayEventStore.from_columns(
+            self.name(),
+            timestamps=frame['timestamp'].to_numpy(),
+            symbols=frame['symbol'].astype(str).to_numpy(),
+            prices=frame['price'].to_numpy(dtype=np.float64),
+            volumes=frame['volume'].to_numpy(dtype=np.float64) if 'volume' in frame else np.zeros(n),
+            kinds=kinds,
+        )
+
+
+def _list_files(paths: str | os.PathLike | Sequence[str | os.PathLike]) -> list[str]:
+    if isinstance(paths, (str, os.PathLike)):
+        path = os.fspath(paths)
+        if not os.path.isdir(path):
+            return [path]
+        # partitions may be nested, e.g. year=2024/2024-01-02.parquet
+        candidates = glob.glob(os.path.join(path, '**', '*'), recursive=True)
+        return sorted(
+            candidate for candidate in candidates
+            if candidate.endswith(CSV_SUFFIXES + PARQUET_SUFFIXES)
+        )
+    return [os.fspath(path) for path in paths]
+
+
+def _partition_overlaps(
+        path: str,
+        start: datetime | None,
+        end: datetime | None,
+        span: timedelta,
+) -> bool:
+    # partition dates are taken as UTC, like naive timestamps elsewhere
+    match = _PARTITION_DATE.search(os.path.basename(path))
+    if match is None:
+        return True
+    year, _, month, day = match.groups()
+    try:
+        partition_start = datetime.strptime(year + month + day, '%Y%m%d')
+    except ValueError:
+        return True
+    if end is not None and partition_start >= ns_to_datetime(datetime_to_ns(end)):
+        return False
+    if start is not None and partition_start + span <= ns_to_datetime(datetime_to_ns(start)):
+        return False
+    return True
+
+
+def _stat_ns(value: object) -> int | None:
+    if isinstance(value, datetime):
+        return datetime_to_ns(value)
+    if isinstance(value, pd.Timestamp):
+        return int(value.value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return None
@@ -0,0 +1,218 @@
+'''
+Performance metrics listed in the README: cumulative return, drawdown,
+simple Sharpe and turnover.
+
+compute_metrics() works on a whole equity curve, StreamingMetrics updates
+the same metrics in constant time and memory per sample, and 
+MetricsProcessor feeds it from the event flow.
+'''
+from datetime import datetime
+import math
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from anvil.event_processing import EventProcessor
+from anvil.events import Event, MarketCloseEvent, MarketSliceEvent
+
+PERIODS_PER_YEAR = 252.0
+
+
+class Metrics(NamedTuple):
+    total_pnl: float
+    total_costs: float
+    cumulative_return: float
+    max_drawdown: float
+    sharpe: float
+    turnover: float
+    periods: int
+
+
+def compute_metrics(
+        equity: np.ndarray,
+        initial_capital: float,
+        traded: np.ndarray | None = None,
+        costs: np.ndarray | None = None,
+        periods_per_year: float = PERIODS_PER_YEAR,
+) -> Metrics:
+    '''
+    Metrics of an equity curve sampled once per period.
+
+    :param equity: equity at the end of each period
+    :param initial_capital: equity before the first period
+    :param traded: absolute traded quantity per period, sums to turnover
+    :param costs: transaction costs per period
+    :param periods_per_year: annualization factor of the Sharpe ratio
+    '''
+    if not initial_capital > 0:
+        raise ValueError(f'initial_capital must be positive, got {initial_capital}')
+    equity = np.asarray(equity, dtype=np.float64)
+    n = len(equity)
+    if n == 0:
+        return Metrics(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0)
+
+    previous = np.concatenate(([initial_capital], equity[:-1]))
+    returns = (equity - previous) / previous
+    peak = np.maximum.accumulate(np.concatenate(([initial_capital], equity)))
+    drawdown = 1.0 - equity / peak[1:]
+
+    return Metrics(
+        total_pnl=float(equity[-1] - initial_capital),
+        total_costs=0.0 if costs is None else float(np.sum(costs)),
+        cumulative_return=float(equity[-1] / initial_capital - 1.0),
+        max_drawdown=float(max(np.max(drawdown), 0.0)),
+        sharpe=sharpe_ratio(returns, periods_per_year),
+        turnover=0.0 if traded is None else float(np.sum(np.abs(traded))),
+        periods=n,
+    )
+
+
+def sharpe_ratio(returns: np.ndarray, periods_per_year: float = PERIODS_PER_YEAR) -> float:
+    '''
+    Annualized mean over sample standard deviation of per-period returns,
+    zero when there is no variation
+    '''
+    if len(returns) < 2:
+        return 0.0
+    std = float(np.std(returns, ddof=1))
+    if std == 0.0:
+        return 0.0
+    return float(np.mean(returns)) / std * float(np.sqrt(periods_per_year))
+
+
+class StreamingMetrics(object):
+    '''
+    Online version of compute_metrics(). Returns are accumulated with 
+    Welford's method and drawdown with a running peak, so nothing grows 
+    with the number of samples.
+    '''
+    def __init__(self, initial_capital: float, periods_per_year: float = PERIODS_PER_YEAR):
+        if not initial_capital > 0:
+            raise ValueError(f'initial_capital must be positive, got {initial_capital}')
+        self._initial_capital = initial_capital
+        self._periods_per_year = periods_per_year
+        self._equity = initial_capital
+        self._peak = initial_capital
+        self._max_drawdown = 0.0
+        self._turnover = 0.0
+        self._costs = 0.0
+        # Welford accumulators of per-period returns
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, equity: float, traded: float = 0.0, costs: float = 0.0) -> None:
+        '''
+        Add one period ending at equity, with the absolute quantity traded 
+        and the costs paid during the period
+        '''
+        ret = (equity - self._equity) / self._equity
+        self._equity = equity
+
+        self._count += 1
+        delta = ret - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (ret - self._mean)
+
+        if equity > self._peak:
+            self._peak = equity
+        drawdown = 1.0 - equity / self._peak
+        if drawdown > self._max_drawdown:
+            self._max_drawdown = drawdown
+
+        self._turnover += abs(traded)
+        self._costs += costs
+
+    def periods(self) -> int:
+        return self._count
+
+    def snapshot(self) -> Metrics:
+        sharpe = 0.0
+        if self._count > 1 and self._m2 > 0.0:
+            std = math.sqrt(self._m2 / (self._count - 1))
+            sharpe = self._mean / std * math.sqrt(self._periods_per_year)
+        return Metrics(
+            total_pnl=self._equity - self._initial_capital,
+            total_costs=self._costs,
+            cumulative_return=self._equity / self._initial_capital - 1.0,
+            max_drawdown=self._max_drawdown,
+            sharpe=sharpe,
+            turnover=self._turnover,
+            periods=self._count,
+        )
+
+
+class MetricsProcessor(EventProcessor):
+    '''
+    Wraps the EventProcessor of a run and samples the portfolio once per
+    timestamp with events of the sample_on types, once per bar by default,
+    whether bars arrive one by one or as the MarketSliceEvents of a
+    sequencer with slices.
+    A timestamp is sampled after its last event, when the first event of
+    the next one arrives, so sample() must be called at the end of the run
+    for the last timestamp.
+
+    equity returns the current portfolio value. traded and costs, if given,
+    return the cumulative absolute traded quantity and costs, the processor
+    takes the per-period differences. With snapshot_every, on_snapshot 
+    receives intermediate metrics every that many samples.
+    '''
+    def __init__(
+            self,
+            processor: EventProcessor,
+            equity: Callable[[], float],
+            initial_capital: float,
+            traded: Callable[[], float] | None = None,
+            costs: Callable[[], float] | None = None,
+            sample_on: tuple[type[Event], ...] = (MarketCloseEvent, MarketSliceEvent),
+            periods_per_year: float = PERIODS_PER_YEAR,
+            snapshot_every: int | None = None,
+            on_snapshot: Callable[[Metrics], None] | None = None,
+    ):
+        self._processor = processor
+        self._equity = equity
+        self._traded = traded
+        self._costs = costs
+        self._sample_on = sample_on
+        self._snapshot_every = snapshot_every
+        self._on_snapshot = on_snapshot
+        self._last_traded = 0.0
+        self._last_costs = 0.0
+        # timestamp of the period not sampled yet
+        self._timestamp: datetime | None = None
+        self._metrics = StreamingMetrics(initial_capital, periods_per_year)
+
+    def process(self, event: Event) -> None:
+        if isinstance(event, self._sample_on) and event.timestamp != self._timestamp:
+            self.sample()
+            self._timestamp = event.timestamp
+        self._processor.process(event)
+
+    def sample(self) -> None:
+        '''
+        Close the period of the current timestamp, a no-op if it was
+        already sampled
+        '''
+        if self._timestamp is None:
+            return
+        self._timestamp = None
+
+        traded = 0.0
+        if self._traded is not None:
+            total = self._traded()
+            traded, self._last_traded = total - self._last_traded, total
+        costs = 0.0
+        if self._costs is not None:
+            total = self._costs()
+            costs, self._last_costs = total - self._last_costs, total
+        self._metrics.update(self._equity(), traded, costs)
+
+        if (
+            self._snapshot_every is not None 
+            and self._on_snapshot is not None
+            and self._metrics.periods() % self._snapshot_every == 0
+        ):
+            self._on_snapshot(self._metrics.snapshot())
+
+    def snapshot(self) -> Metrics:
+        return self._metrics.snapshot()
@@ -0,0 +1,268 @@
+'''
+Symbol partitioned runs of strategies that trade every symbol on its own.
+
+When a strategy's view of a symbol never depends on another symbol, see
+Strategy.symbol_independent(), the universe can be split into shards of
+symbols that are simulated in separate processes, each with its own
+SimulationClock, EventSequencer and MbteProcessor, and the results merged
+back by timestamp:
+
+    result = run_partitioned(
+        build,
+        stores,
+        symbols=universe,
+        initial_capital=1e6,
+        n_shards=8,
+    )
+
+build is a picklable, e.g. module level, function returning a fresh
+(Strategy, Portfolio, Execution) for one shard. The portfolio must have
+equity() and traded(), like ArrayPortfolio, and the execution may have
+costs(), like ExecutionSimulator.
+
+The stores are either ArrayEventStores, cut to the symbols of each shard
+with EventStore.select() before they are sent to the workers, or a
+picklable function returning the stores, e.g. a functools.partial of 
+GBMStore, called in every worker. Streaming stores, such as the chunked,
+loader and synthetic ones, are consumed by select() and cannot be
+pickled, so they have to be passed as a function. Stores that cannot 
+select still work, every worker then reads all their events and drops
+those of other shards.
+
+The combined equity is the initial capital plus the sum over shards of the
+profit and loss of each shard, sampled after the last event of every
+timestamp, and the fills are those returned by Execution.on_market(),
+ordered by timestamp and symbol. With n_shards=1 the whole universe runs
+in this process, which is the single process run the sharded one
+reproduces: same fills, and the same equity up to the rounding of the sum.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import os
+from typing import Callable, NamedTuple, Sequence
+
+import numpy as np
+
+from anvil.clock import SimulationClock, datetime_to_ns
+from anvil.core import Execution, MbteProcessor, Portfolio, Strategy
+from anvil.event_processing import ArrayEventStore, EventProcessor, EventSequencer, EventStore
+from anvil.events import Event, FillEvent, OrderEvent
+from anvil.metrics import Metrics, PERIODS_PER_YEAR, compute_metrics
+from anvil.routing import Subscription, SubscriptionRouter
+
+logger = logging.getLogger(__name__)
+
+# builds the components of one shard, called once per shard in its worker
+ComponentFactory = Callable[[], tuple[Strategy, Portfolio, Execution]]
+# builds the event stores of a run, called once per shard in its worker
+StoreFactory = Callable[[], Sequence[EventStore]]
+
+
+class ShardResult(NamedTuple):
+    symbols: list[str]
+    # int64 nanoseconds of every timestamp the shard had events at
+    timestamps: np.ndarray
+    # portfolio equity, cumulative traded quantity and costs after the
+    # last event of each timestamp
+    equity: np.ndarray
+    traded: np.ndarray
+    costs: np.ndarray
+    initial_equity: float
+    fills: list[FillEvent]
+
+
+class PartitionedResult(NamedTuple):
+    timestamps: np.ndarray
+    equity: np.ndarray
+    traded: np.ndarray
+    costs: np.ndarray
+    fills: list[FillEvent]
+    metrics: Metrics
+    shards: list[ShardResult]
+
+
+def partition_symbols(symbols: Sequence[str], n_shards: int) -> list[list[str]]:
+    '''
+    Deal symbols round robin into at most n_shards non-empty shards
+    '''
+    if n_shards < 1:
+        raise ValueError(f'n_shards must be positive, got {n_shards}')
+    symbols = list(dict.fromkeys(symbols))
+    return [symbols[i::n_shards] for i in range(min(n_shards, len(symbols)))]
+
+
+def run_partitioned(
+        build: ComponentFactory,
+        event_stores: Sequence[EventStore] | StoreFactory,
+        symbols: Sequence[str],
+        initial_capital: float,
+        n_shards: int | None = None,
+        max_workers: int | None = None,
+        slices: bool = False,
+        periods_per_year: float = PERIODS_PER_YEAR,
+) -> PartitionedResult:
+    '''
+    Run the components of build on the events of symbols, split into
+    n_shards shards, one per CPU by default, on a process pool of
+    max_workers processes. Events of other symbols are dropped. Metrics
+    are computed on the equity sampled once per timestamp.
+    '''
+    shards = partition_symbols(symbols, n_shards or os.cpu_count() or 1)
+    if callable(event_stores):
+        shard_stores: list[Sequence[EventStore] | StoreFactory] = [event_stores] * len(shards)
+    else:
+        if len(shards) > 1:
+            for event_store in event_stores:
+                if not isinstance(event_store, ArrayEventStore):
+                    raise ValueError(
+                        f'event store {event_store.name()} cannot be shared between shards, '
+                        'pass a function building the stores instead'
+                    )
+        shard_stores = [
+            [event_store.select(shard, None) for event_store in event_stores]
+            for shard in shards
+        ]
+    if len(shards) == 1:
+        results = [_run_shard(build, shards[0], shard_stores[0], slices)]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_run_shard, build, shard, stores, slices)
+                for shard, stores in zip(shards, shard_stores)
+            ]
+            results = [future.result() for future in futures]
+    logger.info('partitioned run done', extra={'shards': len(results)})
+    return merge_shards(results, initial_capital, periods_per_year)
+
+
+def merge_shards(
+        results: Sequence[ShardResult],
+        initial_capital: float,
+        periods_per_year: float = PERIODS_PER_YEAR,
+) -> PartitionedResult:
+    '''
+    Combine shard results into one portfolio result on the union of their
+    timestamps, carrying each shard's last sample forward
+    '''
+    timestamps = np.unique(np.concatenate(
+        [result.timestamps for result in results] or [np.zeros(0, dtype=np.int64)]
+    ))
+    pnl = np.zeros(len(timestamps))
+    traded = np.zeros(len(timestamps))
+    costs = np.zeros(len(timestamps))
+    for result in results:
+        # the last sample of the shard at or before each timestamp
+        i = np.searchsorted(result.timestamps, timestamps, side='right') - 1
+        sampled = i >= 0
+        pnl[sampled] += result.equity[i[sampled]] - result.initial_equity
+        traded[sampled] += result.traded[i[sampled]]
+        costs[sampled] += result.costs[i[sampled]]
+    equity = initial_capital + pnl
+
+    fills = sorted(
+        (fill for result in results for fill in result.fills),
+        key=lambda fill: (fill.timestamp, fill.symbol),
+    )
+    metrics = compute_metrics(
+        equity,
+        initial_capital,
+        traded=np.diff(traded, prepend=0.0),
+        costs=np.diff(costs, prepend=0.0),
+        periods_per_year=periods_per_year,
+    )
+    return PartitionedResult(
+        timestamps=timestamps.astype('datetime64[ns]'),
+        equity=equity,
+        traded=traded,
+        costs=costs,
+        fills=fills,
+        metrics=metrics,
+        shards=list(results),
+    )
+
+
+class _RecordingExecution(Execution):
+    '''
+    Keeps the fills an execution returns from on_market()
+    '''
+    def __init__(self, execution: Execution):
+        self._execution = execution
+        self.fills: list[FillEvent] = []
+
+    def receive(self, order: OrderEvent) -> None:
+        self._execution.receive(order)
+
+    def on_market(self, event: Event) -> Sequence[FillEvent]:
+        fills = self._execution.on_market(event)
+        self.fills.extend(fills)
+        return fills
+
+
+class _ShardRecorder(EventProcessor):
+    '''
+    Samples the portfolio after the last event of every timestamp, i.e.
+    when the first event of the next one arrives, and at the end
+    '''
+    def __init__(self, processor: EventProcessor, portfolio: Portfolio, execution: Execution):
+        self._processor = processor
+        self._equity: Callable[[], float] = portfolio.equity # type: ignore
+        self._traded: Callable[[], float] = portfolio.traded # type: ignore
+        self._costs: Callable[[], float] | None = getattr(execution, 'costs', None)
+        self._timestamp = None
+        self.timestamps: list[int] = []
+        self.equity: list[float] = []
+        self.traded: list[float] = []
+        self.costs: list[float] = []
+
+    def process(self, event: Event) -> None:
+        if event.timestamp != self._timestamp:
+            self.sample()
+            self._timestamp = event.timestamp
+        self._processor.process(event)
+
+    def sample(self) -> None:
+        if self._timestamp is None:
+            return
+        self.timestamps.append(datetime_to_ns(self._timestamp))
+        self.equity.append(self._equity())
+        self.traded.append(self._traded())
+        self.costs.append(self._costs() if self._costs is not None else 0.0)
+
+
+def _run_shard(
+        build: ComponentFactory,
+        symbols: list[str],
+        event_stores: Sequence[EventStore] | StoreFactory,
+        slices: bool,
+) -> ShardResult:
+    if callable(event_stores):
+        event_stores = [event_store.select(symbols, None) for event_store in event_stores()]
+    strategy, portfolio, execution = build()
+    if not strategy.symbol_independent():
+        raise ValueError(
+            f'{type(strategy).__name__} is not symbol independent and cannot be partitioned'
+        )
+    recording = _RecordingExecution(execution)
+    router = SubscriptionRouter()
+    router.subscribe(
+        MbteProcessor(strategy, portfolio, recording),
+        Subscription.of(symbols=symbols),
+    )
+    recorder = _ShardRecorder(router, portfolio, execution)
+    initial_equity = portfolio.equity() # type: ignore
+
+    heads = [event.timestamp for event in (s.peek() for s in event_stores) if event is not None]
+    if heads:
+        sequencer = EventSequencer(SimulationClock(min(heads)), list(event_stores), slices=slices)
+        sequencer.set_processor(recorder)
+        sequencer.run()
+        recorder.sample()
+    return ShardResult(
+        symbols=symbols,
+        timestamps=np.array(recorder.timestamps, dtype=np.int64),
+        equity=np.array(recorder.equity, dtype=np.float64),
+        traded=np.array(recorder.traded, dtype=np.float64),
+        costs=np.array(recorder.costs, dtype=np.float64),
+        initial_equity=initial_equity,
+        fills=recording.fills,
+    )
@@ -0,0 +1,255 @@
+'''
+Reference Portfolio implementation for large symbol universes.
+
+ArrayPortfolio interns every symbol to an integer id and keeps positions,
+average costs, pending order quantities, realized P&L and last prices in
+NumPy arrays indexed by id. A fill touches one slot of each array, and
+marking the book to market is one vectorized pass over all symbols, done
+at most once per price update however many symbols moved:
+
+    portfolio = ArrayPortfolio(initial_capital=1e6, position_size=100)
+    metrics = MetricsProcessor(
+        MbteProcessor(strategy, portfolio, execution),
+        equity=portfolio.equity,
+        initial_capital=1e6,
+        traded=portfolio.traded,
+    )
+    sequencer.set_processor(metrics)
+    sequencer.run()
+    metrics.sample()
+
+MbteProcessor passes market events, or whole MarketSliceEvents, to
+on_market() after applying the fills they triggered.
+'''
+from typing import Any
+
+import numpy as np
+
+from anvil.core import Portfolio
+from anvil.events import (
+    Event,
+    FillEvent,
+    MarketCloseEvent,
+    MarketOpenEvent,
+    MarketSliceEvent,
+    OrderEvent,
+    SignalEvent,
+)
+from anvil.symbols import SymbolTable
+
+DEFAULT_CAPACITY = 1024
+
+
+class ArrayPortfolio(Portfolio):
+    '''
+    Turns signals into orders for the difference between the target
+    position, signal value times position_size, and the position plus the
+    quantity still pending, and accounts fills at average cost.
+
+    Capacity grows by doubling when more symbols are seen than expected.
+    '''
+    def __init__(
+            self,
+            initial_capital: float = 0.0,
+            position_size: float = 1.0,
+            capacity: int = DEFAULT_CAPACITY,
+            symbols: SymbolTable | None = None,
+    ):
+        if capacity < 1:
+            raise ValueError(f'capacity must be positive, got {capacity}')
+        self._symbols = symbols if symbols is not None else SymbolTable()
+        self._position_size = position_size
+        self._cash = float(initial_capital)
+        self._traded = 0.0
+        self._positions = np.zeros(capacity, dtype=np.float64)
+        self._average_costs = np.zeros(capacity, dtype=np.float64)
+        self._pending = np.zeros(capacity, dtype=np.float64)
+        self._realized = np.zeros(capacity, dtype=np.float64)
+        self._last_prices = np.full(capacity, np.nan, dtype=np.float64)
+        # market value of the book, None when prices or positions changed
+        self._market_value: float | None = 0.0
+        self._unrealized: np.ndarray | None = None
+        self._grow(len(self._symbols))
+
+    ################### Portfolio ###################
+
+    def on_signal(self, signal: SignalEvent) -> OrderEvent | None:
+        i = self._id(signal.symbol)
+        qty = signal.value * self._position_size - self._positions[i] - self._pending[i]
+        if qty == 0:
+            return None
+        self._pending[i] += qty
+        return OrderEvent(
+            timestamp=signal.timestamp,
+            symbol=signal.symbol,
+            price=None,
+            qty=float(qty), # type: ignore
+        )
+
+    def on_fill(self, fill: FillEvent) -> OrderEvent | None:
+        qty = fill.last_qty
+        if qty == 0:
+            return None
+        i = self._id(fill.symbol)
+        price = fill.last_price
+        position = float(self._positions[i])
+        new_position = position + qty
+
+        if position == 0 or (position > 0) == (qty > 0):
+            # opening or adding
+            self._average_costs[i] = (
+                self._average_costs[i] * position + price * qty
+            ) / new_position
+        else:
+            closed = min(abs(qty), abs(position))
+            sign = 1.0 if position > 0 else -1.0
+            self._realized[i] += closed * sign * (price - self._average_costs[i])
+            if new_position == 0:
+                self._average_costs[i] = 0.0
+            elif (new_position > 0) != (position > 0):
+                # flipped, the remainder is opened at the fill price
+                self._average_costs[i] = price
+
+        self._positions[i] = new_position
+        self._pending[i] -= qty
+        self._cash -= qty * price
+        self._traded += abs(qty)
+        self._last_prices[i] = price
+        self._market_value = None
+        return None
+
+    ################### Marking ###################
+
+    def on_market(self, event: Event) -> None:
+        '''
+        Update the last prices from a market event or slice
+        '''
+        if isinstance(event, MarketSliceEvent):
+            ids = self._symbols.ids(event.symbols)
+            self._grow(len(self._symbols))
+            self._last_prices[ids] = event.prices
+        elif isinstance(event, (MarketOpenEvent, MarketCloseEvent)):
+            # the id first, interning may grow the arrays
+            i = self._id(event.symbol)
+            self._last_prices[i] = event.price
+        else:
+            return
+        self._market_value = None
+
+    def mark(self, symbol: str, price: float) -> None:
+        i = self._id(symbol)
+        self._last_prices[i] = price
+        self._market_value = None
+
+    def revalue(self) -> float:
+        '''
+        Market value of all positions at the last prices, recomputed in one
+        pass if anything changed since the last call. Symbols without a
+        price yet are valued at their average cost.
+        '''
+        if self._market_value is None:
+            n = len(self._symbols)
+            # the table may be shared and have grown elsewhere
+            self._grow(n)
+            positions = self._positions[:n]
+            prices = self._last_prices[:n]
+            prices = np.where(np.isnan(prices), self._average_costs[:n], prices)
+            self._unrealized = positions * (prices - self._average_costs[:n])
+            self._market_value = float(np.dot(positions, prices))
+        return self._market_value
+
+    ################### Accessors ###################
+
+    def equity(self) -> float:
+        return self._cash + self.revalue()
+
+    def cash(self) -> float:
+        return self._cash
+
+    def traded(self) -> float:
+        '''
+        Cumulative absolute filled quantity
+        '''
+        return self._traded
+
+    def realized_pnl(self) -> float:
+        return float(np.sum(self._realized[:len(self._symbols)]))
+
+    def unrealized_pnl(self) -> float:
+        self.revalue()
+        return float(np.sum(self._unrealized)) if self._unrealized is not None else 0.0
+
+    def position(self, symbol: str) -> float:
+        i = self._symbols.get(symbol)
+        return 0.0 if i is None else float(self._positions[i])
+
+    def average_cost(self, symbol: str) -> float:
+        i = self._symbols.get(symbol)
+        return 0.0 if i is None else float(self._average_costs[i])
+
+    def symbols(self) -> SymbolTable:
+        return self._symbols
+
+    def positions(self) -> np.ndarray:
+        '''
+        Read-only view of the positions by symbol id
+        '''
+        view = self._positions[:len(self._symbols)]
+        view.flags.writeable = False
+        return view
+
+    ################### Checkpoints ###################
+
+    def get_state(self) -> dict[str, Any]:
+        n = len(self._symbols)
+        self._grow(n)
+        return {
+            'symbols': self._symbols.symbols(),
+            'cash': self._cash,
+            'traded': self._traded,
+            'positions': self._positions[:n].copy(),
+            'average_costs': self._average_costs[:n].copy(),
+            'pending': self._pending[:n].copy(),
+            'realized': self._realized[:n].copy(),
+            'last_prices': self._last_prices[:n].copy(),
+        }
+
+    def set_state(self, state: dict[str, Any]) -> None:
+        symbols = state['symbols']
+        if self._symbols.symbols() != symbols[:len(self._symbols)]:
+            raise ValueError('checkpoint symbols do not match the symbol table')
+        for symbol in symbols:
+            self._symbols.intern(symbol)
+        n = len(symbols)
+        self._grow(n)
+        self._cash = state['cash']
+        self._traded = state['traded']
+        for name in ('positions', 'average_costs', 'pending', 'realized', 'last_prices'):
+            array = getattr(self, f'_{name}')
+            array[:n] = state[name]
+            array[n:] = np.nan if name == 'last_prices' else 0.0
+        self._market_value = None
+
+    def _id(self, symbol: str) -> int:
+        i = self._symbols.intern(symbol)
+        if i >= len(self._positions):
+            self._grow(i + 1)
+        return i
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self._positions)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, fill in (
+            ('_positions', 0.0),
+            ('_average_costs', 0.0),
+            ('_pending', 0.0),
+            ('_realized', 0.0),
+            ('_last_prices', np.nan),
+        ):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=np.float64)
+            new[:len(old)] = old
+            setattr(self, name, new)
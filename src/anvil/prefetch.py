@@ -0,0 +1,271 @@
+'''
+Background prefetching for slow EventStore sources.
+
+PrefetchingEventStore reads the wrapped store on a background thread, in
+chunks of events, into a bounded queue. Decoding and I/O of the source
+then overlap with the simulation, while the simulation thread remains the
+only consumer of the events: the wrapped store is only ever touched by the
+background thread, and the prefetching store only by the sequencer.
+'''
+import bisect
+from datetime import datetime
+import logging
+import queue
+import threading
+from typing import Sequence
+import weakref
+
+from anvil.clock import datetime_to_ns
+from anvil.event_processing import EventStore
+from anvil.events import Event
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_MAX_CHUNKS = 4
+
+
+class _Failure(object):
+    '''
+    Carries an exception of the background thread over to the consumer
+    '''
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+# put after the last chunk
+_END = object()
+
+
+class _Producer(object):
+    '''
+    Body of the background thread. It holds no reference to the
+    PrefetchingEventStore, so that an abandoned store can be collected.
+    '''
+    def __init__(
+            self,
+            event_store: EventStore,
+            chunk_size: int,
+            chunks: queue.Queue,
+            stop: threading.Event,
+    ):
+        self._event_store = event_store
+        self._name = event_store.name()
+        self._chunk_size = chunk_size
+        self._chunks = chunks
+        self._stop = stop
+
+    def run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                keys, events = self._read_chunk()
+                if not events:
+                    self._put(_END)
+                    return
+                self._put((keys, events))
+        except BaseException as e:
+            logger.exception(
+                'prefetching failed',
+                extra={'event_store': self._name},
+            )
+            self._put(_Failure(e))
+
+    def _read_chunk(self) -> tuple[list[int], list[Event]]:
+        # stores without batch support hand out one event per call
+        keys: list[int] = []
+        events: list[Event] = []
+        while len(events) < self._chunk_size:
+            batch_keys, batch = self._event_store.peek_batch_ns(
+                None, self._chunk_size - len(events),
+            )
+            if not batch:
+                break
+            self._event_store.pop_batch(len(batch))
+            keys.extend(batch_keys)
+            events.extend(batch)
+        return keys, events
+
+    def _put(self, item: object) -> None:
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+class PrefetchingEventStore(EventStore):
+    '''
+    Wraps an EventStore and reads it ahead on a background thread.
+
+    At most max_chunks chunks of chunk_size events are buffered besides
+    the one being consumed, which caps the memory held ahead of the
+    simulation. An exception raised by the wrapped store is re-raised by
+    the peek/pop call that follows the last complete chunk. Call close(),
+    or use the store as a context manager, to stop the thread before the
+    store is exhausted. The thread of a store dropped without close()
+    stops once the store is garbage collected.
+    '''
+    def __init__(
+            self,
+            event_store: EventStore,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            max_chunks: int = DEFAULT_MAX_CHUNKS,
+    ):
+        if chunk_size < 1 or max_chunks < 1:
+            raise ValueError('chunk_size and max_chunks must be positive')
+        super().__init__()
+        self._name = event_store.name()
+
+        # the chunk being consumed
+        self._keys: Sequence[int] = []
+        self._events: Sequence[Event] = []
+        self._pos = 0
+        self._exhausted = False
+        # events of timestamp _carry_ns at the end of the finished chunks,
+        # for the checkpoint cursor when a timestamp straddles chunks
+        self._carry_ns: int | None = None
+        self._carry = 0
+
+        self._chunks: queue.Queue = queue.Queue(maxsize=max_chunks)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=_Producer(
+                event_store, chunk_size, self._chunks, self._stop,
+            ).run,
+            name=f'prefetch-{self._name}',
+            daemon=True,
+        )
+        self._thread.start()
+        weakref.finalize(self, self._stop.set)
+
+    def __enter__(self) -> 'PrefetchingEventStore':
+        return self
+
+    def __exit__(self, exc_type, exc, tb): # type: ignore
+        self.close()
+
+    def close(self) -> None:
+        '''
+        Stop the background thread and drop the buffered chunks
+        '''
+        self._stop.set()
+        # unblock a producer waiting for room in the queue
+        while self._thread.is_alive():
+            try:
+                self._chunks.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(timeout=0.01)
+        self._keys, self._events, self._pos = [], [], 0
+        self._exhausted = True
+
+    def name(self) -> str:
+        return self._name
+
+    def peek(self) -> Event | None:
+        if not self._ensure_chunk():
+            return None
+        return self._events[self._pos]
+
+    def pop(self) -> Event | None:
+        if not self._ensure_chunk():
+            return None
+        event = self._events[self._pos]
+        self._pos += 1
+        return event
+
+    def peek_ns(self) -> int | None:
+        if not self._ensure_chunk():
+            return None
+        return self._keys[self._pos]
+
+    def peek_batch(
+            self,
+            until: datetime | None = None,
+            max_count: int = 1,
+    ) -> Sequence[Event]:
+        until_ns = None if until is None else datetime_to_ns(until)
+        return self.peek_batch_ns(until_ns, max_count)[1]
+
+    def peek_batch_ns(
+            self,
+            until_ns: int | None = None,
+            max_count: int = 1,
+    ) -> tuple[Sequence[int], Sequence[Event]]:
+        '''
+        Batches do not cross chunk boundaries, so they may be shorter than
+        max_count even when more events follow
+        '''
+        if max_count < 1 or not self._ensure_chunk():
+            return [], []
+        lo = self._pos
+        hi = min(len(self._events), lo + max_count)
+        if until_ns is not None:
+            hi = bisect.bisect_left(self._keys, until_ns, lo, hi)
+        return self._keys[lo:hi], self._events[lo:hi]
+
+    def pop_batch(self, count: int) -> int:
+        popped = 0
+        while popped < count and self._ensure_chunk():
+            n = min(count - popped, len(self._events) - self._pos)
+            self._pos += n
+            popped += n
+        return popped
+
+    def seek(self, timestamp: datetime) -> None:
+        '''
+        Forward only. The background thread keeps reading in order, the 
+        events before timestamp are dropped as they arrive.
+        '''
+        timestamp_ns = datetime_to_ns(timestamp)
+        while self._ensure_chunk():
+            self._pos = bisect.bisect_left(self._keys, timestamp_ns, self._pos)
+            if self._pos < len(self._events):
+                return
+
+    def get_state(self) -> object:
+        '''
+        The head timestamp and the events of it already consumed. The
+        wrapped store does not need to support checkpoints, restoring
+        reads forward from the start of the stream.
+        '''
+        return self._stream_state()
+
+    def set_state(self, state: object) -> None:
+        self._restore_stream_state(state) # type: ignore
+
+    def consumed_at(self, timestamp_ns: int) -> int:
+        lo = bisect.bisect_left(self._keys, timestamp_ns, 0, self._pos)
+        consumed = self._pos - lo
+        if lo == 0 and self._carry_ns == timestamp_ns:
+            consumed += self._carry
+        return consumed
+
+    def _ensure_chunk(self) -> bool:
+        '''
+        Make sure the current chunk has an event left, waiting for the
+        background thread if needed. False once the source is exhausted.
+        '''
+        if self._pos < len(self._events):
+            return True
+        if self._exhausted:
+            return False
+        if self._keys:
+            last_ns = self._keys[-1]
+            run = len(self._keys) - bisect.bisect_left(self._keys, last_ns)
+            if run == len(self._keys) and self._carry_ns == last_ns:
+                self._carry += run
+            else:
+                self._carry_ns, self._carry = last_ns, run
+        chunk = self._chunks.get()
+        if chunk is _END:
+            self._exhausted = True
+            self._keys, self._events, self._pos = [], [], 0
+            return False
+        if isinstance(chunk, _Failure):
+            self._exhausted = True
+            raise chunk.error
+        self._keys, self._events = chunk
+        self._pos = 0
+        return True
@@ -0,0 +1,200 @@
+'''
+Routing of events to the components subscribed to them.
+
+A SubscriptionRouter is the EventProcessor of a run and hands each event
+only to the processors whose Subscription matches its type and symbol,
+so several strategies share one sequencer run and one pass over the data,
+and a strategy trading a few names of a large feed is not called for the
+rest:
+
+    router = SubscriptionRouter()
+    router.subscribe(MbteProcessor(momentum, portfolio, execution))
+    router.subscribe(MbteProcessor(pairs, portfolio, execution))
+    stores = router.select(stores)
+    sequencer = EventSequencer(clock, stores)
+    sequencer.set_processor(router)
+
+Without an explicit Subscription, subscribe() asks the processor for one,
+e.g. MbteProcessor takes its strategy's Strategy.subscription().
+
+The handlers of an event are looked up by (event type, symbol) in a table
+filled on first sight of each pair, so routing costs one dict lookup and
+events nobody subscribes to are dropped right there. select() goes one
+step further and has the stores skip them before they are ever built.
+
+A MarketSliceEvent is handed to each subscriber restricted to its symbols
+and market event types, through a boolean mask indexed by the ids of the
+process wide symbol table. Subscribers that match nothing in a slice are
+not called.
+'''
+from typing import Callable, Collection, NamedTuple, Sequence
+
+import numpy as np
+
+from anvil.event_processing import EventProcessor, EventStore
+from anvil.events import MARKET_EVENT_TYPES, Event, MarketSliceEvent
+from anvil.symbols import SYMBOLS
+
+
+class Subscription(NamedTuple):
+    '''
+    Events that are instances of event_types and, unless symbols is None,
+    whose symbol is in symbols. Slices match through the market event
+    types and symbols of their rows.
+    '''
+    event_types: tuple[type[Event], ...] = (Event,)
+    symbols: frozenset[str] | None = None
+
+    @classmethod
+    def of(
+            cls,
+            *event_types: type[Event],
+            symbols: Collection[str] | None = None,
+    ) -> 'Subscription':
+        return cls(
+            event_types=event_types or (Event,),
+            symbols=None if symbols is None else frozenset(symbols),
+        )
+
+    def matches(self, event: Event) -> bool:
+        return isinstance(event, self.event_types) and (
+            self.symbols is None or event.symbol in self.symbols
+        )
+
+
+class _Subscriber(object):
+    '''
+    A processor with its subscription and the masks its slices are cut with
+    '''
+    def __init__(self, process: Callable[[Event], None], subscription: Subscription):
+        self.process = process
+        self.subscription = subscription
+        self.whole_slices = issubclass(MarketSliceEvent, subscription.event_types)
+        self.kinds = np.array(
+            [issubclass(t, subscription.event_types) for t in MARKET_EVENT_TYPES],
+            dtype=bool,
+        )
+        # wanted symbols by id in SYMBOLS, grown as symbols are interned
+        self._symbol_mask = np.zeros(0, dtype=bool)
+
+    def symbol_mask(self) -> np.ndarray:
+        if len(self._symbol_mask) < len(SYMBOLS):
+            mask = np.zeros(len(SYMBOLS), dtype=bool)
+            for symbol in self.subscription.symbols: # type: ignore
+                if symbol in SYMBOLS:
+                    mask[SYMBOLS.get(symbol)] = True
+            self._symbol_mask = mask
+        return self._symbol_mask
+
+    def cut(self, event: MarketSliceEvent, ids: np.ndarray) -> MarketSliceEvent | None:
+        '''
+        The part of the slice this subscriber wants, None for nothing
+        '''
+        if self.whole_slices and self.subscription.symbols is None:
+            return event
+        mask = self.kinds[event.kinds]
+        if self.subscription.symbols is not None:
+            mask &= self.symbol_mask()[ids]
+        if mask.all():
+            return event
+        if not mask.any():
+            return None
+        return MarketSliceEvent.from_arrays(
+            event.timestamp,
+            event.symbols[mask],
+            event.prices[mask],
+            event.volumes[mask],
+            event.kinds[mask],
+        )
+
+
+class SubscriptionRouter(EventProcessor):
+    '''
+    Dispatches events to subscribed processors in subscription order
+    '''
+    def __init__(self):
+        self._subscribers: list[_Subscriber] = []
+        # (event type, symbol) -> processes of the matching subscribers
+        self._routes: dict[tuple[type, str], tuple[Callable[[Event], None], ...]] = {}
+        self._dropped = 0
+
+    def subscribe(
+            self,
+            processor: EventProcessor | Callable[[Event], None],
+            subscription: Subscription | None = None,
+    ) -> None:
+        '''
+        Route the events of subscription to processor, an EventProcessor or
+        a callable taking the event. Without subscription, the processor's
+        own subscription() is used if it has one, else every event.
+        '''
+        if subscription is None:
+            declared = getattr(processor, 'subscription', None)
+            subscription = declared() if callable(declared) else Subscription()
+        process = processor.process if isinstance(processor, EventProcessor) else processor
+        self._subscribers.append(_Subscriber(process, subscription)) # type: ignore
+        self._routes.clear()
+
+    def subscriptions(self) -> list[Subscription]:
+        return [subscriber.subscription for subscriber in self._subscribers]
+
+    def dropped(self) -> int:
+        '''
+        Number of events that reached no subscriber
+        '''
+        return self._dropped
+
+    def interest(self) -> tuple[frozenset[str] | None, tuple[type[Event], ...]]:
+        '''
+        The union of all subscriptions, None for any symbol
+        '''
+        symbols: set[str] | None = set()
+        event_types: list[type[Event]] = []
+        for subscriber in self._subscribers:
+            subscription = subscriber.subscription
+            if subscription.symbols is None:
+                symbols = None
+            elif symbols is not None:
+                symbols |= subscription.symbols
+            event_types.extend(t for t in subscription.event_types if t not in event_types)
+        return (None if symbols is None else frozenset(symbols)), tuple(event_types)
+
+    def select(self, event_stores: Sequence[EventStore]) -> list[EventStore]:
+        '''
+        The stores restricted to the events anybody subscribed to, see
+        EventStore.select(). Call it after the last subscribe().
+        '''
+        symbols, event_types = self.interest()
+        # subscribers to slices want the market rows too
+        if any(issubclass(MarketSliceEvent, t) for t in event_types):
+            event_types += MARKET_EVENT_TYPES
+        return [event_store.select(symbols, event_types) for event_store in event_stores]
+
+    def process(self, event: Event) -> None:
+        if isinstance(event, MarketSliceEvent):
+            self._process_slice(event)
+            return
+        key = (type(event), event.symbol)
+        routes = self._routes.get(key)
+        if routes is None:
+            routes = self._routes[key] = tuple(
+                subscriber.process
+                for subscriber in self._subscribers
+                if subscriber.subscription.matches(event)
+            )
+        if not routes:
+            self._dropped += 1
+            return
+        for process in routes:
+            process(event)
+
+    def _process_slice(self, event: MarketSliceEvent) -> None:
+        ids = SYMBOLS.ids(event.symbols)
+        delivered = False
+        for subscriber in self._subscribers:
+            part = subscriber.cut(event, ids)
+            if part is not None:
+                subscriber.process(part)
+                delivered = True
+        if not delivered:
+            self._dropped += 1
@@ -0,0 +1,251 @@
+'''
+Parameter sweeps over a process pool.
+
+Market data is copied once into shared memory; every worker attaches to it
+when it starts and sees read-only NumPy views, so nothing is reloaded or
+copied per run. Results come back as one row per parameter set, in grid
+order regardless of which worker finished first.
+
+A backtest is any picklable function of (params, data) returning metrics.
+EventDrivenBacktest makes one out of a factory of the Strategy, Portfolio
+and Execution of a run, driven through EventSequencer and MbteProcessor on
+the market data columns in the worker:
+
+    backtest = EventDrivenBacktest(build, initial_capital=1e6)
+    table = run_sweep(backtest, parameter_grid(window=[5, 10, 20]), data)
+'''
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import itertools
+import logging
+from multiprocessing import shared_memory
+import threading
+from typing import Any, Callable, Mapping, NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+from anvil.clock import SimulationClock
+from anvil.core import Execution, MbteProcessor, Portfolio, Strategy
+from anvil.event_processing import ArrayEventStore, EventSequencer
+from anvil.metrics import Metrics, MetricsProcessor, PERIODS_PER_YEAR
+
+logger = logging.getLogger(__name__)
+
+# runs one backtest on the shared market data and returns its metrics, e.g.
+# a Metrics tuple
+BacktestFunction = Callable[[Mapping[str, Any], Mapping[str, np.ndarray]], Any]
+# builds fresh components of one run from its parameters
+ComponentFactory = Callable[[Mapping[str, Any]], tuple[Strategy, Portfolio, Execution]]
+ProgressCallback = Callable[[int, int], None]
+
+
+class SharedArraySpec(NamedTuple):
+    key: str
+    shm_name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+class SharedArrays(object):
+    '''
+    Owns shared memory copies of a set of named arrays. Use as a context
+    manager, the segments are released on exit.
+    '''
+    def __init__(self, arrays: Mapping[str, np.ndarray]):
+        self._segments: list[shared_memory.SharedMemory] = []
+        self._specs: list[SharedArraySpec] = []
+        try:
+            for key, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                if array.dtype.hasobject:
+                    raise ValueError(f'array {key} holds Python objects and cannot be shared')
+                segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._segments.append(segment)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+                self._specs.append(SharedArraySpec(key, segment.name, array.shape, array.dtype.str))
+        except BaseException:
+            self.close()
+            raise
+
+    def specs(self) -> list[SharedArraySpec]:
+        return list(self._specs)
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, exc_type, exc, tb): # type: ignore
+        self.close()
+
+
+def attach_shared_arrays(
+        specs: Sequence[SharedArraySpec],
+) -> tuple[dict[str, np.ndarray], list[shared_memory.SharedMemory]]:
+    '''
+    Read-only views of shared arrays. The returned segments must be kept
+    alive for as long as the views are used.
+    '''
+    arrays: dict[str, np.ndarray] = {}
+    segments: list[shared_memory.SharedMemory] = []
+    for spec in specs:
+        segment = shared_memory.SharedMemory(name=spec.shm_name)
+        segments.append(segment)
+        array = np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=segment.buf)
+        array.flags.writeable = False
+        arrays[spec.key] = array
+    return arrays, segments
+
+
+def parameter_grid(**axes: Sequence[Any]) -> list[dict[str, Any]]:
+    '''
+    Cartesian product of the parameter axes, in a deterministic order with
+    the last axis varying fastest
+    '''
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*axes.values())]
+
+
+class EventDrivenBacktest(object):
+    '''
+    BacktestFunction running the components build(params) returns on the
+    market data, whose columns are the arguments of 
+    ArrayEventStore.from_columns(): 'timestamps', 'symbols' as a fixed
+    width string array, 'prices', 'volumes' and optionally 'kinds'.
+
+    Like run_partitioned(), the portfolio must have equity() and traded(),
+    e.g. ArrayPortfolio, and the execution may have costs(). build must be 
+    picklable, i.e. a module level function.
+    '''
+    def __init__(
+            self,
+            build: ComponentFactory,
+            initial_capital: float,
+            periods_per_year: float = PERIODS_PER_YEAR,
+    ):
+        self._build = build
+        self._initial_capital = initial_capital
+        self._periods_per_year = periods_per_year
+
+    def __call__(self, params: Mapping[str, Any], data: Mapping[str, np.ndarray]) -> Metrics:
+        strategy, portfolio, execution = self._build(params)
+        store = ArrayEventStore.from_columns(
+            'sweep',
+            timestamps=data['timestamps'],
+            symbols=data['symbols'],
+            prices=data['prices'],
+            volumes=data['volumes'],
+            kinds=data.get('kinds'),
+        )
+        processor = MetricsProcessor(
+            MbteProcessor(strategy, portfolio, execution),
+            equity=portfolio.equity, # type: ignore
+            initial_capital=self._initial_capital,
+            traded=portfolio.traded, # type: ignore
+            costs=getattr(execution, 'costs', None),
+            periods_per_year=self._periods_per_year,
+        )
+        head = store.peek()
+        if head is not None:
+            sequencer = EventSequencer(SimulationClock(head.timestamp), [store])
+            sequencer.set_processor(processor)
+            sequencer.run()
+            processor.sample()
+        return processor.snapshot()
+
+
+def run_sweep(
+        backtest: BacktestFunction,
+        grid: Sequence[Mapping[str, Any]],
+        data: Mapping[str, np.ndarray],
+        max_workers: int | None = None,
+        seed: int | None = None,
+        progress: ProgressCallback | None = None,
+        cancel: threading.Event | None = None,
+) -> pd.DataFrame:
+    '''
+    Run backtest(params, data) for every parameter set of the grid on a
+    process pool and return a table with the parameters and metrics of each
+    run, indexed by the position in the grid.
+
+    backtest must be picklable, i.e. a module level function or an
+    EventDrivenBacktest. If a run raises, the runs not yet started are
+    cancelled and the exception propagates. With seed,
+    each run also gets a 'seed' parameter derived from seed and its grid
+    position, so results do not depend on scheduling. progress is called
+    with (completed, total) after every run. Setting cancel stops
+    submitting work, pending runs are dropped and the rows of the finished
+    ones are returned with attrs['cancelled'] set. Runs that fail after the
+    cancel are dropped as well.
+    '''
+    runs = [dict(params) for params in grid]
+    if seed is not None:
+        for i, params in enumerate(runs):
+            params['seed'] = int(np.random.SeedSequence([seed, i]).generate_state(1)[0])
+
+    rows: dict[int, dict[str, Any]] = {}
+    cancelled = False
+    with SharedArrays(data) as shared:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(shared.specs(),),
+        ) as executor:
+            futures: dict[Future, int] = {
+                executor.submit(_run_one, backtest, params): i
+                for i, params in enumerate(runs)
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = futures[future]
+                    try:
+                        result = future.result()
+                    except BaseException:
+                        for other in pending:
+                            other.cancel()
+                        logger.info('parameter sweep failed', extra={'run': i})
+                        raise
+                    rows[i] = {**runs[i], **result}
+                    if progress is not None:
+                        progress(len(rows), len(runs))
+                if cancel is not None and cancel.is_set() and pending:
+                    cancelled = True
+                    for future in pending:
+                        future.cancel()
+                    # runs already started still finish, keep the results of
+                    # those that succeeded
+                    done, _ = wait(pending)
+                    for future in done:
+                        if future.cancelled() or future.exception() is not None:
+                            continue
+                        rows[futures[future]] = {**runs[futures[future]], **future.result()}
+                    pending = set()
+                    logger.info('parameter sweep cancelled', extra={'completed': len(rows)})
+
+    table = pd.DataFrame.from_dict(rows, orient='index').sort_index()
+    table.index.name = 'run'
+    table.attrs['cancelled'] = cancelled
+    return table
+
+
+# shared data of the current worker process, set up by _init_worker
+_worker_data: dict[str, np.ndarray] = {}
+_worker_segments: list[shared_memory.SharedMemory] = []
+
+
+def _init_worker(specs: Sequence[SharedArraySpec]) -> None:
+    global _worker_data, _worker_segments
+    _worker_data, _worker_segments = attach_shared_arrays(specs)
+
+
+def _run_one(backtest: BacktestFunction, params: Mapping[str, Any]) -> dict[str, Any]:
+    result = backtest(params, _worker_data)
+    if hasattr(result, '_asdict'):
+        result = result._asdict()
+    return dict(result)
@@ -0,0 +1,91 @@
+'''
+Interning of symbols to dense integer ids, for per-symbol state kept in
+arrays indexed by id rather than in dicts keyed by symbol.
+
+SYMBOLS is the process wide table. Array backed stores intern their 
+symbols in it, so every event of a symbol shares one string object 
+whichever store or file it came from, and symbol_id(event.symbol) gives a
+small int that is stable for the whole run.
+'''
+from typing import Iterable, Sequence
+
+import numpy as np
+
+
+class SymbolTable(object):
+    '''
+    Assigns ids 0, 1, 2, ... to symbols in the order they are first seen
+    '''
+    def __init__(self, symbols: Iterable[str] = ()):
+        self._ids: dict[str, int] = {}
+        self._symbols: list[str] = []
+        # ids of the last array given to ids(), cross-sectional slices
+        # usually repeat the same universe at every timestamp
+        self._last_symbols: np.ndarray | None = None
+        self._last_ids: np.ndarray | None = None
+        for symbol in symbols:
+            self.intern(symbol)
+
+    def intern(self, symbol: str) -> int:
+        symbol_id = self._ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._ids[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        return symbol_id
+
+    def ids(self, symbols: Sequence[str] | np.ndarray) -> np.ndarray:
+        '''
+        Interned ids of symbols as an int64 array
+        '''
+        last = self._last_symbols
+        if (
+            isinstance(symbols, np.ndarray)
+            and last is not None
+            and len(last) == len(symbols)
+            and np.array_equal(last, symbols)
+        ):
+            return self._last_ids # type: ignore
+        intern = self.intern
+        ids = np.fromiter((intern(s) for s in symbols), dtype=np.int64, count=len(symbols))
+        ids.flags.writeable = False
+        if isinstance(symbols, np.ndarray):
+            self._last_symbols, self._last_ids = symbols.copy(), ids
+        return ids
+
+    def canonical(self, symbol: str) -> str:
+        '''
+        The interned string object equal to symbol
+        '''
+        return self._symbols[self.intern(symbol)]
+
+    def get(self, symbol: str) -> int | None:
+        return self._ids.get(symbol)
+
+    def symbol(self, symbol_id: int) -> str:
+        return self._symbols[symbol_id]
+
+    def symbols(self) -> list[str]:
+        return list(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._ids
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+
+SYMBOLS = SymbolTable()
+
+
+def symbol_id(symbol: str) -> int:
+    '''
+    Id of symbol in the process wide table
+    '''
+    return SYMBOLS.intern(symbol)
+
+
+def intern_symbol(symbol: str) -> str:
+    '''
+    The shared string object of symbol in the process wide table
+    '''
+    return SYMBOLS.canonical(symbol)
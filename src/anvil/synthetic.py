@@ -0,0 +1,282 @@
+'''
+Seeded synthetic market data for the validation tests of the README.
+
+RandomWalkStore and GBMStore are ChunkedEventStores that generate their
+price paths in NumPy blocks as they are read, so a path of 10^8 bars
+costs the memory of one block rather than of the whole path:
+
+    store = GBMStore(n_bars=100_000_000, seed=42, volatility=0.01)
+    sequencer = EventSequencer(SimulationClock(store.peek().timestamp), [store])
+
+Every bar has one MarketCloseEvent per symbol, the symbols following
+independent paths. Increments are normal, optionally with compound
+Poisson jumps, see JumpModel, and volumes are zero unless a VolumeModel
+is given.
+
+The stream is a function of the parameters and the seed only. Block i is
+drawn from its own generator, spawned from the seed with spawn key (i,),
+and accumulated from the last level of block i - 1, so the same seed
+gives the same bars whatever chunk_size the events are read in. blocks()
+yields the same arrays directly, for vectorized checks that do not need
+the event loop.
+'''
+from abc import abstractmethod
+from datetime import datetime, timedelta
+import logging
+from typing import Any, Iterator, NamedTuple, Sequence
+
+import numpy as np
+
+from anvil.cache import config_fingerprint
+from anvil.clock import datetime_to_ns
+from anvil.event_processing import ArrayEventStore
+from anvil.loader import DEFAULT_CHUNK_SIZE, ChunkedEventStore
+
+logger = logging.getLogger(__name__)
+
+# bars generated at a time, part of the definition of the stream
+DEFAULT_BLOCK_SIZE = 1 << 16
+DEFAULT_START = datetime(2000, 1, 3)
+
+
+class JumpModel(NamedTuple):
+    '''
+    Jumps arriving as a Poisson process of intensity jumps per bar, each
+    normal with mean and std, added to the increments
+    '''
+    intensity: float
+    mean: float = 0.0
+    std: float = 1.0
+
+
+class VolumeModel(NamedTuple):
+    '''
+    Lognormal volumes with the given mean and dispersion, the standard
+    deviation of the log volume
+    '''
+    mean: float
+    dispersion: float = 0.5
+
+
+class SyntheticBlock(NamedTuple):
+    # index of the first bar of the block
+    start: int
+    # int64 nanoseconds, one per bar
+    timestamps: np.ndarray
+    # bars x symbols
+    prices: np.ndarray
+    volumes: np.ndarray
+
+
+class SyntheticEventStore(ChunkedEventStore):
+    '''
+    Base of the synthetic stores. Subclasses define the model through
+    _increments() and _prices(), a path being the cumulative sum of the
+    increments from a level of zero.
+    '''
+    def __init__(
+            self,
+            name: str,
+            n_bars: int,
+            seed: int,
+            symbols: Sequence[str] = ('SYN',),
+            start: datetime = DEFAULT_START,
+            interval: timedelta = timedelta(days=1),
+            jumps: JumpModel | None = None,
+            volume: VolumeModel | None = None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            block_size: int = DEFAULT_BLOCK_SIZE,
+    ):
+        if n_bars < 0:
+            raise ValueError(f'n_bars must not be negative, got {n_bars}')
+        if chunk_size < 1 or block_size < 1:
+            raise ValueError('chunk_size and block_size must be positive')
+        if not symbols:
+            raise ValueError('at least one symbol is required')
+        self._n_bars = n_bars
+        self._seed = seed
+        self._symbols = tuple(symbols)
+        self._start = start
+        self._interval = interval
+        self._jumps = jumps
+        self._volume = volume
+        self._chunk_size = chunk_size
+        self._block_size = block_size
+        super().__init__(name, self._read_chunks())
+
+    def n_bars(self) -> int:
+        return self._n_bars
+
+    def symbols(self) -> list[str]:
+        return list(self._symbols)
+
+    def parameters(self) -> dict[str, Any]:
+        '''
+        Everything the stream depends on
+        '''
+        return {
+            'model': type(self).__name__,
+            'n_bars': self._n_bars,
+            'seed': self._seed,
+            'symbols': list(self._symbols),
+            'start': datetime_to_ns(self._start),
+            'interval': _interval_ns(self._interval),
+            'jumps': self._jumps,
+            'volume': self._volume,
+            'block_size': self._block_size,
+            **self._model_parameters(),
+        }
+
+    def fingerprint(self) -> str:
+        '''
+        Digest of the parameters, the data is never hashed
+        '''
+        return config_fingerprint(self.parameters())
+
+    def blocks(self) -> Iterator[SyntheticBlock]:
+        '''
+        The whole path from its first bar, whatever has been read from
+        the store
+        '''
+        n_symbols = len(self._symbols)
+        start_ns = datetime_to_ns(self._start)
+        interval_ns = _interval_ns(self._interval)
+        level = np.zeros(n_symbols)
+        for i, lo in enumerate(range(0, self._n_bars, self._block_size)):
+            n = min(self._block_size, self._n_bars - lo)
+            rng = np.random.default_rng(np.random.SeedSequence(self._seed, spawn_key=(i,)))
+            shape = (n, n_symbols)
+            increments = self._increments(rng, shape)
+            if self._jumps is not None:
+                counts = rng.poisson(self._jumps.intensity, shape)
+                sizes = rng.standard_normal(shape)
+                # the sum of k normal jumps is normal with k times the moments
+                increments += counts * self._jumps.mean + np.sqrt(counts) * self._jumps.std * sizes
+            if self._volume is not None:
+                sigma = self._volume.dispersion
+                volumes = rng.lognormal(np.log(self._volume.mean) - sigma * sigma / 2, sigma, shape)
+            else:
+                volumes = np.zeros(shape)
+            path = np.cumsum(increments, axis=0)
+            path += level
+            level = path[-1].copy()
+            yield SyntheticBlock(
+                start=lo,
+                timestamps=start_ns + (lo + np.arange(n, dtype=np.int64)) * interval_ns,
+                prices=self._prices(path),
+                volumes=volumes,
+            )
+
+    def _model_parameters(self) -> dict[str, Any]:
+        return {}
+
+    @abstractmethod
+    def _increments(self, rng: np.random.Generator, shape: tuple[int, int]) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def _prices(self, path: np.ndarray) -> np.ndarray:
+        pass
+
+    def _read_chunks(self) -> Iterator[ArrayEventStore]:
+        n_symbols = len(self._symbols)
+        bars_per_chunk = max(self._chunk_size // n_symbols, 1)
+        symbol_ids = np.arange(n_symbols, dtype=np.int32)
+        for block in self.blocks():
+            for lo in range(0, len(block.timestamps), bars_per_chunk):
+                hi = lo + bars_per_chunk
+                n = len(block.timestamps[lo:hi])
+                yield ArrayEventStore(
+                    name=self._name,
+                    timestamps=np.repeat(block.timestamps[lo:hi], n_symbols),
+                    symbol_ids=np.tile(symbol_ids, n),
+                    prices=block.prices[lo:hi].ravel(),
+                    volumes=block.volumes[lo:hi].ravel(),
+                    symbols=self._symbols,
+                    validate=False,
+                )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'generated synthetic block',
+                    extra={'event_store': self._name, 'start': block.start},
+                )
+
+
+class RandomWalkStore(SyntheticEventStore):
+    '''
+    Arithmetic random walk from initial_price with normal increments of
+    drift and volatility per bar. Prices are not kept positive, use
+    GBMStore for long paths.
+    '''
+    def __init__(
+            self,
+            n_bars: int,
+            seed: int,
+            initial_price: float = 100.0,
+            drift: float = 0.0,
+            volatility: float = 1.0,
+            name: str = 'random-walk',
+            **kwargs: Any,
+    ):
+        self._initial_price = initial_price
+        self._drift = drift
+        self._volatility = volatility
+        super().__init__(name, n_bars, seed, **kwargs)
+
+    def _model_parameters(self) -> dict[str, Any]:
+        return {
+            'initial_price': self._initial_price,
+            'drift': self._drift,
+            'volatility': self._volatility,
+        }
+
+    def _increments(self, rng: np.random.Generator, shape: tuple[int, int]) -> np.ndarray:
+        increments = rng.standard_normal(shape)
+        increments *= self._volatility
+        increments += self._drift
+        return increments
+
+    def _prices(self, path: np.ndarray) -> np.ndarray:
+        return self._initial_price + path
+
+
+class GBMStore(SyntheticEventStore):
+    '''
+    Geometric Brownian motion from initial_price with drift and volatility
+    of the log returns per bar, so that the expected price grows by
+    exp(drift) per bar. Jumps are added to the log returns.
+    '''
+    def __init__(
+            self,
+            n_bars: int,
+            seed: int,
+            initial_price: float = 100.0,
+            drift: float = 0.0,
+            volatility: float = 0.01,
+            name: str = 'gbm',
+            **kwargs: Any,
+    ):
+        self._initial_price = initial_price
+        self._drift = drift
+        self._volatility = volatility
+        super().__init__(name, n_bars, seed, **kwargs)
+
+    def _model_parameters(self) -> dict[str, Any]:
+        return {
+            'initial_price': self._initial_price,
+            'drift': self._drift,
+            'volatility': self._volatility,
+        }
+
+    def _increments(self, rng: np.random.Generator, shape: tuple[int, int]) -> np.ndarray:
+        increments = rng.standard_normal(shape)
+        increments *= self._volatility
+        increments += self._drift - self._volatility * self._volatility / 2
+        return increments
+
+    def _prices(self, path: np.ndarray) -> np.ndarray:
+        return self._initial_price * np.exp(path)
+
+
+def _interval_ns(interval: timedelta) -> int:
+    return interval // timedelta(microseconds=1) * 1000
@@ -0,0 +1,43 @@
+'''
+Helpers shared by the test modules. Strategies live at module level so
+that sweep and partition workers can unpickle them.
+'''
+import numpy as np
+
+from anvil.core import Strategy
+from anvil.event_processing import EventStore
+from anvil.events import Event, MarketCloseEvent, SignalEvent
+
+
+def random_walk(n: int, seed: int = 7) -> np.ndarray:
+    return 100.0 + np.cumsum(np.random.default_rng(seed).standard_normal(n))
+
+
+def drain(store: EventStore) -> list[Event]:
+    events = []
+    while (event := store.pop()) is not None:
+        events.append(event)
+    return events
+
+
+class Momentum(Strategy):
+    '''
+    Long or short each symbol by the sign of its price change over the
+    last window closes, silent until it has window + 1 closes
+    '''
+    def __init__(self, window: int = 3):
+        self._window = window
+        self._prices: dict[str, list[float]] = {}
+
+    def symbol_independent(self) -> bool:
+        return True
+
+    def on_event(self, event: Event) -> SignalEvent | None:
+        if not isinstance(event, MarketCloseEvent):
+            return None
+        prices = self._prices.setdefault(event.symbol, [])
+        prices.append(event.price)
+        if len(prices) <= self._window:
+            return None
+        value = float(np.sign(prices[-1] - prices[-1 - self._window]))
+        return SignalEvent(timestamp=event.timestamp, symbol=event.symbol, value=value)
@@ -0,0 +1,89 @@
+from datetime import datetime
+import json
+
+import pytest
+
+from anvil.benchmark import (
+    WORKLOADS,
+    BenchmarkResult,
+    _SchedulingProcessor,
+    compare,
+    load_results,
+    main,
+    run_benchmarks,
+    save_results,
+)
+from anvil.events import MarketCloseEvent
+
+
+def _result(name: str, events_per_sec: float) -> BenchmarkResult:
+    return BenchmarkResult(
+        name=name,
+        events=1000,
+        seconds=1000 / events_per_sec,
+        events_per_sec=events_per_sec,
+        ns_per_event=1e9 / events_per_sec,
+        peak_memory_bytes=0,
+    )
+
+
+@pytest.mark.parametrize('name', list(WORKLOADS))
+def test_workloads(name):
+    result, = run_benchmarks([name], n_events=2000, repeat=1)
+    assert result.name == name
+    assert result.events > 0
+    assert result.events_per_sec > 0
+    assert result.peak_memory_bytes > 0
+
+
+def test_unknown_benchmark():
+    with pytest.raises(ValueError):
+        run_benchmarks(['no_such_benchmark'])
+
+
+def test_save_load(tmp_path):
+    path = tmp_path / 'bench.json'
+    results = [_result('merge_1_store', 1e6), _result('cancel_heavy', 2e5)]
+    save_results(path, results)
+    assert load_results(path) == results
+    with open(path) as f:
+        assert 'python' in json.load(f)['machine']
+
+
+def test_compare():
+    baseline = [_result('a', 100.0), _result('b', 100.0), _result('c', 100.0)]
+    results = [_result('a', 95.0), _result('b', 80.0), _result('d', 10.0)]
+    comparisons = compare(results, baseline, tolerance=0.1)
+    assert [c.name for c in comparisons] == ['a', 'b']
+    assert [c.regressed for c in comparisons] == [False, True]
+    assert comparisons[1].change == pytest.approx(-0.2)
+
+
+def test_main_flags_regression(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    save_results(baseline, [_result('merge_1_store', 1e15)])
+    args = ['merge_1_store', '--events', '1000', '--repeat', '1']
+    assert main(args + ['--output', str(tmp_path / 'out.json')]) == 0
+    assert load_results(tmp_path / 'out.json')[0].name == 'merge_1_store'
+    assert main(args + ['--baseline', str(baseline)]) == 1
+    assert 'REGRESSED' in capsys.readouterr().out
+
+
+def test_scheduling_processor_cancels_every_nth_timer():
+    class Sequencer:
+        def __init__(self):
+            self.scheduled = 0
+            self.cancelled = []
+
+        def schedule(self, event):
+            self.scheduled += 1
+            return self.scheduled
+
+        def cancel(self, schedule_id):
+            self.cancelled.append(schedule_id)
+
+    sequencer = Sequencer()
+    processor = _SchedulingProcessor(sequencer, cancel_every=3)
+    for i in range(9):
+        processor.process(MarketCloseEvent(datetime(2025, 1, 2, 0, i), 'SPY', 100.0, 1.0))
+    assert sequencer.cancelled == [3, 6, 9]
@@ -0,0 +1,218 @@
+from concurrent.futures import ProcessPoolExecutor
+import dataclasses
+import math
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from anvil.cache import (
+    CachedBacktest,
+    ResultCache,
+    code_version,
+    config_fingerprint,
+    fingerprint_arrays,
+    make_key,
+    split_result,
+)
+from anvil.event_processing import ArrayEventStore
+from anvil.metrics import Metrics
+from anvil.sweep import parameter_grid, run_sweep
+from anvil.vectorized import CostModel, run_vectorized
+
+from test_sweep import momentum_backtest
+
+
+@dataclasses.dataclass
+class _Config:
+    window: int
+    commission: float
+
+
+def _key(i: int) -> str:
+    return make_key('data', {'i': i}, 'code')
+
+
+def _put_many(directory: str, start: int) -> None:
+    cache = ResultCache(directory, max_bytes=20_000)
+    rng = np.random.default_rng(start)
+    for i in range(start, start + 20):
+        cache.put(_key(i), {'i': i}, {'equity': rng.normal(size=500)})
+
+
+def vectorized_backtest(params, data):
+    return run_vectorized(
+        data['prices'],
+        lambda prices: np.sign(prices - np.roll(prices, params['window'])),
+        costs=CostModel(commission=params['commission']),
+    )
+
+
+class TestFingerprints:
+    def test_arrays(self):
+        a = {'prices': np.arange(5.0), 'volumes': np.ones(5)}
+        assert fingerprint_arrays(a) == fingerprint_arrays(dict(reversed(a.items())))
+        assert fingerprint_arrays(a) != fingerprint_arrays({**a, 'prices': np.arange(5.0) + 1e-12})
+        assert fingerprint_arrays(a) != fingerprint_arrays({**a, 'prices': np.arange(5)})
+        assert fingerprint_arrays(a) != fingerprint_arrays({'prices': a['prices']})
+
+    def test_config(self):
+        assert config_fingerprint({'a': 1, 'b': [1.5, 'x']}) == config_fingerprint({'b': [1.5, 'x'], 'a': 1})
+        assert config_fingerprint({'a': 1}) != config_fingerprint({'a': 2})
+        assert config_fingerprint(_Config(5, 0.001)) == config_fingerprint(_Config(5, np.float64(0.001)))
+        assert config_fingerprint(_Config(5, 0.001)) != config_fingerprint(_Config(5, 0.002))
+        assert config_fingerprint(CostModel(commission=0.001)) != config_fingerprint(CostModel())
+        with pytest.raises(TypeError):
+            config_fingerprint({'a': object()})
+
+    def test_code_version(self):
+        assert code_version() == code_version()
+        assert code_version(momentum_backtest) != code_version()
+        assert code_version(momentum_backtest) != code_version(vectorized_backtest)
+
+    def test_event_store(self):
+        timestamps = np.arange(4, dtype=np.int64) * 1_000_000_000
+        ids = np.zeros(4, dtype=np.int64)
+        store = ArrayEventStore('s', timestamps, ids, np.arange(4.0), np.ones(4), ['A'])
+        same = ArrayEventStore('t', timestamps, ids, np.arange(4.0), np.ones(4), ['A'])
+        other = ArrayEventStore('s', timestamps, ids, np.arange(4.0), np.ones(4), ['B'])
+        assert store.fingerprint() == same.fingerprint()
+        assert store.fingerprint() != other.fingerprint()
+        store.pop()
+        assert store.fingerprint() == same.fingerprint()
+
+    def test_key(self):
+        key = make_key('data', {'window': 5}, 'code')
+        assert key == make_key('data', {'window': 5}, 'code')
+        assert key != make_key('other', {'window': 5}, 'code')
+        assert key != make_key('data', {'window': 6}, 'code')
+        assert key != make_key('data', {'window': 5}, 'other')
+
+
+class TestResultCache:
+    def test_roundtrip(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        equity = np.linspace(100.0, 110.0, 50)
+        assert cache.get(_key(0)) is None
+        cache.put(_key(0), {'sharpe': 1.5, 'periods': 50, 'max_drawdown': math.nan}, {'equity': equity})
+
+        entry = cache.get(_key(0))
+        assert entry.metrics['sharpe'] == 1.5
+        assert entry.metrics['periods'] == 50
+        assert math.isnan(entry.metrics['max_drawdown'])
+        np.testing.assert_array_equal(entry.arrays['equity'], equity)
+        assert _key(0) in cache
+        assert cache.stats() == (1, 1, 0)
+        assert ResultCache(tmp_path).get(_key(0)) is not None
+
+    def test_invalid_key(self, tmp_path):
+        with pytest.raises(ValueError):
+            ResultCache(tmp_path).get('../x')
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        rng = np.random.default_rng(0)
+        for i in range(3):
+            cache.put(_key(i), {'i': i}, {'equity': rng.normal(size=1000)})
+            path = tmp_path / _key(i)[:2] / f'{_key(i)}.npz'
+            os.utime(path, (1000.0 + i, 1000.0 + i))
+        size = cache.size_bytes()
+
+        # reading the oldest entry makes it the most recent one
+        assert cache.get(_key(0)) is not None
+        cache = ResultCache(tmp_path, max_bytes=size)
+        cache.put(_key(3), {'i': 3}, {'equity': rng.normal(size=1000)})
+
+        assert _key(0) in cache
+        assert _key(1) not in cache
+        assert _key(3) in cache
+        assert cache.size_bytes() <= size
+        assert cache.stats().evictions >= 1
+
+    def test_get_or_compute(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        calls = []
+        metrics = Metrics(1.0, 0.1, 0.01, 0.05, 1.2, 3.0, 10)
+
+        def compute():
+            calls.append(1)
+            return metrics
+
+        first = cache.get_or_compute(_key(0), compute)
+        second = cache.get_or_compute(_key(0), compute)
+        assert len(calls) == 1
+        assert first == second
+        assert first.metrics == metrics._asdict()
+
+    def test_concurrent_processes(self, tmp_path):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(_put_many, [str(tmp_path)] * 4, range(0, 80, 20)))
+
+        cache = ResultCache(tmp_path, max_bytes=20_000)
+        assert cache.size_bytes() <= 20_000
+        assert not list(tmp_path.glob('*/*.tmp'))
+        found = [i for i in range(80) if cache.get(_key(i)) is not None]
+        assert found
+        for i in found:
+            assert cache.get(_key(i)).metrics == {'i': i}
+
+
+def total_backtest(params, data):
+    return {'total': float(np.sum(data['prices']))}
+
+
+class TestCachedBacktest:
+    def test_split_result(self):
+        prices = 100.0 + np.cumsum(np.random.default_rng(0).normal(size=100))
+        result = vectorized_backtest({'window': 5, 'commission': 0.0}, {'prices': prices})
+        entry = split_result(result)
+        assert entry.metrics == result.metrics._asdict()
+        np.testing.assert_array_equal(entry.arrays['equity'], result.equity)
+
+    def test_reuses_results(self, tmp_path):
+        prices = 100.0 + np.cumsum(np.random.default_rng(0).normal(size=500))
+        backtest = CachedBacktest(vectorized_backtest, tmp_path)
+        params = {'window': 5, 'commission': 0.001}
+
+        first = backtest(params, {'prices': prices})
+        second = backtest(params, {'prices': prices})
+        assert backtest.cache().stats()[:2] == (1, 1)
+        assert first.keys() == second.keys()
+        np.testing.assert_array_equal(first['equity'], second['equity'])
+        assert first['sharpe'] == second['sharpe']
+
+        backtest({'window': 6, 'commission': 0.001}, {'prices': prices})
+        backtest(params, {'prices': prices + 1.0})
+        assert backtest.cache().stats()[:2] == (1, 3)
+
+        unpickled = pickle.loads(pickle.dumps(backtest))
+        unpickled(params, {'prices': prices})
+        assert unpickled.cache().stats()[:2] == (1, 0)
+
+    def test_data_edited_in_place(self, tmp_path):
+        backtest = CachedBacktest(total_backtest, tmp_path)
+        data = {'prices': np.arange(5.0)}
+        assert backtest({}, data)['total'] == 10.0
+        data['prices'] += 7.0
+        assert backtest({}, data)['total'] == 45.0
+        assert backtest.cache().stats()[:2] == (0, 2)
+
+        # read-only arrays, as in sweep workers, are hashed once
+        data['prices'].flags.writeable = False
+        backtest({}, data)
+        assert backtest({}, data)['total'] == 45.0
+        assert backtest.cache().stats()[:2] == (2, 2)
+
+    def test_sweep(self, tmp_path):
+        prices = 100.0 + np.cumsum(np.random.default_rng(0).normal(size=2000))
+        grid = parameter_grid(window=[5, 10], commission=[0.0, 0.001])
+        backtest = CachedBacktest(momentum_backtest, tmp_path)
+
+        expected = run_sweep(momentum_backtest, grid, {'prices': prices}, max_workers=2, seed=42)
+        first = run_sweep(backtest, grid, {'prices': prices}, max_workers=2, seed=42)
+        assert len(list(tmp_path.glob('*/*.npz'))) == 4
+        second = run_sweep(backtest, grid, {'prices': prices}, max_workers=2, seed=42)
+
+        assert first.equals(expected)
+        assert second.equals(expected)
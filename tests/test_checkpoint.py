@@ -0,0 +1,322 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from anvil.checkpoint import MAGIC, Checkpointer, Stateful
+from anvil.clock import SimulationClock
+from anvil.event_processing import ArrayEventStore, EventSequencer, EventStore
+from anvil.events import Event, InternalSchedulingEvent
+from anvil.loader import ChunkedEventStore
+from anvil.prefetch import PrefetchingEventStore
+from anvil.synthetic import RandomWalkStore
+from helpers import drain
+from test_event_processing import (
+    MockEventStore,
+    MockInternalSchedulingEvent2,
+    MockReschedulingEventProcessor,
+)
+
+
+class MockStatefulEventProcessor(MockReschedulingEventProcessor, Stateful):
+    def get_state(self):
+        return {'events': list(self._events), 'last_id': self._last_id}
+
+    def set_state(self, state):
+        self._events = list(state['events'])
+        self._last_id = state['last_id']
+
+
+def _get_stores() -> list[ArrayEventStore]:
+    rng = np.random.default_rng(11)
+    stores = []
+    for i in range(3):
+        n = 150
+        seconds = np.sort(rng.integers(0, 120, size=n))
+        stores.append(ArrayEventStore.from_columns(
+            f'store-{i}',
+            timestamps=np.datetime64('2025-12-24T09:30', 'ns') + seconds * np.timedelta64(1, 's'),
+            symbols=[f'S{i}'] * n,
+            prices=rng.integers(0, 100, size=n).astype(np.float64),
+            volumes=np.ones(n),
+        ))
+    return stores
+
+
+def _get_setup(**kwargs) -> tuple[EventSequencer, MockStatefulEventProcessor, Checkpointer]:
+    sequencer = EventSequencer(
+        sim_clock=SimulationClock(datetime(2025, 12, 24)),
+        event_stores=_get_stores(), # type: ignore
+        **kwargs,
+    )
+    event_processor = MockStatefulEventProcessor(sequencer)
+    sequencer.set_processor(event_processor)
+    checkpointer = Checkpointer(sequencer)
+    checkpointer.register('processor', event_processor)
+    return sequencer, event_processor, checkpointer
+
+
+def _schedule(sequencer: EventSequencer) -> None:
+    sequencer.schedule_recurring(
+        MockInternalSchedulingEvent2(timestamp=datetime(2025, 12, 24, 9, 30), symbol='TICK'),
+        interval=timedelta(seconds=7),
+        end=datetime(2025, 12, 24, 9, 33),
+    )
+    sequencer.cancel(sequencer.schedule(
+        InternalSchedulingEvent(timestamp=datetime(2025, 12, 24, 9, 31), symbol='X'),
+    ))
+
+
+def _full_run(**kwargs) -> list[Event]:
+    sequencer, event_processor, _ = _get_setup(**kwargs)
+    _schedule(sequencer)
+    sequencer.run()
+    return event_processor.get_processed_events()
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'time_ns': True},
+    {'timer_resolution': timedelta(seconds=3)},
+])
+@pytest.mark.parametrize('n_events', [0, 1, 200, 450])
+def test_resume_matches_full_run(kwargs, n_events):
+    sequencer, _, checkpointer = _get_setup(**kwargs)
+    _schedule(sequencer)
+    sequencer.run_for(n_events)
+    data = checkpointer.snapshot()
+
+    resumed, event_processor, restorer = _get_setup(**kwargs)
+    restorer.restore(data)
+    resumed.run()
+    assert event_processor.get_processed_events() == _full_run(**kwargs)
+
+
+def test_fork_branches(tmp_path):
+    sequencer, _, checkpointer = _get_setup()
+    _schedule(sequencer)
+    sequencer.run_until(datetime(2025, 12, 24, 9, 31))
+    path = tmp_path / 'warm.ckpt'
+    checkpointer.save(path)
+
+    branches = []
+    for _ in range(2):
+        branch, event_processor, restorer = _get_setup()
+        restorer.load(path)
+        branch.run()
+        branches.append(event_processor.get_processed_events())
+    assert branches[0] == branches[1] == _full_run()
+
+
+def test_restore_between_heap_and_timers():
+    sequencer, _, checkpointer = _get_setup()
+    _schedule(sequencer)
+    sequencer.run_for(100)
+
+    resumed, event_processor, restorer = _get_setup(timer_resolution=timedelta(seconds=3))
+    restorer.restore(checkpointer.snapshot())
+    resumed.run()
+    assert event_processor.get_processed_events() == _full_run()
+
+
+def test_restores_clock():
+    sim_clock = SimulationClock(datetime(2025, 12, 24))
+    sequencer = EventSequencer(sim_clock=sim_clock, event_stores=_get_stores()) # type: ignore
+    sequencer.set_processor(MockStatefulEventProcessor(sequencer))
+    checkpointer = Checkpointer(sequencer)
+    sequencer.run_until(datetime(2025, 12, 24, 9, 31))
+    data = checkpointer.snapshot()
+    now = sim_clock.now()
+    sequencer.run()
+
+    checkpointer.restore(data)
+    assert sim_clock.now() == now
+
+
+def test_mismatched_setup():
+    _, _, checkpointer = _get_setup()
+    data = checkpointer.snapshot()
+
+    sequencer = EventSequencer(
+        sim_clock=SimulationClock(datetime(2025, 12, 24)),
+        event_stores=_get_stores()[:2], # type: ignore
+    )
+    with pytest.raises(ValueError):
+        Checkpointer(sequencer).restore(data)
+    with pytest.raises(ValueError):
+        _get_setup(time_ns=True)[2].restore(data)
+    with pytest.raises(ValueError):
+        checkpointer.restore(b'not a checkpoint')
+
+
+def test_rejects_truncated_checkpoints():
+    _, _, checkpointer = _get_setup()
+    data = checkpointer.snapshot()
+    for truncated in (MAGIC, data[:len(MAGIC) + 1], data[:-10]):
+        with pytest.raises(ValueError):
+            checkpointer.restore(truncated)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'batch_size': 16}, {'slices': True}])
+def test_snapshot_inside_store_event_handler(kwargs):
+    sequencer, event_processor, checkpointer = _get_setup(**kwargs)
+    process = event_processor.process
+
+    def snapshot_on_fifth(event):
+        process(event)
+        if len(event_processor.get_processed_events()) == 5:
+            checkpointer.snapshot()
+
+    event_processor.process = snapshot_on_fifth
+    with pytest.raises(RuntimeError, match='being processed'):
+        sequencer.run()
+
+
+def test_snapshot_inside_scheduled_event_handler():
+    sequencer, event_processor, checkpointer = _get_setup()
+    sequencer.schedule(InternalSchedulingEvent(timestamp=datetime(2025, 12, 24, 9, 31), symbol='X'))
+    process = event_processor.process
+    snapshots = []
+
+    def snapshot_on_scheduled(event):
+        process(event)
+        if event.symbol == 'X':
+            snapshots.append(checkpointer.snapshot())
+
+    event_processor.process = snapshot_on_scheduled
+    sequencer.run()
+    expected = event_processor.get_processed_events()
+
+    sequencer, event_processor, checkpointer = _get_setup()
+    checkpointer.restore(snapshots[0])
+    sequencer.run()
+    assert event_processor.get_processed_events() == expected
+
+
+def test_rejects_older_layouts():
+    sequencer, _, checkpointer = _get_setup()
+    data = bytearray(checkpointer.snapshot())
+    data[len(MAGIC)] = 1
+    with pytest.raises(ValueError, match='version'):
+        checkpointer.restore(bytes(data))
+
+    # the state of a version 1 sequencer
+    state = sequencer.get_state()
+    state['next_schedule_id'] = 3
+    with pytest.raises(ValueError, match='older'):
+        sequencer.set_state(state)
+
+
+def test_scheduled_item_is_deprecated():
+    with pytest.warns(DeprecationWarning):
+        from anvil.event_processing import ScheduledItem
+    assert ScheduledItem(InternalSchedulingEvent(datetime(2025, 12, 24), 'X'), 1).schedule_id == 1
+
+
+class UnsupportedEventStore(MockEventStore):
+    get_state = EventStore.get_state
+    set_state = EventStore.set_state
+
+
+def test_unsupported_store():
+    sequencer = EventSequencer(
+        sim_clock=SimulationClock(datetime(2025, 12, 24)),
+        event_stores=[UnsupportedEventStore('md', [])],
+    )
+    with pytest.raises(NotImplementedError):
+        Checkpointer(sequencer).snapshot()
+
+
+def test_register():
+    _, _, checkpointer = _get_setup()
+    with pytest.raises(ValueError):
+        checkpointer.register('processor', MockStatefulEventProcessor(None)) # type: ignore
+    with pytest.raises(TypeError):
+        checkpointer.register('other', object()) # type: ignore
+
+
+def _chunked(chunk_size: int) -> ChunkedEventStore:
+    # several symbols per timestamp, so timestamps straddle chunks
+    n = 600
+    seconds = np.repeat(np.arange(n // 3), 3)
+    store = ArrayEventStore.from_columns(
+        'chunked',
+        timestamps=np.datetime64('2025-12-24T09:30', 'ns') + seconds * np.timedelta64(1, 's'),
+        symbols=['A', 'B', 'C'] * (n // 3),
+        prices=np.arange(n, dtype=np.float64),
+        volumes=np.ones(n),
+    )
+    columns = (
+        store.timestamps_ns(),
+        np.tile(['A', 'B', 'C'], n // 3),
+        np.arange(n, dtype=np.float64),
+    )
+    return ChunkedEventStore('chunked', (
+        ArrayEventStore.from_columns(
+            'chunked',
+            timestamps=columns[0][lo:lo + chunk_size],
+            symbols=columns[1][lo:lo + chunk_size],
+            prices=columns[2][lo:lo + chunk_size],
+            volumes=np.ones(len(columns[0][lo:lo + chunk_size])),
+        )
+        for lo in range(0, n, chunk_size)
+    ))
+
+
+@pytest.mark.parametrize('build', [
+    lambda: _chunked(7),
+    lambda: _chunked(64),
+    lambda: PrefetchingEventStore(_chunked(50), chunk_size=11),
+    lambda: RandomWalkStore(300, seed=1, symbols=['A', 'B'], chunk_size=5, block_size=40),
+])
+@pytest.mark.parametrize('n_events', [0, 1, 2, 301, 599])
+def test_resume_streaming_store(build, n_events):
+    def setup():
+        sequencer = EventSequencer(SimulationClock(datetime(2000, 1, 1)), [build()])
+        event_processor = MockStatefulEventProcessor(sequencer)
+        sequencer.set_processor(event_processor)
+        checkpointer = Checkpointer(sequencer)
+        checkpointer.register('processor', event_processor)
+        return sequencer, event_processor, checkpointer
+
+    sequencer, event_processor, checkpointer = setup()
+    sequencer.run_for(n_events)
+    data = checkpointer.snapshot()
+    sequencer.run()
+    expected = event_processor.get_processed_events()
+
+    sequencer, event_processor, checkpointer = setup()
+    checkpointer.restore(data)
+    sequencer.run()
+    assert event_processor.get_processed_events() == expected
+
+
+@pytest.mark.parametrize('build', [
+    lambda: _chunked(7),
+    lambda: PrefetchingEventStore(_chunked(7), chunk_size=5),
+])
+def test_streaming_store_cursor_across_chunks(build):
+    expected = drain(build())
+
+    for n in range(40):
+        store = build()
+        for _ in range(n):
+            store.pop()
+        restored = build()
+        restored.set_state(store.get_state())
+        assert drain(restored) == expected[n:]
+
+
+def test_streaming_store_restores_forward_only():
+    store = _chunked(7)
+    state = store.get_state()
+    store.pop_batch(5)
+    with pytest.raises(ValueError, match='forward'):
+        store.set_state(state)
+
+    finished = _chunked(7)
+    exhausted = _chunked(7)
+    while exhausted.pop_batch(100):
+        pass
+    finished.set_state(exhausted.get_state())
+    assert finished.peek() is None
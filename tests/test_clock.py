@@ -1,6 +1,5 @@
-
-from datetime import datetime
-from anvil.clock import SimulationClock
+from datetime import datetime, timezone, timedelta
+from anvil.clock import SimulationClock, datetime_to_ns, ns_to_datetime
 
 
 def test_simulation_clock():
@@ -8,4 +7,38 @@ def test_simulation_clock():
     assert clock.now() == datetime(2025, 12, 24, 9, 30)
 
     clock.set_time(datetime(2025, 12, 24, 10, 30))
-    assert clock.now() == datetime(2025, 12, 24, 10, 30)
\ No newline at end of file
+    assert clock.now() == datetime(2025, 12, 24, 10, 30)
+
+
+def test_nanosecond_conversion():
+    t = datetime(2025, 12, 24, 9, 30, 0, 123456)
+    ns = datetime_to_ns(t)
+    assert ns == 1766568600123456000
+    assert ns_to_datetime(ns) == t
+    # sub-microsecond digits are truncated
+    assert ns_to_datetime(ns + 999) == t
+
+    aware = datetime(2025, 12, 24, 4, 30, tzinfo=timezone(timedelta(hours=-5)))
+    assert datetime_to_ns(aware) == datetime_to_ns(datetime(2025, 12, 24, 9, 30))
+
+
+def test_simulation_clock_ns():
+    start = datetime_to_ns(datetime(2025, 12, 24, 9, 30))
+    clock = SimulationClock(init_time=start)
+    assert clock.now_ns() == start
+    assert clock.now() == datetime(2025, 12, 24, 9, 30)
+
+    # nanosecond resolution is kept even though datetime cannot show it
+    clock.set_time_ns(start + 1)
+    assert clock.now_ns() == start + 1
+    assert clock.now() == datetime(2025, 12, 24, 9, 30)
+
+    # never goes backwards
+    clock.set_time_ns(start)
+    assert clock.now_ns() == start + 1
+
+    # mixing both representations
+    clock.set_time(datetime(2025, 12, 24, 10, 30))
+    assert clock.now_ns() == datetime_to_ns(datetime(2025, 12, 24, 10, 30))
+    clock.set_time(datetime(2025, 12, 24, 10, 0))
+    assert clock.now() == datetime(2025, 12, 24, 10, 30)
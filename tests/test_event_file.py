@@ -0,0 +1,145 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from anvil.clock import datetime_to_ns
+from anvil.event_file import EventFileReader, EventFileWriter, MmapEventStore
+from anvil.event_processing import ArrayEventStore
+from anvil.events import MarketCloseEvent, MarketOpenEvent
+from helpers import drain
+
+BASE_NS = datetime_to_ns(datetime(2025, 12, 24, 9, 30))
+MINUTE_NS = 60 * 1_000_000_000
+
+
+def _write_minutes(path, n: int, index_stride: int = 4):
+    timestamps = BASE_NS + np.arange(n, dtype=np.int64) * MINUTE_NS
+    with EventFileWriter(path, index_stride=index_stride) as writer:
+        # two chunks to exercise appending
+        half = n // 2
+        for lo, hi in ((0, half), (half, n)):
+            writer.append(
+                timestamps=timestamps[lo:hi],
+                symbols=np.where(np.arange(lo, hi) % 2 == 0, 'SPY', 'QQQ'),
+                prices=np.arange(lo, hi, dtype=np.float64),
+                volumes=np.full(hi - lo, 100.0),
+                kinds=(np.arange(lo, hi) % 2).astype(np.int8),
+            )
+    return timestamps
+
+
+class TestEventFile(object):
+    def test_round_trip(self, tmp_path):
+        _write_minutes(tmp_path / 'spy', 10)
+        store = MmapEventStore(tmp_path / 'spy', name='spy')
+        assert store.name() == 'spy'
+        assert len(store) == 10
+
+        assert store.pop() == MarketOpenEvent(
+            timestamp=datetime(2025, 12, 24, 9, 30),
+            symbol='SPY',
+            price=0.0,
+            volume=100.0,
+        )
+        assert store.pop() == MarketCloseEvent(
+            timestamp=datetime(2025, 12, 24, 9, 31),
+            symbol='QQQ',
+            price=1.0,
+            volume=100.0,
+        )
+        count = 2
+        while store.pop() is not None:
+            count += 1
+        assert count == 10
+
+    @pytest.mark.parametrize('start, end', [
+        (None, None),
+        (0, 10),
+        (3, 7),
+        (4, 8),
+        (5, 5),
+        (9, 30),
+    ])
+    def test_time_range(self, tmp_path, start, end):
+        _write_minutes(tmp_path / 'spy', 10)
+        to_ns = lambda i: None if i is None else BASE_NS + i * MINUTE_NS
+        store = MmapEventStore(tmp_path / 'spy', start=to_ns(start), end=to_ns(end))
+
+        lo = 0 if start is None else min(start, 10)
+        hi = 10 if end is None else min(end, 10)
+        assert len(store) == max(0, hi - lo)
+
+        popped = [event.price for event in drain(store)] # type: ignore
+        assert popped == [float(i) for i in range(lo, hi)]
+
+    def test_slice_shares_mapping(self, tmp_path):
+        _write_minutes(tmp_path / 'spy', 10)
+        reader = EventFileReader(tmp_path / 'spy')
+        store = MmapEventStore(reader)
+        window = store.slice(
+            start=datetime(2025, 12, 24, 9, 32),
+            end=datetime(2025, 12, 24, 9, 34),
+        )
+        assert len(window) == 2
+        assert np.shares_memory(window._prices, reader.column('price'))
+        assert isinstance(window, ArrayEventStore)
+
+    def test_incomplete_file(self, tmp_path):
+        writer = EventFileWriter(tmp_path / 'partial')
+        writer.append(
+            timestamps=np.array([BASE_NS]),
+            symbols=['SPY'],
+            prices=np.array([1.0]),
+            volumes=np.array([1.0]),
+        )
+        with pytest.raises(ValueError):
+            EventFileReader(tmp_path / 'partial')
+        writer.close()
+        assert len(EventFileReader(tmp_path / 'partial')) == 1
+
+    def test_unsorted_append(self, tmp_path):
+        with pytest.raises(ValueError):
+            with EventFileWriter(tmp_path / 'bad') as writer:
+                writer.append(
+                    timestamps=np.array([BASE_NS + 1, BASE_NS]),
+                    symbols=['SPY', 'SPY'],
+                    prices=np.array([1.0, 1.0]),
+                    volumes=np.array([1.0, 1.0]),
+                )
+
+    def test_rejected_append_leaves_file_intact(self, tmp_path):
+        with EventFileWriter(tmp_path / 'events') as writer:
+            writer.append(
+                timestamps=np.array([BASE_NS]),
+                symbols=['SPY'],
+                prices=np.array([1.0]),
+                volumes=np.array([1.0]),
+            )
+            with pytest.raises(ValueError):
+                writer.append(
+                    timestamps=np.array([BASE_NS + 1, BASE_NS + 2]),
+                    symbols=['QQQ', 'QQQ'],
+                    prices=np.array([2.0, 3.0]),
+                    volumes=np.array([1.0]),
+                )
+            with pytest.raises(ValueError):
+                writer.append(
+                    timestamps=np.array([BASE_NS + 1]),
+                    symbols=['IWM'],
+                    prices=np.array(['not a price']),
+                    volumes=np.array([1.0]),
+                )
+            writer.append(
+                timestamps=np.array([BASE_NS + 3]),
+                symbols=['DIA'],
+                prices=np.array([4.0]),
+                volumes=np.array([2.0]),
+            )
+
+        reader = EventFileReader(tmp_path / 'events')
+        assert len(reader) == 2
+        assert reader.symbols() == ['SPY', 'DIA']
+        store = MmapEventStore(tmp_path / 'events')
+        events = [store.pop(), store.pop()]
+        assert [(e.symbol, e.price, e.volume) for e in events] == [('SPY', 1.0, 1.0), ('DIA', 4.0, 2.0)] # type: ignore
@@ -1,6 +1,14 @@
-from datetime import datetime
-from anvil.clock import SimulationClock
+import dataclasses
+from datetime import datetime, timedelta
+import pickle
+
+import numpy as np
+import pytest
+
+from anvil.clock import SimulationClock, ns_to_datetime
 from anvil.event_processing import (
+    ArrayEventStore,
+    CalendarQueue,
     EventProcessor, 
     EventScheduler, 
     EventSequencer, 
@@ -12,9 +20,12 @@ from anvil.events import (
     InternalSchedulingEvent, 
     MarketCloseEvent, 
     MarketOpenEvent, 
+    MarketSliceEvent,
     PortfolioConstruction, 
     PortfolioLiquidation,
 )
+from anvil.symbols import intern_symbol, symbol_id
+from helpers import drain
 
 class TestMbtePriorityQueue(object):
     def _get_pq(self) -> MbtePriorityQueue[int, str]:
@@ -83,6 +94,12 @@ class MockEventStore(EventStore):
     def reset(self):
         self._index = 0
 
+    def get_state(self):
+        return self._index
+
+    def set_state(self, state):
+        self._index = state
+
     def get_index(self):
         return self._index
 
@@ -213,6 +230,7 @@ class TestEventSequencer(object):
     ]
 
     INITIAL_TIME = datetime(2025, 12, 24, 8, 30)
+    TIMER_RESOLUTION: timedelta | None = None
     MARKET_DATA_STORE_NAME = 'market-data'
     PORTFOLIO_STORE_NAME = 'portfolio-data'
 
@@ -277,6 +295,7 @@ class TestEventSequencer(object):
         sequencer = EventSequencer(
             sim_clock=sim_clock,
             event_stores=event_stores,
+            timer_resolution=self.TIMER_RESOLUTION,
         )
 
         event_processor = MockStandardEventProcessor()
@@ -295,6 +314,7 @@ class TestEventSequencer(object):
                 self._get_market_data_store(),
                 self._get_portfolio_event_store(),
             ],
+            timer_resolution=self.TIMER_RESOLUTION,
         )
 
         event_processor = MockMixedEventProcessor(sim_clock, sequncer)
@@ -411,3 +431,812 @@ class TestEventSequencer(object):
         sequencer.run()
         assert event_processor.get_processed_events() == self.EXPECTED_EXECUTION_SEQUENCE_WITH_INTERNAL
 
+
+class TestEventSequencerWithTimers(TestEventSequencer):
+    '''
+    Same scenarios with scheduled events kept in a CalendarQueue
+    '''
+    TIMER_RESOLUTION = timedelta(minutes=45)
+
+
+class TestCalendarQueue(object):
+    @pytest.mark.parametrize('resolution', [1, 7, 1000])
+    def test_matches_priority_queue(self, resolution: int):
+        rng = np.random.default_rng(resolution)
+        pq = MbtePriorityQueue[int, int]()
+        cq = CalendarQueue[int, int](resolution)
+        assert cq.peek() is None
+
+        for i in range(2000):
+            if rng.random() < 0.6:
+                key = int(rng.integers(0, 500))
+                pq.add(key, i)
+                cq.add(key, pq.seq(), i)
+            else:
+                assert cq.peek() == pq.peek()
+                assert cq.pop() == pq.pop()
+            assert len(cq) == len(pq)
+
+        # drop the odd values, ordering of the rest is unchanged
+        assert cq.retain(lambda v: v % 2 == 0) == pq.retain(lambda v: v % 2 == 0)
+        while pq.peek() is not None:
+            assert cq.pop() == pq.pop()
+        assert cq.pop() is None
+        assert len(cq) == 0
+
+    def test_datetime_keys(self):
+        cq = CalendarQueue[datetime, str](timedelta(hours=1))
+        cq.add(datetime(2025, 12, 24, 11), 1, 'b')
+        cq.add(datetime(2025, 12, 24, 9), 2, 'a')
+        cq.add(datetime(2025, 12, 24, 11), 3, 'c')
+        assert [cq.pop()[2] for _ in range(3)] == ['a', 'b', 'c'] # type: ignore
+
+
+class TestArrayEventStore(object):
+    def _get_store(self) -> ArrayEventStore:
+        return ArrayEventStore.from_events(
+            TestEventSequencer.MARKET_DATA_STORE_NAME,
+            TestEventSequencer.MARKET_DATA_EVENTS,
+        )
+
+    def test_peek_pop(self):
+        store = self._get_store()
+        assert store.name() == TestEventSequencer.MARKET_DATA_STORE_NAME
+        assert len(store) == 4
+
+        # peek is stable until pop
+        assert store.peek() is store.peek()
+        for expected in TestEventSequencer.MARKET_DATA_EVENTS:
+            assert store.peek() == expected
+            assert store.pop() == expected
+
+        assert store.peek() is None
+        assert store.pop() is None
+
+    def test_from_columns(self):
+        store = ArrayEventStore.from_columns(
+            'columns',
+            timestamps=np.array(
+                ['2025-12-24T09:30', '2025-12-24T09:30', '2025-12-24T09:31'],
+                dtype='datetime64[ns]',
+            ),
+            symbols=['SPY', 'AAPL', 'SPY'],
+            prices=np.array([409.0, 250.0, 409.5]),
+            volumes=np.array([100.0, 200.0, 300.0]),
+        )
+        assert store.pop() == MarketCloseEvent(
+            timestamp=datetime(2025, 12, 24, 9, 30),
+            symbol='SPY',
+            price=409.0,
+            volume=100.0,
+        )
+        assert store.pop().symbol == 'AAPL' # type: ignore
+        assert store.pop().timestamp == datetime(2025, 12, 24, 9, 31) # type: ignore
+        assert store.pop() is None
+
+    def test_unsorted_timestamps(self):
+        with pytest.raises(ValueError):
+            ArrayEventStore(
+                'unsorted',
+                timestamps=np.array([2, 1]),
+                symbol_ids=np.array([0, 0]),
+                prices=np.array([1.0, 1.0]),
+                volumes=np.array([1.0, 1.0]),
+                symbols=['SPY'],
+            )
+
+    def test_sequencer_with_array_store(self):
+        sim_clock = SimulationClock(TestEventSequencer.INITIAL_TIME)
+        sequencer = EventSequencer(
+            sim_clock=sim_clock,
+            event_stores=[
+                self._get_store(),
+                MockEventStore(
+                    TestEventSequencer.PORTFOLIO_STORE_NAME, 
+                    TestEventSequencer.PORTFOLIO_EVENT_DATA,
+                ),
+            ],
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        sequencer.run()
+
+        assert event_processor.get_processed_events() == TestEventSequencer.EXPECTED_EXECUTION_SEQUENCE_NO_INTERNAL
+
+
+class MockReschedulingEventProcessor(MockStandardEventProcessor):
+    '''
+    Deterministically schedules and cancels internal events based on the 
+    market data it sees, so that different sequencer code paths can be 
+    compared on their processed sequence
+    '''
+    def __init__(self, scheduler: EventScheduler):
+        super().__init__()
+        self._scheduler = scheduler
+        self._last_id: int | None = None
+
+    def process(self, event: Event):
+        super().process(event)
+        if not isinstance(event, MarketCloseEvent):
+            return
+        price = int(event.price)
+        if price % 3 == 0:
+            self._last_id = self._scheduler.schedule(MockInternalSchedulingEvent1(
+                timestamp=event.timestamp + timedelta(seconds=price % 4),
+                symbol=event.symbol,
+            ))
+        elif price % 7 == 0 and self._last_id is not None:
+            self._scheduler.cancel(self._last_id)
+
+
+class TestBatchedSequencing(object):
+    def _get_stores(self) -> list[EventStore]:
+        rng = np.random.default_rng(7)
+        stores: list[EventStore] = []
+        for i in range(4):
+            n = 200
+            # seconds with lots of ties within and across stores
+            seconds = np.sort(rng.integers(0, 120, size=n))
+            timestamps = np.array(
+                [datetime(2025, 12, 24, 9, 30 + s // 60, s % 60) for s in seconds.tolist()]
+            )
+            prices = rng.integers(0, 100, size=n).astype(np.float64)
+            store = ArrayEventStore.from_columns(
+                f'store-{i}',
+                timestamps=timestamps,
+                symbols=[f'S{i}'] * n,
+                prices=prices,
+                volumes=np.ones(n),
+            )
+            if i % 2:
+                # plain one-at-a-time store using the default batch protocol
+                store = MockEventStore(f'store-{i}', drain(store))
+            stores.append(store)
+        return stores
+
+    def _run(
+            self, 
+            step: bool, 
+            batch_size: int = 256, 
+            time_ns: bool = False,
+            timer_resolution: timedelta | None = None,
+    ) -> list[Event]:
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=self._get_stores(),
+            batch_size=batch_size,
+            time_ns=time_ns,
+            timer_resolution=timer_resolution,
+        )
+        event_processor = MockReschedulingEventProcessor(sequencer)
+        sequencer.set_processor(event_processor)
+        if step:
+            while sequencer.advance():
+                pass
+        else:
+            sequencer.run()
+        return event_processor.get_processed_events()
+
+    @pytest.mark.parametrize('batch_size', [1, 3, 256])
+    def test_run_matches_step_by_step(self, batch_size: int):
+        expected = self._run(step=True)
+        assert len(expected) > 800
+        assert any(isinstance(event, InternalSchedulingEvent) for event in expected)
+        assert self._run(step=False, batch_size=batch_size) == expected
+
+    @pytest.mark.parametrize('step', [True, False])
+    def test_time_ns_matches_datetime(self, step: bool):
+        assert self._run(step=step, time_ns=True) == self._run(step=True)
+
+    @pytest.mark.parametrize('step, time_ns', [
+        (True, False), (False, False), (True, True), (False, True),
+    ])
+    def test_timers_match_heap(self, step: bool, time_ns: bool):
+        actual = self._run(
+            step=step, 
+            time_ns=time_ns, 
+            timer_resolution=timedelta(seconds=2),
+        )
+        assert actual == self._run(step=True)
+
+    def test_array_store_batch(self):
+        store = ArrayEventStore.from_events('md', TestEventSequencer.MARKET_DATA_EVENTS)
+        head = store.peek()
+        batch = store.peek_batch(until=datetime(2025, 12, 26, 9, 30), max_count=10)
+        assert batch[0] is head
+        assert list(batch) == TestEventSequencer.MARKET_DATA_EVENTS[:2]
+        assert store.peek_batch(max_count=3) == TestEventSequencer.MARKET_DATA_EVENTS[:3]
+
+        assert store.pop_batch(3) == 3
+        assert store.peek() == TestEventSequencer.MARKET_DATA_EVENTS[3]
+        assert store.pop_batch(3) == 1
+        assert store.peek_batch(max_count=3) == []
+
+    def test_array_store_single_and_batched_reads_agree(self):
+        # sub-microsecond and pre-epoch timestamps, both truncated down
+        timestamps = np.array([-1_500, -999, 0, 999, 1_766_568_600_000_000_999])
+        store = ArrayEventStore(
+            'md',
+            timestamps=timestamps,
+            symbol_ids=np.zeros(len(timestamps), dtype=np.int32),
+            prices=np.ones(len(timestamps)),
+            volumes=np.ones(len(timestamps)),
+            symbols=['SPY'],
+        )
+        batch = list(store.peek_batch(max_count=len(timestamps)))
+        single = [store.pop() for _ in timestamps]
+        assert batch == single
+        assert [event.timestamp for event in single] == [ns_to_datetime(int(t)) for t in timestamps]
+
+
+class TestNanosecondSequencing(object):
+    def test_sub_microsecond_ordering(self):
+        base = 1766568600 * 1_000_000_000
+        late = ArrayEventStore(
+            'late',
+            timestamps=np.array([base + 500]),
+            symbol_ids=np.array([0]),
+            prices=np.array([1.0]),
+            volumes=np.array([1.0]),
+            symbols=['LATE'],
+        )
+        early = ArrayEventStore(
+            'early',
+            timestamps=np.array([base + 100]),
+            symbol_ids=np.array([0]),
+            prices=np.array([2.0]),
+            volumes=np.array([1.0]),
+            symbols=['EARLY'],
+        )
+        sim_clock = SimulationClock(base)
+        sequencer = EventSequencer(
+            sim_clock=sim_clock,
+            event_stores=[late, early],
+            time_ns=True,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+
+        assert sequencer.advance()
+        assert sim_clock.now_ns() == base + 100
+        assert sequencer.advance()
+        assert sim_clock.now_ns() == base + 500
+        assert not sequencer.advance()
+
+        # both events carry the same (truncated) datetime
+        assert [event.symbol for event in event_processor.get_processed_events()] == ['EARLY', 'LATE']
+        assert sim_clock.now() == datetime(2025, 12, 24, 9, 30)
+
+    def test_scheduling_with_time_ns(self):
+        sim_clock = SimulationClock(TestEventSequencer.INITIAL_TIME)
+        sequencer = EventSequencer(
+            sim_clock=sim_clock,
+            event_stores=[],
+            time_ns=True,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        for event in TestEventSequencer.INTERNAL_SCHEDULING_EVENTS:
+            sequencer.schedule(event)
+        sequencer.run()
+        assert event_processor.get_processed_events() == sorted(
+            TestEventSequencer.INTERNAL_SCHEDULING_EVENTS, key=lambda e: e.timestamp
+        )
+        assert sim_clock.now() == datetime(2025, 12, 26, 11, 30)
+
+
+class MockStopTimerEventProcessor(MockStandardEventProcessor):
+    '''
+    Cancels and replaces a timeout one hour ahead on every market event
+    '''
+    def __init__(self, scheduler: EventScheduler):
+        super().__init__()
+        self._scheduler = scheduler
+        self._timer_id: int | None = None
+        self.max_queue_size = 0
+
+    def process(self, event: Event):
+        super().process(event)
+        if isinstance(event, InternalSchedulingEvent):
+            return
+        if self._timer_id is not None:
+            assert self._scheduler.cancel(self._timer_id)
+        self._timer_id = self._scheduler.schedule(MockInternalSchedulingEvent1(
+            timestamp=event.timestamp + timedelta(hours=1),
+            symbol=event.symbol,
+        ))
+        stats = self._scheduler.scheduling_stats() # type: ignore
+        self.max_queue_size = max(self.max_queue_size, stats.queue_size)
+
+
+class TestCancellation(object):
+    def test_bounded_schedule_cancel_cycles(self):
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=[],
+        )
+        for i in range(100_000):
+            schedule_id = sequencer.schedule(MockInternalSchedulingEvent1(
+                timestamp=datetime(2025, 12, 24) + timedelta(seconds=i),
+                symbol='SPY',
+            ))
+            assert sequencer.cancel(schedule_id)
+            assert len(sequencer._merger_queue) <= EventSequencer.COMPACTION_MIN_CANCELLED
+
+        stats = sequencer.scheduling_stats()
+        assert stats.live_scheduled == 0
+        assert stats.cancelled_scheduled == stats.queue_size
+        assert stats.compactions > 0
+
+    @pytest.mark.parametrize('compaction_ratio', [0.0, -0.5, 1.5])
+    def test_invalid_compaction_ratio(self, compaction_ratio):
+        with pytest.raises(ValueError, match='compaction_ratio'):
+            EventSequencer(
+                sim_clock=SimulationClock(datetime(2025, 12, 24)),
+                event_stores=[],
+                compaction_ratio=compaction_ratio,
+            )
+
+    @pytest.mark.parametrize('timer_resolution', [None, timedelta(minutes=1)])
+    def test_handler_cancels_its_own_timer(self, timer_resolution):
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=[],
+            timer_resolution=timer_resolution,
+        )
+        schedule_ids: dict[datetime, int] = {}
+        cancelled: list[bool] = []
+
+        class SelfCancelling(MockStandardEventProcessor):
+            def process(self, event: Event):
+                super().process(event)
+                cancelled.append(sequencer.cancel(schedule_ids[event.timestamp]))
+
+        sequencer.set_processor(SelfCancelling())
+        for i in range(3):
+            timestamp = datetime(2025, 12, 24) + timedelta(seconds=i)
+            schedule_ids[timestamp] = sequencer.schedule(
+                MockInternalSchedulingEvent1(timestamp=timestamp, symbol='SPY'),
+            )
+        sequencer.run()
+
+        # the timer already fired, there is nothing left to cancel
+        assert cancelled == [False, False, False]
+        assert sequencer.scheduling_stats() == (0, 0, 0, 0)
+
+    def test_stop_timer_pattern(self):
+        n = 5000
+        store = ArrayEventStore.from_columns(
+            'md',
+            timestamps=np.datetime64('2025-12-24T09:30') + np.arange(n).astype('timedelta64[s]'),
+            symbols=['SPY'] * n,
+            prices=np.ones(n),
+            volumes=np.ones(n),
+        )
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=[store],
+            compaction_ratio=0.25,
+        )
+        event_processor = MockStopTimerEventProcessor(sequencer)
+        sequencer.set_processor(event_processor)
+        sequencer.run()
+
+        # only the last timer survives and fires
+        events = event_processor.get_processed_events()
+        assert len(events) == n + 1
+        assert events[-1].timestamp == events[-2].timestamp + timedelta(hours=1)
+        assert event_processor.max_queue_size <= 2 * EventSequencer.COMPACTION_MIN_CANCELLED
+
+        stats = sequencer.scheduling_stats()
+        assert stats == (0, 0, 0, stats.compactions)
+
+    def test_stop_timer_pattern_with_timers(self):
+        n = 2000
+        store = ArrayEventStore.from_columns(
+            'md',
+            timestamps=np.datetime64('2025-12-24T09:30') + np.arange(n).astype('timedelta64[s]'),
+            symbols=['SPY'] * n,
+            prices=np.ones(n),
+            volumes=np.ones(n),
+        )
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=[store],
+            timer_resolution=timedelta(minutes=1),
+        )
+        event_processor = MockStopTimerEventProcessor(sequencer)
+        sequencer.set_processor(event_processor)
+        sequencer.run()
+
+        assert len(event_processor.get_processed_events()) == n + 1
+        assert event_processor.max_queue_size <= 2 * EventSequencer.COMPACTION_MIN_CANCELLED
+
+
+class MockRecurringEventProcessor(MockStandardEventProcessor):
+    '''
+    Cancels the recurring series once it has seen max_occurrences of it
+    '''
+    def __init__(self, scheduler: EventScheduler, max_occurrences: int):
+        super().__init__()
+        self._scheduler = scheduler
+        self._max_occurrences = max_occurrences
+        self._occurrences = 0
+        self.series_id: int | None = None
+
+    def process(self, event: Event):
+        super().process(event)
+        if isinstance(event, InternalSchedulingEvent):
+            self._occurrences += 1
+            if self._occurrences == self._max_occurrences:
+                assert self._scheduler.cancel(self.series_id) # type: ignore
+
+
+class TestRecurringScheduling(object):
+    START = datetime(2025, 12, 24, 9, 0)
+
+    def _get_setup(
+            self, 
+            max_occurrences: int = 100, 
+            **kwargs,
+    ) -> tuple[SimulationClock, MockRecurringEventProcessor, EventSequencer]:
+        sim_clock = SimulationClock(TestEventSequencer.INITIAL_TIME)
+        sequencer = EventSequencer(
+            sim_clock=sim_clock,
+            event_stores=[ArrayEventStore.from_events(
+                'md', TestEventSequencer.MARKET_DATA_EVENTS[:2],
+            )],
+            **kwargs,
+        )
+        event_processor = MockRecurringEventProcessor(sequencer, max_occurrences)
+        sequencer.set_processor(event_processor)
+        return sim_clock, event_processor, sequencer
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'time_ns': True},
+        {'timer_resolution': timedelta(minutes=20)},
+    ])
+    def test_recurring_until_end(self, kwargs):
+        _, event_processor, sequencer = self._get_setup(**kwargs)
+        event_processor.series_id = sequencer.schedule_recurring(
+            MockInternalSchedulingEvent1(timestamp=self.START, symbol='SPY'),
+            interval=timedelta(hours=1),
+            end=datetime(2025, 12, 24, 13, 0),
+        )
+        # one queue entry for the series, one for the store
+        assert sequencer.scheduling_stats().queue_size == 2
+        sequencer.run()
+
+        timer_events = [
+            MockInternalSchedulingEvent1(timestamp=datetime(2025, 12, 24, hour), symbol='SPY')
+            for hour in (9, 10, 11, 12)
+        ]
+        assert event_processor.get_processed_events() == [
+            timer_events[0],
+            TestEventSequencer.MARKET_DATA_EVENTS[0],
+            *timer_events[1:],
+            TestEventSequencer.MARKET_DATA_EVENTS[1],
+        ]
+        # the series is over, nothing left to cancel
+        assert not sequencer.cancel(event_processor.series_id) # type: ignore
+        assert sequencer.scheduling_stats().live_scheduled == 0
+
+    def test_cancel_series_from_handler(self):
+        _, event_processor, sequencer = self._get_setup(max_occurrences=2)
+        event_processor.series_id = sequencer.schedule_recurring(
+            MockInternalSchedulingEvent1(timestamp=self.START, symbol='SPY'),
+            interval=timedelta(minutes=30),
+        )
+        sequencer.run()
+
+        # the 9:30 occurrence ties with the market open which was queued first
+        assert event_processor.get_processed_events() == [
+            MockInternalSchedulingEvent1(timestamp=self.START, symbol='SPY'),
+            TestEventSequencer.MARKET_DATA_EVENTS[0],
+            MockInternalSchedulingEvent1(timestamp=datetime(2025, 12, 24, 9, 30), symbol='SPY'),
+            TestEventSequencer.MARKET_DATA_EVENTS[1],
+        ]
+        assert sequencer.scheduling_stats() == (0, 0, 0, 0)
+
+    def test_invalid_interval(self):
+        _, _, sequencer = self._get_setup()
+        with pytest.raises(ValueError):
+            sequencer.schedule_recurring(
+                MockInternalSchedulingEvent1(timestamp=self.START, symbol='SPY'),
+                interval=timedelta(0),
+            )
+
+    def test_scheduler_without_recurring_support(self):
+        class OneOffScheduler(EventScheduler):
+            def schedule(self, internal_event: InternalSchedulingEvent) -> int:
+                return 0
+
+            def cancel(self, schedule_id: int) -> bool:
+                return False
+
+        with pytest.raises(NotImplementedError, match='OneOffScheduler'):
+            OneOffScheduler().schedule_recurring(
+                MockInternalSchedulingEvent1(timestamp=self.START, symbol='SPY'),
+                interval=timedelta(days=1),
+            )
+
+
+class TestSliceSequencing(object):
+    def _run(self, event_stores: list[EventStore], slices: bool) -> list[Event]:
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=event_stores,
+            slices=slices,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        sequencer.run()
+        return event_processor.get_processed_events()
+
+    def test_slices_hold_all_events_of_a_timestamp(self):
+        expected: dict[datetime, list[tuple]] = {}
+        for event in self._run(TestBatchedSequencing()._get_stores(), slices=False):
+            expected.setdefault(event.timestamp, []).append((event.symbol, event.price))
+
+        actual: dict[datetime, list[tuple]] = {}
+        for event in self._run(TestBatchedSequencing()._get_stores(), slices=True):
+            assert isinstance(event, MarketSliceEvent)
+            assert event.timestamp not in actual
+            actual[event.timestamp] = [(e.symbol, e.price) for e in event.events()]
+
+        assert list(actual) == list(expected)
+        for timestamp, rows in expected.items():
+            assert sorted(actual[timestamp]) == sorted(rows)
+
+    def test_array_store_slice_matches_default(self):
+        events = TestEventSequencer.MARKET_DATA_EVENTS
+        array_store = ArrayEventStore.from_events('md', events)
+        mock_store = MockEventStore('md', events)
+        while (expected := mock_store.pop_slice()) is not None:
+            actual = array_store.pop_slice()
+            assert actual is not None
+            assert actual.timestamp == expected.timestamp
+            assert actual.events() == expected.events()
+            assert not actual.prices.flags.writeable
+        assert array_store.pop_slice() is None
+
+    def test_other_events_split_slices(self):
+        t = datetime(2025, 12, 24, 16)
+        spy = ArrayEventStore.from_events('spy', [
+            MarketCloseEvent(timestamp=t, symbol='SPY', price=1.0, volume=1.0),
+            MarketCloseEvent(timestamp=t + timedelta(days=1), symbol='SPY', price=2.0, volume=1.0),
+        ])
+        qqq = MockEventStore('qqq', [
+            MarketCloseEvent(timestamp=t, symbol='QQQ', price=3.0, volume=1.0),
+            MarketCloseEvent(timestamp=t + timedelta(days=1), symbol='QQQ', price=4.0, volume=1.0),
+        ])
+        portfolio = MockEventStore('portfolio', [
+            PortfolioConstruction(timestamp=t, symbol='SPY', qty=1),
+        ])
+        events = self._run([spy, portfolio, qqq], slices=True)
+
+        assert [type(event) for event in events] == [
+            MarketSliceEvent, PortfolioConstruction, MarketSliceEvent, MarketSliceEvent,
+        ]
+        assert events[0].symbols.tolist() == ['SPY'] # type: ignore
+        assert events[2].symbols.tolist() == ['QQQ'] # type: ignore
+        assert events[3].symbols.tolist() == ['SPY', 'QQQ'] # type: ignore
+        assert events[3].prices.tolist() == [2.0, 4.0] # type: ignore
+        assert len(events[3]) == 2 # type: ignore
+
+
+    def test_other_event_does_not_drain_market_events(self):
+        t = datetime(2025, 12, 24, 16)
+        signals_and_closes = MockEventStore('mixed', [
+            PortfolioConstruction(timestamp=t, symbol='SPY', qty=1),
+            MarketCloseEvent(timestamp=t + timedelta(days=1), symbol='SPY', price=1.0, volume=1.0),
+            MarketCloseEvent(timestamp=t + timedelta(days=2), symbol='SPY', price=2.0, volume=1.0),
+        ])
+        qqq = ArrayEventStore.from_events('qqq', [
+            MarketCloseEvent(timestamp=t + timedelta(days=2), symbol='QQQ', price=3.0, volume=1.0),
+        ])
+        events = self._run([signals_and_closes, qqq], slices=True)
+
+        assert [type(event) for event in events] == [
+            PortfolioConstruction, MarketSliceEvent, MarketSliceEvent,
+        ]
+        assert sorted(events[2].symbols.tolist()) == ['QQQ', 'SPY'] # type: ignore
+
+
+class TestWindows(object):
+    def _get_sequencer(self, **kwargs) -> tuple[EventSequencer, MockStandardEventProcessor]:
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=TestBatchedSequencing()._get_stores(),
+            **kwargs,
+        )
+        event_processor = MockReschedulingEventProcessor(sequencer)
+        sequencer.set_processor(event_processor)
+        return sequencer, event_processor
+
+    def _expected(self) -> list[Event]:
+        sequencer, event_processor = self._get_sequencer()
+        sequencer.run()
+        return event_processor.get_processed_events()
+
+    @pytest.mark.parametrize('time_ns', [False, True])
+    def test_run_until_in_windows(self, time_ns: bool):
+        sequencer, event_processor = self._get_sequencer(time_ns=time_ns)
+        events = event_processor.get_processed_events()
+        for minute, second in ((30, 17), (30, 59), (31, 0), (31, 30)):
+            end = datetime(2025, 12, 24, 9, minute, second)
+            assert sequencer.run_until(end)
+            assert events and all(event.timestamp < end for event in events)
+        assert not sequencer.run_until(datetime(2025, 12, 25))
+        assert events == self._expected()
+
+    @pytest.mark.parametrize('n_events', [1, 37, 500])
+    def test_run_for_in_chunks(self, n_events: int):
+        sequencer, event_processor = self._get_sequencer(batch_size=16)
+        events = event_processor.get_processed_events()
+        while sequencer.run_for(n_events):
+            assert len(events) % n_events == 0
+        assert events == self._expected()
+
+    def test_run_for_then_run(self):
+        sequencer, event_processor = self._get_sequencer()
+        assert sequencer.run_for(100)
+        assert len(event_processor.get_processed_events()) == 100
+        sequencer.run()
+        assert event_processor.get_processed_events() == self._expected()
+
+    def test_array_store_seek(self):
+        events = TestEventSequencer.MARKET_DATA_EVENTS
+        store = ArrayEventStore.from_events('md', events)
+        store.seek(events[2].timestamp)
+        assert store.peek() == events[2]
+        store.seek(events[1].timestamp - timedelta(seconds=1))
+        assert store.peek() == events[1]
+        store.seek(datetime(2030, 1, 1))
+        assert store.peek() is None
+
+    def test_default_seek_moves_forward(self):
+        events = TestEventSequencer.MARKET_DATA_EVENTS
+        store = MockEventStore('md', events)
+        store.seek(events[2].timestamp - timedelta(seconds=1))
+        assert store.peek() == events[2]
+        store.seek(events[0].timestamp)
+        assert store.peek() == events[2]
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'time_ns': True},
+        {'timer_resolution': timedelta(minutes=20)},
+    ])
+    def test_seek(self, kwargs):
+        events = TestEventSequencer.MARKET_DATA_EVENTS
+        sim_clock = SimulationClock(TestEventSequencer.INITIAL_TIME)
+        sequencer = EventSequencer(
+            sim_clock=sim_clock,
+            event_stores=[
+                ArrayEventStore.from_events('md', events),
+                MockEventStore('portfolio', TestEventSequencer.PORTFOLIO_EVENT_DATA),
+            ],
+            **kwargs,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        early = MockInternalSchedulingEvent1(timestamp=datetime(2025, 12, 24, 10), symbol='SPY')
+        late = MockInternalSchedulingEvent2(timestamp=datetime(2025, 12, 26, 10), symbol='SPY')
+        sequencer.schedule(early)
+        sequencer.schedule(late)
+        sequencer.cancel(sequencer.schedule(late))
+        sequencer.schedule_recurring(
+            MockInternalSchedulingEvent1(timestamp=datetime(2025, 12, 20, 8), symbol='QQQ'),
+            interval=timedelta(days=1),
+            end=datetime(2025, 12, 28),
+        )
+
+        start = datetime(2025, 12, 26)
+        sequencer.seek(start)
+        assert sim_clock.now() == start
+        assert sequencer.scheduling_stats().cancelled_scheduled == 0
+        sequencer.run()
+
+        processed = event_processor.get_processed_events()
+        assert all(event.timestamp >= start for event in processed)
+        assert [event for event in processed if event in events] == [
+            event for event in events if event.timestamp >= start
+        ]
+        assert processed.count(late) == 1
+        assert early not in processed
+        recurring = [event.timestamp for event in processed if event.symbol == 'QQQ']
+        assert recurring == [datetime(2025, 12, 26, 8), datetime(2025, 12, 27, 8)]
+
+
+    @pytest.mark.parametrize('kwargs', [{}, {'time_ns': True}])
+    def test_seek_backwards(self, kwargs):
+        events = TestEventSequencer.MARKET_DATA_EVENTS
+        sim_clock = SimulationClock(TestEventSequencer.INITIAL_TIME)
+        sequencer = EventSequencer(
+            sim_clock=sim_clock,
+            event_stores=[ArrayEventStore.from_events('md', events)],
+            **kwargs,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        sequencer.run()
+
+        start = events[1].timestamp
+        sequencer.seek(start)
+        assert sim_clock.now() == start
+        sequencer.run()
+        assert event_processor.get_processed_events() == events + events[1:]
+
+    @pytest.mark.parametrize('kwargs', [{}, {'time_ns': True}])
+    @pytest.mark.parametrize('target, first_day', [
+        (datetime(2025, 12, 25), 25),
+        (datetime(2025, 12, 20), 24),
+    ])
+    def test_seek_backwards_rewinds_recurring(self, kwargs, target: datetime, first_day: int):
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=[],
+            **kwargs,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        sequencer.schedule_recurring(
+            MockInternalSchedulingEvent1(timestamp=datetime(2025, 12, 24, 8), symbol='QQQ'),
+            interval=timedelta(days=1),
+            end=datetime(2025, 12, 28),
+        )
+
+        sequencer.seek(datetime(2025, 12, 26, 12))
+        sequencer.seek(target)
+        sequencer.run()
+        assert [event.timestamp for event in event_processor.get_processed_events()] == [
+            datetime(2025, 12, day, 8) for day in range(first_day, 28)
+        ]
+
+class TestCompactRepresentation(object):
+    def test_events_are_slotted(self):
+        event = MarketCloseEvent(timestamp=datetime(2025, 12, 24, 16), symbol='SPY', price=1.0, volume=2.0)
+        assert not hasattr(event, '__dict__')
+        assert pickle.loads(pickle.dumps(event)) == event
+        assert dataclasses.replace(event, price=3.0).price == 3.0
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            event.price = 3.0 # type: ignore
+
+    def test_store_symbols_are_interned(self):
+        def store(name: str) -> ArrayEventStore:
+            # a distinct string object per store
+            symbol = ''.join(['S', 'P', 'Y'])
+            return ArrayEventStore.from_columns(
+                name,
+                timestamps=np.array(['2025-12-24T16:00'], dtype='datetime64[ns]'),
+                symbols=[symbol],
+                prices=np.ones(1),
+                volumes=np.ones(1),
+            )
+
+        a, b = store('a').peek(), store('b').peek()
+        assert a.symbol is b.symbol
+        assert symbol_id(a.symbol) == symbol_id('SPY')
+        assert intern_symbol('SPY') is a.symbol
+
+    @pytest.mark.parametrize('kwargs', [{}, {'timer_resolution': timedelta(minutes=1)}])
+    def test_schedule_ids_survive_seek(self, kwargs):
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2025, 12, 24)),
+            event_stores=[],
+            **kwargs,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        kept = MockInternalSchedulingEvent1(timestamp=datetime(2025, 12, 24, 12), symbol='SPY')
+        cancelled = MockInternalSchedulingEvent2(timestamp=datetime(2025, 12, 24, 13), symbol='SPY')
+        sequencer.schedule(kept)
+        schedule_id = sequencer.schedule(cancelled)
+        sequencer.seek(datetime(2025, 12, 24, 11))
+
+        assert sequencer.cancel(schedule_id)
+        assert not sequencer.cancel(schedule_id)
+        sequencer.run()
+        assert event_processor.get_processed_events() == [kept]
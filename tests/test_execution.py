@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from anvil.clock import SimulationClock
+from anvil.core import MbteProcessor, Strategy
+from anvil.event_processing import ArrayEventStore, EventSequencer
+from anvil.events import (
+    Event,
+    MarketCloseEvent,
+    MarketOpenEvent,
+    MarketSliceEvent,
+    OrderEvent,
+    SignalEvent,
+)
+from anvil.execution import ExecutionSimulator
+from anvil.metrics import MetricsProcessor
+from anvil.portfolio import ArrayPortfolio
+from anvil.vectorized import CostModel, run_vectorized
+from helpers import Momentum, random_walk
+
+T = datetime(2025, 12, 24, 16)
+
+
+def _order(symbol: str, qty: float, timestamp: datetime = T, price: float | None = None) -> OrderEvent:
+    return OrderEvent(timestamp=timestamp, symbol=symbol, price=price, qty=qty) # type: ignore
+
+
+def _close(symbol: str, price: float, timestamp: datetime) -> MarketCloseEvent:
+    return MarketCloseEvent(timestamp=timestamp, symbol=symbol, price=price, volume=1.0)
+
+
+def test_fills_at_next_bar_with_costs():
+    execution = ExecutionSimulator(CostModel(fixed_slippage=0.1, proportional_slippage=0.01, commission=0.001))
+    execution.receive(_order('SPY', 10))
+    execution.receive(_order('SPY', -4))
+    execution.receive(_order('QQQ', 5))
+    # not on the bar the orders were placed on
+    assert execution.on_market(_close('SPY', 100.0, T)) == ()
+    assert execution.on_market(_close('QQQ', 50.0, T + timedelta(days=1))) != ()
+
+    fills = execution.on_market(_close('SPY', 100.0, T + timedelta(days=1)))
+    assert [(f.symbol, f.last_qty) for f in fills] == [('SPY', 10), ('SPY', -4)]
+    assert fills[0].last_price == pytest.approx(100.0 + 0.1 + 1.1)
+    assert fills[1].last_price == pytest.approx(100.0 - 0.1 - 1.1)
+    assert all(f.timestamp == T + timedelta(days=1) for f in fills)
+    assert execution.pending() == 0
+    assert execution.traded() == 19
+    assert execution.costs() == pytest.approx(14 * 1.2 + 5 * (0.1 + 0.55))
+
+
+def test_limit_orders_wait_for_price():
+    execution = ExecutionSimulator()
+    execution.receive(_order('SPY', 10, price=99.0))
+    execution.receive(_order('SPY', -10, price=101.0))
+    assert execution.on_market(_close('SPY', 100.0, T + timedelta(days=1))) == ()
+    fills = execution.on_market(_close('SPY', 98.0, T + timedelta(days=2)))
+    assert [f.last_qty for f in fills] == [10]
+    assert execution.pending() == 1
+    fills = execution.on_market(_close('SPY', 102.0, T + timedelta(days=3)))
+    assert [f.last_qty for f in fills] == [-10]
+
+
+def test_fill_on_types():
+    execution = ExecutionSimulator(fill_on=(MarketOpenEvent,))
+    execution.receive(_order('SPY', 1))
+    assert execution.on_market(_close('SPY', 100.0, T + timedelta(days=1))) == ()
+    open_ = MarketOpenEvent(timestamp=T + timedelta(days=1), symbol='SPY', price=99.0, volume=1.0)
+    assert [f.last_price for f in execution.on_market(open_)] == [99.0]
+
+
+def test_fills_slice_in_bulk():
+    n = 2000
+    symbols = np.array([f'S{i}' for i in range(n)], dtype=object)
+    prices = 100.0 + np.arange(n, dtype=np.float64)
+    execution = ExecutionSimulator(CostModel(proportional_slippage=0.01))
+    for i in range(0, n, 2):
+        execution.receive(_order(f'S{i}', 1 if i % 4 == 0 else -1))
+    # unknown symbols in the slice and orders missing from it
+    execution.receive(_order('OTHER', 3))
+    bar = MarketSliceEvent.from_arrays(
+        T + timedelta(days=1), np.append(symbols, 'NEW'), np.append(prices, 1.0),
+        np.ones(n + 1), np.ones(n + 1, dtype=np.int8),
+    )
+
+    fills = execution.on_market(bar)
+    assert len(fills) == n // 2
+    for fill in fills:
+        i = int(fill.symbol[1:])
+        assert fill.last_price == pytest.approx(prices[i] * (1.0 + 0.01 * fill.last_qty))
+    assert execution.pending() == 1
+
+
+def test_event_driven_run_matches_vectorized():
+    prices = random_walk(300, seed=0)
+    costs = CostModel(fixed_slippage=0.01, proportional_slippage=0.0005, commission=0.0002)
+    window = 5
+
+    def signal_fn(p: np.ndarray) -> np.ndarray:
+        signal = np.zeros(len(p))
+        signal[window:] = np.sign(p[window:] - p[:-window])
+        return signal
+
+    expected = run_vectorized(prices, signal_fn, position_size=10.0, costs=costs, initial_capital=1e5)
+
+    store = ArrayEventStore.from_columns(
+        'spy',
+        timestamps=np.datetime64('2025-01-01', 'ns') + np.arange(len(prices)) * np.timedelta64(1, 'D'),
+        symbols=['SPY'] * len(prices),
+        prices=prices,
+        volumes=np.ones(len(prices)),
+    )
+    portfolio = ArrayPortfolio(initial_capital=1e5, position_size=10.0)
+    execution = ExecutionSimulator(costs)
+    equity: list[float] = []
+    processor = MetricsProcessor(
+        MbteProcessor(Momentum(window), portfolio, execution),
+        equity=lambda: equity.append(portfolio.equity()) or equity[-1], # type: ignore
+        initial_capital=1e5,
+        traded=execution.traded,
+        costs=execution.costs,
+    )
+    sequencer = EventSequencer(SimulationClock(datetime(2025, 1, 1)), [store])
+    sequencer.set_processor(processor)
+    sequencer.run()
+    processor.sample()
+
+    np.testing.assert_allclose(equity, expected.equity, rtol=1e-12)
+    assert processor.snapshot().total_costs == pytest.approx(expected.metrics.total_costs)
+    assert processor.snapshot().turnover == pytest.approx(expected.metrics.turnover)
+
+
+class LongEverything(Strategy):
+    def on_event(self, event: Event) -> list[SignalEvent] | None:
+        if not isinstance(event, MarketSliceEvent):
+            return None
+        return [
+            SignalEvent(timestamp=event.timestamp, symbol=symbol, value=1.0)
+            for symbol in event.symbols.tolist()
+        ]
+
+
+def test_slice_strategy_signals_every_name():
+    days = np.datetime64('2025-01-02', 'ns') + np.arange(3) * np.timedelta64(1, 'D')
+    store = ArrayEventStore.from_columns(
+        'daily',
+        timestamps=np.repeat(days, 3),
+        symbols=['A', 'B', 'C'] * 3,
+        prices=np.full(9, 10.0),
+        volumes=np.ones(9),
+    )
+    portfolio = ArrayPortfolio(initial_capital=100.0, position_size=2.0)
+    execution = ExecutionSimulator()
+    sequencer = EventSequencer(SimulationClock(datetime(2025, 1, 1)), [store], slices=True)
+    sequencer.set_processor(MbteProcessor(LongEverything(), portfolio, execution))
+    sequencer.run()
+
+    assert [portfolio.position(symbol) for symbol in 'ABC'] == [2.0, 2.0, 2.0]
+    assert execution.pending() == 0
+
+
+def test_slice_run_metrics():
+    n_days = 20
+    days = np.datetime64('2025-01-02', 'ns') + np.arange(n_days) * np.timedelta64(1, 'D')
+    store = ArrayEventStore.from_columns(
+        'daily',
+        timestamps=np.repeat(days, 3),
+        symbols=['A', 'B', 'C'] * n_days,
+        prices=np.repeat(10.0 + np.arange(n_days), 3),
+        volumes=np.ones(3 * n_days),
+    )
+    portfolio = ArrayPortfolio(initial_capital=100.0, position_size=2.0)
+    execution = ExecutionSimulator()
+    processor = MetricsProcessor(
+        MbteProcessor(LongEverything(), portfolio, execution),
+        equity=portfolio.equity,
+        initial_capital=100.0,
+        traded=portfolio.traded,
+    )
+    sequencer = EventSequencer(SimulationClock(datetime(2025, 1, 1)), [store], slices=True)
+    sequencer.set_processor(processor)
+    sequencer.run()
+    processor.sample()
+
+    metrics = processor.snapshot()
+    assert metrics.periods == n_days
+    assert metrics.total_pnl > 0
+    assert metrics.turnover == 6.0
@@ -0,0 +1,135 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anvil.indicators import (
+    EMA,
+    SMA,
+    Crossover,
+    PerSymbol,
+    RingBuffer,
+    RollingMax,
+    RollingMin,
+    RollingStd,
+    RollingVariance,
+)
+from helpers import random_walk
+
+
+def _stream(indicator, values: np.ndarray) -> np.ndarray:
+    return np.array([indicator.update(float(value)) for value in values])
+
+
+class TestRingBuffer:
+    def test_push_evicts_oldest(self):
+        buffer = RingBuffer(3)
+        assert [math.isnan(buffer.push(v)) for v in (1.0, 2.0, 3.0)] == [True] * 3
+        assert buffer.push(4.0) == 1.0
+        assert buffer.values().tolist() == [2.0, 3.0, 4.0]
+
+    def test_extend_matches_push(self):
+        pushed, extended = RingBuffer(4), RingBuffer(4)
+        pushed.push(0.5)
+        extended.push(0.5)
+        for v in range(6):
+            pushed.push(float(v))
+        extended.extend(np.arange(6.0))
+        assert pushed.values().tolist() == extended.values().tolist()
+        assert pushed.push(9.0) == extended.push(9.0)
+
+
+@pytest.mark.parametrize('window', [1, 5, 20])
+def test_rolling_indicators_match_pandas(window):
+    prices = random_walk(500)
+    series = pd.Series(prices)
+    expected = {
+        SMA: series.rolling(window).mean(),
+        RollingMin: series.rolling(window).min(),
+        RollingMax: series.rolling(window).max(),
+    }
+    if window > 1:
+        expected[RollingVariance] = series.rolling(window).var()
+        expected[RollingStd] = series.rolling(window).std()
+    for cls, values in expected.items():
+        np.testing.assert_allclose(
+            _stream(cls(window), prices), values.to_numpy(), rtol=1e-9, atol=1e-9, err_msg=cls.__name__,
+        )
+
+
+def test_ema_matches_pandas():
+    prices = random_walk(300)
+    expected = pd.Series(prices).ewm(span=10, adjust=False, min_periods=10).mean()
+    np.testing.assert_allclose(_stream(EMA(span=10), prices), expected.to_numpy(), rtol=1e-12)
+
+
+@pytest.mark.parametrize('factory', [
+    lambda: SMA(20),
+    lambda: EMA(span=20),
+    lambda: EMA(alpha=0.3),
+    lambda: RollingVariance(20),
+    lambda: RollingStd(20, ddof=0),
+    lambda: RollingMin(20),
+    lambda: RollingMax(20),
+])
+@pytest.mark.parametrize('n_warmup', [0, 5, 20, 137])
+def test_warmup_matches_streaming(factory, n_warmup):
+    prices = random_walk(200, seed=n_warmup)
+    streamed, warmed = factory(), factory()
+    streamed.update(1.0)
+    warmed.update(1.0)
+    _stream(streamed, prices[:n_warmup])
+    warmed.warmup(prices[:n_warmup])
+    assert streamed.ready() == warmed.ready()
+    np.testing.assert_allclose(
+        _stream(warmed, prices[n_warmup:]), _stream(streamed, prices[n_warmup:]), rtol=1e-9,
+    )
+
+
+def test_rolling_min_max_with_ties():
+    values = np.array([3.0, 1.0, 1.0, 2.0, 1.0, 5.0, 5.0, 0.0])
+    series = pd.Series(values)
+    np.testing.assert_array_equal(_stream(RollingMin(3), values), series.rolling(3).min())
+    np.testing.assert_array_equal(_stream(RollingMax(3), values), series.rolling(3).max())
+
+
+def test_long_series_does_not_drift():
+    prices = 1e6 + random_walk(100_000)
+    sma, var = SMA(50), RollingVariance(50)
+    _stream(sma, prices)
+    _stream(var, prices)
+    assert sma.value() == pytest.approx(np.mean(prices[-50:]), rel=1e-12)
+    assert var.value() == pytest.approx(np.var(prices[-50:], ddof=1), rel=1e-9)
+
+
+def test_crossover():
+    crossover = Crossover()
+    fast = [math.nan, 1.0, 2.0, 2.0, 3.0, 1.0, 1.0]
+    slow = [1.0, 2.0, 2.0, 2.0, 2.0, 2.0, 0.5]
+    assert [crossover.update(a, b) for a, b in zip(fast, slow)] == [0, 0, 0, 0, 1, -1, 1]
+    warmed = Crossover()
+    warmed.warmup(np.array(fast[:5]), np.array(slow[:5]))
+    assert warmed.side() == 1
+    assert warmed.update(1.0, 2.0) == -1
+
+
+def test_per_symbol():
+    averages = PerSymbol(lambda: SMA(2))
+    averages.warmup('SPY', np.array([1.0, 2.0]))
+    assert averages.update('SPY', 4.0) == 3.0
+    assert math.isnan(averages.update('QQQ', 10.0))
+    assert averages.update('QQQ', 20.0) == 15.0
+    assert averages.symbols() == ['SPY', 'QQQ']
+    crossovers = PerSymbol(Crossover)
+    crossovers.update('SPY', 1.0, 2.0)
+    assert crossovers.update('SPY', 3.0, 2.0) == 1
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        SMA(0)
+    with pytest.raises(ValueError):
+        EMA(span=10, alpha=0.5)
+    with pytest.raises(ValueError):
+        RollingVariance(1)
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from anvil.clock import SimulationClock
+from anvil.core import Execution, MbteProcessor, Portfolio, Strategy
+from anvil.event_processing import ArrayEventStore, EventSequencer
+from anvil.events import (
+    Event,
+    FillEvent,
+    InternalSchedulingEvent,
+    MarketCloseEvent,
+    OrderEvent,
+    SignalEvent,
+)
+from anvil.instrumentation import Histogram, Instrumentation
+
+
+class MockAlwaysLongStrategy(Strategy):
+    def on_event(self, event: Event) -> SignalEvent | None:
+        if not isinstance(event, MarketCloseEvent):
+            return None
+        return SignalEvent(timestamp=event.timestamp, symbol=event.symbol, value=1.0)
+
+
+class MockPortfolio(Portfolio):
+    def on_signal(self, signal: SignalEvent) -> OrderEvent | None:
+        return OrderEvent(timestamp=signal.timestamp, symbol=signal.symbol, price=None, qty=1)
+
+    def on_fill(self, fill: FillEvent) -> OrderEvent | None:
+        return None
+
+
+class MockExecution(Execution):
+    def __init__(self):
+        self.orders: list[OrderEvent] = []
+
+    def receive(self, order: OrderEvent) -> None:
+        self.orders.append(order)
+
+
+def _get_store(name: str, symbol: str, n: int) -> ArrayEventStore:
+    return ArrayEventStore.from_columns(
+        name,
+        timestamps=np.datetime64('2025-12-24T09:30', 'ns') + np.arange(n) * np.timedelta64(1, 'm'),
+        symbols=[symbol] * n,
+        prices=np.ones(n),
+        volumes=np.ones(n),
+    )
+
+
+def test_histogram():
+    histogram = Histogram()
+    for duration in (1, 2, 3, 100, 1000):
+        histogram.record(duration)
+    assert histogram.count == 5
+    assert histogram.max_ns == 1000
+    assert histogram.mean_ns() == 1106 / 5
+    assert histogram.percentile_ns(50) == 3
+    assert histogram.percentile_ns(100) == 1023
+
+
+def test_instrumented_run(tmp_path):
+    folded_path = str(tmp_path / 'run.folded')
+    instrumentation = Instrumentation(folded_path=folded_path)
+    execution = MockExecution()
+    sequencer = EventSequencer(
+        sim_clock=SimulationClock(datetime(2025, 12, 24)),
+        event_stores=[_get_store('spy', 'SPY', 100), _get_store('qqq', 'QQQ', 50)],
+        timer_resolution=timedelta(minutes=5),
+        instrumentation=instrumentation,
+    )
+    sequencer.set_processor(MbteProcessor(
+        MockAlwaysLongStrategy(),
+        MockPortfolio(),
+        execution,
+        instrumentation=instrumentation,
+    ))
+    schedule_ids = [
+        sequencer.schedule(InternalSchedulingEvent(
+            timestamp=datetime(2025, 12, 24, 9, 30 + minute, 30),
+            symbol='SPY',
+        ))
+        for minute in range(3)
+    ]
+    assert sequencer.cancel(schedule_ids[1])
+    sequencer.run()
+
+    assert len(execution.orders) == 150
+    assert instrumentation.events_by_store == {'spy': 100, 'qqq': 50}
+    assert instrumentation.events_by_type == {'MarketCloseEvent': 150, 'InternalSchedulingEvent': 2}
+    assert instrumentation.schedule_count == 3
+    assert instrumentation.cancel_count == 1
+    assert instrumentation.peak_depth['timers'] == 3
+    assert instrumentation.peak_depth['queue'] == 2
+    for stage in ('process', 'process;strategy', 'process;portfolio', 'process;execution', 'store;peek', 'store;pop'):
+        assert instrumentation.stages[stage].count > 0, stage
+    assert instrumentation.stages['process'].count == 152
+    assert 'events by store' in instrumentation.report()
+
+    with open(folded_path) as f:
+        lines = f.read().splitlines()
+    frames = dict(line.rsplit(' ', 1) for line in lines)
+    assert 'run;process;strategy' in frames
+    assert all(int(value) >= 0 for value in frames.values())
+
+
+def test_timed_store_forwards_store_methods():
+    instrumentation = Instrumentation()
+    store = _get_store('spy', 'SPY', 10)
+    timed = instrumentation.wrap_store(_get_store('spy', 'SPY', 10))
+    assert timed.fingerprint() == store.fingerprint()
+
+    timed.pop()
+    state = timed.get_state()
+    timed.seek(datetime(2025, 12, 24, 9, 35))
+    assert timed.peek().timestamp == datetime(2025, 12, 24, 9, 35)
+    timed.set_state(state)
+    assert timed.peek().timestamp == datetime(2025, 12, 24, 9, 31)
+
+    selected = timed.select(['QQQ'], None)
+    assert selected.peek() is None
+    assert selected.name() == 'spy'
+    assert instrumentation.stages['store;seek'].count == 1
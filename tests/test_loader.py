@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+import os
+
+import pandas as pd
+import pytest
+
+from anvil.clock import SimulationClock
+from anvil.event_processing import ArrayEventStore, EventSequencer
+from anvil.events import Event, MarketCloseEvent, MarketOpenEvent, MarketSliceEvent
+from anvil.loader import ChunkedEventStore, MarketDataStore
+from helpers import drain
+from test_event_processing import MockStandardEventProcessor
+
+SYMBOLS = ['AAPL', 'MSFT', 'SPY']
+
+
+def _get_frame(day: datetime) -> pd.DataFrame:
+    '''
+    Open and close bars of every symbol on one day
+    '''
+    rows = []
+    for kind, hour in (('open', 9), ('close', 16)):
+        for i, symbol in enumerate(SYMBOLS):
+            rows.append({
+                'timestamp': day.replace(hour=hour, minute=30 if kind == 'open' else 0),
+                'symbol': symbol,
+                'price': 100.0 * (i + 1) + day.day,
+                'volume': 10.0,
+                'kind': kind,
+            })
+    return pd.DataFrame(rows)
+
+
+def _write_daily_csv(tmp_path, days: int = 10) -> list[pd.DataFrame]:
+    frames = []
+    for d in range(days):
+        day = datetime(2024, 1, 1) + timedelta(days=d)
+        frame = _get_frame(day)
+        frame.to_csv(tmp_path / f'{day:%Y-%m-%d}.csv', index=False)
+        frames.append(frame)
+    return frames
+
+
+def _expected(frames: list[pd.DataFrame], start=None, end=None, symbols=None) -> list[Event]:
+    events = []
+    for row in pd.concat(frames).itertuples():
+        timestamp = row.timestamp.to_pydatetime() if hasattr(row.timestamp, 'to_pydatetime') else row.timestamp
+        if start is not None and timestamp < start or end is not None and timestamp >= end:
+            continue
+        if symbols is not None and row.symbol not in symbols:
+            continue
+        event_type = MarketOpenEvent if row.kind == 'open' else MarketCloseEvent
+        events.append(event_type(
+            timestamp=timestamp, symbol=row.symbol, price=row.price, volume=row.volume,
+        ))
+    return events
+
+
+class TestChunkedEventStore(object):
+    def _get_chunks(self) -> list[ArrayEventStore]:
+        t = datetime(2024, 1, 2, 16)
+        # the 16:00 bars are split across the first two chunks
+        return [
+            ArrayEventStore.from_events('md', [
+                MarketCloseEvent(timestamp=t, symbol='A', price=1.0, volume=1.0),
+            ]),
+            ArrayEventStore.from_events('md', []),
+            ArrayEventStore.from_events('md', [
+                MarketCloseEvent(timestamp=t, symbol='B', price=2.0, volume=1.0),
+                MarketCloseEvent(timestamp=t + timedelta(days=1), symbol='A', price=3.0, volume=1.0),
+            ]),
+        ]
+
+    def test_events_across_chunks(self):
+        store = ChunkedEventStore('md', self._get_chunks())
+        assert store.peek_batch(max_count=10)[0].symbol == 'A'
+        assert store.pop_batch(2) == 2
+        assert [event.price for event in drain(store)] == [3.0] # type: ignore
+
+    def test_slice_across_chunks(self):
+        store = ChunkedEventStore('md', self._get_chunks())
+        first = store.pop_slice()
+        assert first is not None and first.symbols.tolist() == ['A', 'B']
+        second = store.pop_slice()
+        assert second is not None and second.symbols.tolist() == ['A']
+        assert store.pop_slice() is None
+
+
+class TestMarketDataStore(object):
+    def test_reads_csv_directory(self, tmp_path):
+        frames = _write_daily_csv(tmp_path, days=3)
+        store = MarketDataStore(tmp_path, chunk_size=4)
+        assert len(store.files()) == 3
+        assert drain(store) == _expected(frames)
+
+    def test_time_range_and_symbol_pushdown(self, tmp_path):
+        frames = _write_daily_csv(tmp_path)
+        start = datetime(2024, 1, 3, 12)
+        end = datetime(2024, 1, 6, 12)
+        store = MarketDataStore(tmp_path, start=start, end=end, symbols=['SPY', 'AAPL'])
+        # only the partitions overlapping [start, end) are read
+        assert [path[-14:] for path in store.files()] == [
+            '2024-01-03.csv', '2024-01-04.csv', '2024-01-05.csv', '2024-01-06.csv',
+        ]
+        assert drain(store) == _expected(frames, start, end, ['SPY', 'AAPL'])
+
+    def test_partition_dates_in_file_names(self, tmp_path):
+        frame = _get_frame(datetime(2024, 1, 3))
+        names = [
+            'day_20240103.csv', 'day_20240110.csv', 'run_12345678.csv',
+            'bars-2024-0110.csv', 'v220240110.csv',
+        ]
+        for name in names:
+            frame.to_csv(tmp_path / name, index=False)
+        store = MarketDataStore(tmp_path, start=datetime(2024, 1, 2), end=datetime(2024, 1, 4))
+        # only day_20240110 is a date out of range, the others are not dates
+        assert sorted(os.path.basename(path) for path in store.files()) == [
+            'bars-2024-0110.csv', 'day_20240103.csv', 'run_12345678.csv', 'v220240110.csv',
+        ]
+
+    def test_csv_stops_reading_past_end(self, tmp_path):
+        path = tmp_path / 'bars.csv'
+        frames = [_get_frame(datetime(2024, 1, 2))]
+        frames[0].to_csv(path, index=False)
+        # anything after the end would fail to parse
+        with open(path, 'a') as f:
+            f.write('not a timestamp,X,1.0,1.0,close\n')
+        end = datetime(2024, 1, 2, 12)
+        store = MarketDataStore(path, end=end, chunk_size=3)
+        assert drain(store) == _expected(frames, end=end)
+
+    def test_renamed_columns(self, tmp_path):
+        frame = _get_frame(datetime(2024, 1, 2)).drop(columns='kind')
+        path = tmp_path / 'bars.csv'
+        frame.rename(columns={'timestamp': 'ts', 'price': 'px'}).to_csv(path, index=False)
+        store = MarketDataStore(path, columns={'timestamp': 'ts', 'price': 'px'})
+        events = drain(store)
+        assert len(events) == 6
+        assert all(isinstance(event, MarketCloseEvent) for event in events)
+
+    def test_overlapping_files(self, tmp_path):
+        frame = _get_frame(datetime(2024, 1, 2))
+        frame.to_csv(tmp_path / 'a.csv', index=False)
+        frame.to_csv(tmp_path / 'b.csv', index=False)
+        store = MarketDataStore([tmp_path / 'a.csv', tmp_path / 'b.csv'])
+        with pytest.raises(ValueError):
+            drain(store)
+
+    def test_sequencer_slices(self, tmp_path):
+        _write_daily_csv(tmp_path, days=2)
+        sequencer = EventSequencer(
+            sim_clock=SimulationClock(datetime(2024, 1, 1)),
+            event_stores=[MarketDataStore(tmp_path, chunk_size=2)],
+            slices=True,
+        )
+        event_processor = MockStandardEventProcessor()
+        sequencer.set_processor(event_processor)
+        sequencer.run()
+        slices = event_processor.get_processed_events()
+        assert len(slices) == 4
+        assert all(isinstance(s, MarketSliceEvent) and len(s) == 3 for s in slices)
+
+    def test_parquet_row_groups(self, tmp_path):
+        pytest.importorskip('pyarrow')
+        frames = [_get_frame(datetime(2024, 1, 1) + timedelta(days=d)) for d in range(5)]
+        pd.concat(frames).to_parquet(tmp_path / 'bars.parquet', row_group_size=6, index=False)
+        start = datetime(2024, 1, 2, 12)
+        end = datetime(2024, 1, 4)
+        store = MarketDataStore(tmp_path / 'bars.parquet', start=start, end=end, symbols=['MSFT'])
+        assert drain(store) == _expected(frames, start, end, ['MSFT'])
+
+    def test_seek_skips_unread_files(self, tmp_path):
+        frames = _write_daily_csv(tmp_path, days=5)
+        # a corrupt early partition is never opened once sought past
+        (tmp_path / '2024-01-02.csv').write_text('garbage\n')
+        store = MarketDataStore(tmp_path)
+        start = datetime(2024, 1, 4, 12)
+        store.seek(start)
+        assert drain(store) == _expected(frames, start=start)
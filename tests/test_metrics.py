@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from anvil.clock import SimulationClock
+from anvil.event_processing import ArrayEventStore, EventProcessor, EventSequencer
+from anvil.events import Event
+from anvil.metrics import Metrics, MetricsProcessor, StreamingMetrics, compute_metrics
+
+
+class MockNoopEventProcessor(EventProcessor):
+    def process(self, event: Event):
+        pass
+
+
+class TestMetrics(object):
+    def test_streaming_matches_batch(self):
+        rng = np.random.default_rng(0)
+        equity = 1000.0 + np.cumsum(rng.normal(0.0, 5.0, size=5000))
+        traded = rng.integers(0, 3, size=5000).astype(np.float64)
+        costs = traded * 0.1
+
+        streaming = StreamingMetrics(1000.0)
+        for e, t, c in zip(equity.tolist(), traded.tolist(), costs.tolist()):
+            streaming.update(e, t, c)
+
+        expected = compute_metrics(equity, 1000.0, traded=traded, costs=costs)
+        actual = streaming.snapshot()
+        assert actual.periods == expected.periods == 5000
+        for name in Metrics._fields:
+            assert getattr(actual, name) == pytest.approx(getattr(expected, name), rel=1e-9), name
+
+    def test_empty(self):
+        assert StreamingMetrics(1.0).snapshot() == compute_metrics(np.array([]), 1.0)
+
+    @pytest.mark.parametrize('initial_capital', [0.0, -1.0])
+    def test_requires_positive_capital(self, initial_capital):
+        with pytest.raises(ValueError, match='initial_capital'):
+            StreamingMetrics(initial_capital)
+        with pytest.raises(ValueError, match='initial_capital'):
+            MetricsProcessor(MockNoopEventProcessor(), equity=lambda: 0.0, initial_capital=initial_capital)
+        with pytest.raises(ValueError, match='initial_capital'):
+            compute_metrics(np.zeros(3), initial_capital)
+
+    def test_zero_signal_run(self):
+        n = 1000
+        store = ArrayEventStore.from_columns(
+            'md',
+            timestamps=np.datetime64('2025-01-01', 'ns') + np.arange(n) * np.timedelta64(1, 'D'),
+            symbols=['SPY'] * n,
+            prices=100.0 + np.cumsum(np.random.default_rng(1).normal(size=n)),
+            volumes=np.ones(n),
+        )
+        sequencer = EventSequencer(SimulationClock(datetime(2025, 1, 1)), [store])
+        snapshots: list[Metrics] = []
+        processor = MetricsProcessor(
+            MockNoopEventProcessor(),
+            equity=lambda: 1000.0,
+            initial_capital=1000.0,
+            traded=lambda: 0.0,
+            costs=lambda: 0.0,
+            snapshot_every=100,
+            on_snapshot=snapshots.append,
+        )
+        sequencer.set_processor(processor)
+        sequencer.run()
+        processor.sample()
+
+        assert processor.snapshot() == Metrics(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, n)
+        assert [snapshot.periods for snapshot in snapshots] == list(range(100, n + 1, 100))
+
+    def test_samples_once_per_timestamp(self):
+        n_days, symbols = 10, ['DIA', 'QQQ', 'SPY']
+        store = ArrayEventStore.from_columns(
+            'md',
+            timestamps=np.repeat(
+                np.datetime64('2025-01-01', 'ns') + np.arange(n_days) * np.timedelta64(1, 'D'),
+                len(symbols),
+            ),
+            symbols=symbols * n_days,
+            prices=np.full(n_days * len(symbols), 100.0),
+            volumes=np.ones(n_days * len(symbols)),
+        )
+        sequencer = EventSequencer(SimulationClock(datetime(2025, 1, 1)), [store])
+        samples: list[float] = []
+        processor = MetricsProcessor(
+            MockNoopEventProcessor(),
+            equity=lambda: samples.append(1000.0) or 1000.0, # type: ignore
+            initial_capital=1000.0,
+        )
+        sequencer.set_processor(processor)
+        sequencer.run()
+        processor.sample()
+        processor.sample()
+
+        assert len(samples) == n_days
+        assert processor.snapshot().periods == n_days
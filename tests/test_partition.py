@@ -0,0 +1,157 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from anvil.clock import SimulationClock
+from anvil.core import Execution, MbteProcessor, Portfolio, Strategy
+from anvil.event_processing import ArrayEventStore, EventSequencer
+from anvil.events import FillEvent
+from anvil.execution import ExecutionSimulator
+from anvil.partition import merge_shards, partition_symbols, run_partitioned
+from anvil.portfolio import ArrayPortfolio
+from anvil.synthetic import GBMStore
+from anvil.vectorized import CostModel
+from helpers import Momentum
+
+COSTS = CostModel(fixed_slippage=0.01, proportional_slippage=0.0005, commission=0.0002)
+
+
+class CrossSectional(Momentum):
+    def symbol_independent(self) -> bool:
+        return False
+
+
+def build() -> tuple[Strategy, Portfolio, Execution]:
+    return Momentum(), ArrayPortfolio(position_size=10.0), ExecutionSimulator(COSTS)
+
+
+def build_cross_sectional() -> tuple[Strategy, Portfolio, Execution]:
+    return CrossSectional(), ArrayPortfolio(), ExecutionSimulator()
+
+
+def _store(n_symbols: int, n_days: int, seed: int = 0) -> ArrayEventStore:
+    rng = np.random.default_rng(seed)
+    symbols = np.array([f'S{i:03d}' for i in range(n_symbols)])
+    prices = 100.0 + np.cumsum(rng.normal(size=(n_days, n_symbols)), axis=0)
+    days = np.datetime64('2025-01-02', 'ns') + np.arange(n_days) * np.timedelta64(1, 'D')
+    return ArrayEventStore.from_columns(
+        'daily',
+        timestamps=np.repeat(days, n_symbols),
+        symbols=np.tile(symbols, n_days),
+        prices=prices.ravel(),
+        volumes=np.ones(n_days * n_symbols),
+    )
+
+
+def test_partition_symbols():
+    assert partition_symbols(['a', 'b', 'c', 'd', 'e'], 2) == [['a', 'c', 'e'], ['b', 'd']]
+    assert partition_symbols(['a', 'b', 'a'], 4) == [['a'], ['b']]
+    with pytest.raises(ValueError):
+        partition_symbols(['a'], 0)
+
+
+def test_single_shard_matches_plain_run():
+    symbols = [f'S{i:03d}' for i in range(20)]
+    result = run_partitioned(build, [_store(20, 30)], symbols, initial_capital=1e5, n_shards=1)
+
+    strategy, portfolio, execution = build()
+    sequencer = EventSequencer(SimulationClock(datetime(2025, 1, 1)), [_store(20, 30)])
+    sequencer.set_processor(MbteProcessor(strategy, portfolio, execution))
+    sequencer.run()
+
+    assert len(result.timestamps) == 30
+    assert len(result.fills) > 0
+    assert result.equity[-1] == pytest.approx(1e5 + portfolio.equity(), rel=1e-12) # type: ignore
+    assert result.traded[-1] == portfolio.traded() # type: ignore
+    assert result.costs[-1] == execution.costs() # type: ignore
+
+
+def test_sharded_run_is_identical_to_single_process():
+    symbols = [f'S{i:03d}' for i in range(40)]
+    single = run_partitioned(build, [_store(40, 50)], symbols, 1e5, n_shards=1)
+    sharded = run_partitioned(
+        build, [_store(40, 50)], symbols, 1e5, n_shards=4, max_workers=2,
+    )
+
+    assert len(sharded.shards) == 4
+    np.testing.assert_array_equal(sharded.timestamps, single.timestamps)
+    assert sharded.fills == single.fills
+    np.testing.assert_allclose(sharded.equity, single.equity, rtol=1e-12)
+    np.testing.assert_array_equal(sharded.traded, single.traded)
+    np.testing.assert_allclose(sharded.costs, single.costs, rtol=1e-12)
+    assert sharded.metrics.periods == 50
+    assert sharded.metrics.turnover == single.metrics.turnover
+
+
+def _plain_run(store) -> tuple[list[FillEvent], float]:
+    strategy, portfolio, execution = build()
+    recording = []
+    on_market = execution.on_market
+
+    def record(event):
+        fills = on_market(event)
+        recording.extend(fills)
+        return fills
+
+    execution.on_market = record
+    sequencer = EventSequencer(SimulationClock(datetime(2000, 1, 1)), [store])
+    sequencer.set_processor(MbteProcessor(strategy, portfolio, execution))
+    sequencer.run()
+    fills = sorted(recording, key=lambda fill: (fill.timestamp, fill.symbol))
+    return fills, portfolio.equity() # type: ignore
+
+
+def test_sharded_run_matches_plain_run():
+    symbols = [f'S{i:03d}' for i in range(40)]
+    sharded = run_partitioned(build, [_store(40, 50)], symbols, 1e5, n_shards=4, max_workers=2)
+    fills, equity = _plain_run(_store(40, 50))
+
+    assert len(fills) > 0
+    assert sharded.fills == fills
+    assert sharded.equity[-1] == pytest.approx(1e5 + equity, rel=1e-12)
+
+
+def gbm_stores() -> list[GBMStore]:
+    return [GBMStore(n_bars=60, seed=3, symbols=[f'G{i}' for i in range(6)], chunk_size=16)]
+
+
+def test_sharded_streaming_stores():
+    symbols = [f'G{i}' for i in range(6)]
+    sharded = run_partitioned(build, gbm_stores, symbols, 1e5, n_shards=3, max_workers=2)
+    fills, equity = _plain_run(gbm_stores()[0])
+
+    assert [len(shard.timestamps) for shard in sharded.shards] == [60, 60, 60]
+    assert len(fills) > 0
+    assert sharded.fills == fills
+    assert sharded.equity[-1] == pytest.approx(1e5 + equity, rel=1e-12)
+
+    with pytest.raises(ValueError, match='cannot be shared'):
+        run_partitioned(build, gbm_stores(), symbols, 1e5, n_shards=3)
+
+
+def test_subset_of_symbols_is_traded():
+    result = run_partitioned(build, [_store(10, 20)], ['S001', 'S007'], 1e5, n_shards=2)
+    assert {fill.symbol for fill in result.fills} <= {'S001', 'S007'}
+    assert [shard.symbols for shard in result.shards] == [['S001'], ['S007']]
+
+
+def test_rejects_dependent_strategy():
+    with pytest.raises(ValueError, match='not symbol independent'):
+        run_partitioned(build_cross_sectional, [_store(4, 5)], ['S000', 'S001'], 1e5, n_shards=1)
+
+
+def test_merge_carries_shards_forward():
+    a = run_partitioned(build, [_store(3, 10)], ['S000'], 1e5, n_shards=1).shards[0]
+    empty = a._replace(
+        symbols=['X'],
+        timestamps=a.timestamps[5:],
+        equity=np.full(5, 7.0),
+        traded=np.zeros(5),
+        costs=np.zeros(5),
+        initial_equity=5.0,
+        fills=[],
+    )
+    merged = merge_shards([a, empty], 1e5)
+    np.testing.assert_allclose(merged.equity[:5], 1e5 + a.equity[:5] - a.initial_equity)
+    np.testing.assert_allclose(merged.equity[5:], 1e5 + a.equity[5:] - a.initial_equity + 2.0)
@@ -0,0 +1,150 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from anvil.events import FillEvent, MarketCloseEvent, MarketSliceEvent, SignalEvent
+from anvil.portfolio import ArrayPortfolio
+from anvil.symbols import SymbolTable
+
+T = datetime(2025, 12, 24, 16)
+
+
+def _fill(symbol: str, price: float, qty: float) -> FillEvent:
+    return FillEvent(timestamp=T, symbol=symbol, last_price=price, last_qty=qty) # type: ignore
+
+
+def _slice(symbols: list[str], prices: list[float]) -> MarketSliceEvent:
+    n = len(symbols)
+    return MarketSliceEvent.from_arrays(
+        T, np.array(symbols, dtype=object), np.array(prices), np.ones(n), np.ones(n, dtype=np.int8),
+    )
+
+
+class _DictPortfolio:
+    '''
+    Naive reference accounting, positions and costs in dicts
+    '''
+    def __init__(self, cash: float):
+        self.cash = cash
+        self.lots: dict[str, list[float]] = {}
+        self.prices: dict[str, float] = {}
+
+    def fill(self, symbol: str, price: float, qty: float) -> None:
+        self.cash -= qty * price
+        self.lots.setdefault(symbol, []).append(qty)
+        self.prices[symbol] = price
+
+    def equity(self) -> float:
+        return self.cash + sum(sum(lots) * self.prices[s] for s, lots in self.lots.items())
+
+
+def test_symbol_table():
+    table = SymbolTable(['A', 'B'])
+    assert table.intern('B') == 1
+    assert table.intern('C') == 2
+    assert list(table.ids(np.array(['C', 'A', 'D'], dtype=object))) == [2, 0, 3]
+    assert list(table.ids(np.array(['C', 'A', 'D'], dtype=object))) == [2, 0, 3]
+    assert list(table.ids(['B'])) == [1]
+    assert table.symbol(3) == 'D'
+    assert table.get('E') is None
+    assert 'E' not in table
+    assert len(table) == 4
+
+
+class TestArrayPortfolio:
+    def test_average_cost_and_realized_pnl(self):
+        portfolio = ArrayPortfolio(initial_capital=10_000.0)
+        portfolio.on_fill(_fill('A', 100.0, 10))
+        portfolio.on_fill(_fill('A', 110.0, 10))
+        assert portfolio.position('A') == 20
+        assert portfolio.average_cost('A') == pytest.approx(105.0)
+
+        portfolio.on_fill(_fill('A', 120.0, -5))
+        assert portfolio.realized_pnl() == pytest.approx(75.0)
+        assert portfolio.average_cost('A') == pytest.approx(105.0)
+
+        # closes 15 and opens a short of 10 at the fill price
+        portfolio.on_fill(_fill('A', 90.0, -25))
+        assert portfolio.realized_pnl() == pytest.approx(75.0 - 225.0)
+        assert portfolio.position('A') == -10
+        assert portfolio.average_cost('A') == 90.0
+
+        portfolio.mark('A', 80.0)
+        assert portfolio.unrealized_pnl() == pytest.approx(100.0)
+        assert portfolio.equity() == pytest.approx(10_000.0 - 150.0 + 100.0)
+        assert portfolio.traded() == 50
+
+        portfolio.on_fill(_fill('A', 80.0, 10))
+        assert portfolio.position('A') == 0
+        assert portfolio.average_cost('A') == 0.0
+        assert portfolio.equity() == pytest.approx(10_000.0 + portfolio.realized_pnl())
+
+    def test_orders_for_target_position(self):
+        portfolio = ArrayPortfolio(position_size=100)
+        order = portfolio.on_signal(SignalEvent(timestamp=T, symbol='A', value=1.0))
+        assert order.qty == 100 and order.price is None
+        # pending quantity counts towards the target
+        assert portfolio.on_signal(SignalEvent(timestamp=T, symbol='A', value=1.0)) is None
+
+        portfolio.on_fill(_fill('A', 10.0, 60))
+        order = portfolio.on_signal(SignalEvent(timestamp=T, symbol='A', value=-1.0))
+        assert order.qty == -200
+
+    def test_marks_slices_and_events(self):
+        portfolio = ArrayPortfolio(initial_capital=1000.0)
+        portfolio.on_fill(_fill('A', 10.0, 5))
+        portfolio.on_fill(_fill('B', 20.0, -2))
+        portfolio.on_market(_slice(['A', 'B', 'C'], [11.0, 19.0, 5.0]))
+        assert portfolio.equity() == pytest.approx(1000.0 + 5 + 2)
+        portfolio.on_market(MarketCloseEvent(timestamp=T, symbol='A', price=12.0, volume=1.0))
+        assert portfolio.equity() == pytest.approx(1000.0 + 10 + 2)
+        assert portfolio.symbols().symbols() == ['A', 'B', 'C']
+        assert list(portfolio.positions()) == [5, -2, 0]
+
+    def test_matches_dict_reference(self):
+        rng = np.random.default_rng(0)
+        symbols = [f'S{i}' for i in range(300)]
+        # capacity below the universe exercises growth
+        portfolio = ArrayPortfolio(initial_capital=1e6, capacity=16)
+        reference = _DictPortfolio(1e6)
+        for _ in range(20):
+            for i in rng.choice(len(symbols), size=50):
+                price = float(rng.uniform(50, 150))
+                qty = float(rng.integers(-10, 11))
+                portfolio.on_fill(_fill(symbols[i], price, qty))
+                if qty != 0:
+                    reference.fill(symbols[i], price, qty)
+            prices = rng.uniform(50, 150, size=len(symbols))
+            portfolio.on_market(_slice(symbols, prices.tolist()))
+            reference.prices.update(zip(symbols, prices.tolist()))
+            assert portfolio.equity() == pytest.approx(reference.equity(), rel=1e-12)
+            assert portfolio.realized_pnl() + portfolio.unrealized_pnl() == pytest.approx(
+                reference.equity() - 1e6, rel=1e-9,
+            )
+
+    def test_grows_on_market_events_and_marks(self):
+        portfolio = ArrayPortfolio(capacity=1)
+        portfolio.on_fill(_fill('A', 10.0, 1))
+        portfolio.on_market(MarketCloseEvent(timestamp=T, symbol='B', price=20.0, volume=1.0))
+        portfolio.mark('C', 30.0)
+        portfolio.on_fill(_fill('B', 20.0, 1))
+        portfolio.on_fill(_fill('C', 30.0, 1))
+        portfolio.mark('B', 21.0)
+        assert portfolio.equity() == pytest.approx(-60.0 + 10.0 + 21.0 + 30.0)
+
+    def test_state_roundtrip(self):
+        portfolio = ArrayPortfolio(initial_capital=100.0, capacity=2)
+        for i, symbol in enumerate('ABCD'):
+            portfolio.on_fill(_fill(symbol, 10.0 + i, i + 1))
+        portfolio.mark('A', 12.0)
+        state = portfolio.get_state()
+
+        restored = ArrayPortfolio(capacity=2)
+        restored.set_state(state)
+        assert restored.equity() == portfolio.equity()
+        assert restored.position('D') == 4
+        assert restored.average_cost('C') == 12.0
+
+        with pytest.raises(ValueError):
+            ArrayPortfolio(symbols=SymbolTable(['X'])).set_state(state)
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+import gc
+import threading
+
+import numpy as np
+import pytest
+
+from anvil.clock import SimulationClock
+from anvil.event_processing import ArrayEventStore, EventSequencer
+from anvil.events import Event, MarketCloseEvent
+from anvil.prefetch import PrefetchingEventStore
+from helpers import drain
+from test_event_processing import MockEventStore, MockStandardEventProcessor, TestBatchedSequencing
+
+
+class MockCountingEventStore(MockEventStore):
+    '''
+    Records how far it has been read and can fail part way through
+    '''
+    def __init__(self, name: str, events: list[Event], fail_at: int | None = None):
+        super().__init__(name, events)
+        self._fail_at = fail_at
+        self.thread_names: set[str] = set()
+
+    def peek(self) -> Event | None:
+        self.thread_names.add(threading.current_thread().name)
+        if self._fail_at is not None and self.get_index() >= self._fail_at:
+            raise IOError('corrupt input')
+        return super().peek()
+
+
+def _get_events(n: int, symbol: str = 'SPY') -> list[Event]:
+    start = datetime(2025, 12, 24, 9, 30)
+    return [
+        MarketCloseEvent(
+            timestamp=start + timedelta(seconds=i), 
+            symbol=symbol, 
+            price=float(i), 
+            volume=1.0,
+        )
+        for i in range(n)
+    ]
+
+
+class TestPrefetchingEventStore(object):
+    @pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+    def test_same_events(self, chunk_size: int):
+        events = _get_events(100)
+        with PrefetchingEventStore(MockEventStore('md', events), chunk_size=chunk_size) as store:
+            assert store.name() == 'md'
+            assert store.peek() == events[0]
+            assert store.peek_ns() == 1766568600 * 1_000_000_000
+            assert drain(store) == events
+            assert store.peek() is None
+            assert store.peek_batch(max_count=10) == []
+
+    def test_reads_on_background_thread(self):
+        source = MockCountingEventStore('md', _get_events(10))
+        with PrefetchingEventStore(source, chunk_size=3) as store:
+            drain(store)
+        assert source.thread_names == {'prefetch-md'}
+
+    def test_bounded_read_ahead(self):
+        source = MockCountingEventStore('md', _get_events(1000))
+        with PrefetchingEventStore(source, chunk_size=10, max_chunks=2) as store:
+            store.peek()
+            threading.Event().wait(0.2)
+            # the current chunk, two queued and one waiting to be queued
+            assert source.get_index() <= 40
+        assert source.get_index() < 1000
+
+    def test_batches(self):
+        events = _get_events(20)
+        with PrefetchingEventStore(MockEventStore('md', events), chunk_size=8) as store:
+            assert store.peek_batch(until=events[3].timestamp, max_count=10) == events[:3]
+            assert store.peek_batch(max_count=20) == events[:8]
+            assert store.pop_batch(10) == 10
+            assert store.peek() == events[10]
+            assert store.pop_batch(100) == 10
+            assert store.peek() is None
+
+    def test_failure_is_raised_by_consumer(self):
+        source = MockCountingEventStore('md', _get_events(20), fail_at=12)
+        with PrefetchingEventStore(source, chunk_size=5) as store:
+            assert store.pop_batch(10) == 10
+            with pytest.raises(IOError):
+                store.pop_batch(10)
+
+    def test_close_stops_thread(self):
+        store = PrefetchingEventStore(
+            MockEventStore('md', _get_events(1000)), chunk_size=1, max_chunks=1,
+        )
+        store.peek()
+        store.close()
+        assert not store._thread.is_alive()
+        assert store.peek() is None
+
+    def test_abandoned_store_stops_thread(self):
+        store = PrefetchingEventStore(
+            MockEventStore('md', _get_events(1000)), chunk_size=1, max_chunks=1,
+        )
+        store.peek()
+        thread = store._thread
+        del store
+        gc.collect()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+    @pytest.mark.parametrize('time_ns', [False, True])
+    def test_sequencer_run_matches(self, time_ns: bool):
+        def run(prefetch: bool) -> list[Event]:
+            stores = TestBatchedSequencing()._get_stores()
+            if prefetch:
+                stores = [PrefetchingEventStore(store, chunk_size=16) for store in stores]
+            sequencer = EventSequencer(
+                sim_clock=SimulationClock(datetime(2025, 12, 24)),
+                event_stores=stores,
+                time_ns=time_ns,
+            )
+            event_processor = MockStandardEventProcessor()
+            sequencer.set_processor(event_processor)
+            sequencer.run()
+            return event_processor.get_processed_events()
+
+        assert run(prefetch=True) == run(prefetch=False)
+
+    def test_seek(self):
+        events = _get_events(100)
+        with PrefetchingEventStore(MockEventStore('md', events), chunk_size=8) as store:
+            store.seek(events[42].timestamp)
+            assert store.peek() == events[42]
+            store.seek(events[0].timestamp)
+            assert store.peek() == events[42]
+            store.seek(events[-1].timestamp + timedelta(seconds=1))
+            assert store.peek() is None
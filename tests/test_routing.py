@@ -0,0 +1,153 @@
+from datetime import datetime
+
+import numpy as np
+
+from anvil.clock import SimulationClock
+from anvil.core import MbteProcessor, Strategy
+from anvil.event_processing import ArrayEventStore, EventSequencer
+from anvil.events import (
+    Event,
+    InternalSchedulingEvent,
+    MarketCloseEvent,
+    MarketOpenEvent,
+    MarketSliceEvent,
+    SignalEvent,
+)
+from anvil.loader import ChunkedEventStore
+from anvil.routing import Subscription, SubscriptionRouter
+
+from helpers import drain
+from test_event_processing import MockStandardEventProcessor
+from test_instrumentation import MockExecution, MockPortfolio
+
+SYMBOLS = ['AAPL', 'MSFT', 'SPY', 'QQQ']
+T = datetime(2025, 12, 24, 16)
+
+
+def _get_store(n_bars: int = 5) -> ArrayEventStore:
+    n = n_bars * len(SYMBOLS)
+    return ArrayEventStore.from_columns(
+        'universe',
+        timestamps=np.repeat(
+            np.datetime64('2025-12-24T09:30', 'ns') + np.arange(n_bars) * np.timedelta64(1, 'm'),
+            len(SYMBOLS),
+        ),
+        symbols=SYMBOLS * n_bars,
+        prices=np.arange(n, dtype=np.float64),
+        volumes=np.ones(n),
+        kinds=np.tile(np.array([0, 1], dtype=np.int8), n // 2),
+    )
+
+
+class MockSymbolStrategy(Strategy):
+    def __init__(self, *symbols: str):
+        self.symbols = symbols
+        self.events: list[Event] = []
+
+    def subscription(self) -> Subscription:
+        return Subscription.of(MarketCloseEvent, symbols=self.symbols)
+
+    def on_event(self, event: Event) -> SignalEvent | None:
+        self.events.append(event)
+        return SignalEvent(timestamp=event.timestamp, symbol=event.symbol, value=1.0)
+
+
+def test_subscription():
+    assert Subscription.of().matches(InternalSchedulingEvent(timestamp=T, symbol='X'))
+    close = MarketCloseEvent(timestamp=T, symbol='SPY', price=1.0, volume=1.0)
+    subscription = Subscription.of(MarketCloseEvent, MarketOpenEvent, symbols=['SPY'])
+    assert subscription.matches(close)
+    assert not subscription.matches(InternalSchedulingEvent(timestamp=T, symbol='SPY'))
+    assert not subscription.matches(MarketCloseEvent(timestamp=T, symbol='QQQ', price=1.0, volume=1.0))
+
+
+def test_routes_by_type_and_symbol():
+    router = SubscriptionRouter()
+    spy = MockStandardEventProcessor()
+    closes = MockStandardEventProcessor()
+    everything: list[Event] = []
+    router.subscribe(spy, Subscription.of(symbols=['SPY']))
+    router.subscribe(closes, Subscription.of(MarketCloseEvent))
+    router.subscribe(everything.append)
+
+    events = [
+        MarketCloseEvent(timestamp=T, symbol='SPY', price=1.0, volume=1.0),
+        MarketOpenEvent(timestamp=T, symbol='SPY', price=1.0, volume=1.0),
+        MarketCloseEvent(timestamp=T, symbol='QQQ', price=1.0, volume=1.0),
+        InternalSchedulingEvent(timestamp=T, symbol='QQQ'),
+    ]
+    for event in events:
+        router.process(event)
+    assert spy.get_processed_events() == events[:2]
+    assert closes.get_processed_events() == [events[0], events[2]]
+    assert everything == events
+    assert router.dropped() == 0
+
+
+def test_drops_unsubscribed_events():
+    router = SubscriptionRouter()
+    spy = MockStandardEventProcessor()
+    router.subscribe(spy, Subscription.of(MarketCloseEvent, symbols=['SPY']))
+    for symbol in SYMBOLS * 3:
+        router.process(MarketCloseEvent(timestamp=T, symbol=symbol, price=1.0, volume=1.0))
+    assert len(spy.get_processed_events()) == 3
+    assert router.dropped() == 9
+    assert router.interest() == (frozenset(['SPY']), (MarketCloseEvent,))
+
+
+def test_strategies_share_one_run():
+    msft = MockSymbolStrategy('MSFT')
+    index = MockSymbolStrategy('SPY', 'QQQ')
+    executions = [MockExecution(), MockExecution()]
+    router = SubscriptionRouter()
+    router.subscribe(MbteProcessor(msft, MockPortfolio(), executions[0]))
+    router.subscribe(MbteProcessor(index, MockPortfolio(), executions[1]))
+
+    store = _get_store()
+    expected = [event for event in store.peek_batch(None, 100) if isinstance(event, MarketCloseEvent)]
+    stores = router.select([store])
+    sequencer = EventSequencer(SimulationClock(datetime(2025, 12, 24)), stores)
+    sequencer.set_processor(router)
+    sequencer.run()
+
+    assert msft.events == [e for e in expected if e.symbol == 'MSFT']
+    assert index.events == [e for e in expected if e.symbol in ('SPY', 'QQQ')]
+    assert len(index.events) == 5
+    assert [o.symbol for o in executions[0].orders] == ['MSFT'] * 5
+    # AAPL rows and all opens were never built
+    assert len(stores[0]) == 10
+    assert router.dropped() == 0
+
+
+def test_slices_are_cut_per_subscriber():
+    aapl = MockStandardEventProcessor()
+    opens = MockStandardEventProcessor()
+    whole = MockStandardEventProcessor()
+    nobody = MockStandardEventProcessor()
+    router = SubscriptionRouter()
+    router.subscribe(aapl, Subscription.of(MarketCloseEvent, symbols=['AAPL', 'MSFT']))
+    router.subscribe(opens, Subscription.of(MarketOpenEvent))
+    router.subscribe(whole, Subscription.of(MarketSliceEvent))
+    router.subscribe(nobody, Subscription.of(MarketCloseEvent, symbols=['XYZ']))
+
+    sequencer = EventSequencer(SimulationClock(datetime(2025, 12, 24)), [_get_store()], slices=True)
+    sequencer.set_processor(router)
+    sequencer.run()
+
+    assert len(whole.get_processed_events()) == 5
+    assert all(len(s) == 4 for s in whole.get_processed_events())
+    for s in aapl.get_processed_events():
+        assert list(s.symbols) == ['MSFT'] and list(s.kinds) == [1]
+    for s in opens.get_processed_events():
+        assert list(s.symbols) == ['AAPL', 'SPY']
+    assert len(aapl.get_processed_events()) == len(opens.get_processed_events()) == 5
+    assert nobody.get_processed_events() == []
+
+
+def test_select_chunked_store():
+    chunks = [_get_store(2), _get_store(2)]
+    store = ChunkedEventStore('chunks', chunks)
+    store.pop()
+    selected = store.select(['SPY'], [MarketOpenEvent])
+    events = drain(selected)
+    assert [(type(e), e.symbol) for e in events] == [(MarketOpenEvent, 'SPY')] * 4
@@ -0,0 +1,180 @@
+from pathlib import Path
+import threading
+import time
+from typing import Any, Mapping
+
+import numpy as np
+import pytest
+
+from anvil.core import Execution, Portfolio, Strategy
+from anvil.execution import ExecutionSimulator
+from anvil.portfolio import ArrayPortfolio
+from anvil.sweep import (
+    EventDrivenBacktest,
+    SharedArrays,
+    attach_shared_arrays,
+    parameter_grid,
+    run_sweep,
+)
+from anvil.vectorized import CostModel, run_vectorized
+from helpers import Momentum, random_walk
+
+
+def _momentum(prices: np.ndarray, window: int) -> np.ndarray:
+    signal = np.zeros(len(prices))
+    signal[window:] = np.sign(prices[window:] - prices[:-window])
+    return signal
+
+
+def momentum_backtest(params: Mapping[str, Any], data: Mapping[str, np.ndarray]):
+    noise = np.random.default_rng(params['seed']).normal(0.0, 1e-9, size=len(data['prices']))
+    return run_vectorized(
+        data['prices'] + noise,
+        lambda prices: _momentum(prices, params['window']),
+        costs=CostModel(commission=params['commission']),
+    ).metrics
+
+
+def build_momentum(params: Mapping[str, Any]) -> tuple[Strategy, Portfolio, Execution]:
+    return (
+        Momentum(params['window']),
+        ArrayPortfolio(initial_capital=1e5, position_size=10.0),
+        ExecutionSimulator(CostModel(commission=params['commission'])),
+    )
+
+
+def failing_backtest(params: Mapping[str, Any], data: Mapping[str, np.ndarray]):
+    with open(params['log'], 'a') as f:
+        f.write(f'{params["window"]}\n')
+    if params['window'] == 0:
+        raise RuntimeError('bad window')
+    time.sleep(0.05)
+    return {'window': params['window']}
+
+
+def slow_failing_backtest(params: Mapping[str, Any], data: Mapping[str, np.ndarray]):
+    time.sleep(params['sleep'])
+    if params['fail']:
+        raise RuntimeError('late failure')
+    return {'sleep': params['sleep']}
+
+
+def _bars(n_symbols: int, n_days: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(0)
+    symbols = np.array([f'S{i}' for i in range(n_symbols)])
+    days = np.datetime64('2025-01-02', 'ns') + np.arange(n_days) * np.timedelta64(1, 'D')
+    return {
+        'timestamps': np.repeat(days, n_symbols).astype(np.int64),
+        'symbols': np.tile(symbols, n_days),
+        'prices': (100.0 + np.cumsum(rng.normal(size=(n_days, n_symbols)), axis=0)).ravel(),
+        'volumes': np.ones(n_days * n_symbols),
+    }
+
+
+def test_parameter_grid():
+    assert parameter_grid(a=[1, 2], b=['x', 'y']) == [
+        {'a': 1, 'b': 'x'},
+        {'a': 1, 'b': 'y'},
+        {'a': 2, 'b': 'x'},
+        {'a': 2, 'b': 'y'},
+    ]
+
+
+def test_shared_arrays():
+    prices = np.arange(10.0)
+    with SharedArrays({'prices': prices}) as shared:
+        arrays, segments = attach_shared_arrays(shared.specs())
+        np.testing.assert_array_equal(arrays['prices'], prices)
+        assert not arrays['prices'].flags.writeable
+        del arrays
+        for segment in segments:
+            segment.close()
+
+
+def test_run_sweep_is_deterministic():
+    prices = random_walk(2000, seed=0)
+    grid = parameter_grid(window=[5, 10, 20], commission=[0.0, 0.001])
+    progress: list[tuple[int, int]] = []
+
+    table = run_sweep(
+        momentum_backtest,
+        grid,
+        data={'prices': prices},
+        max_workers=2,
+        seed=42,
+        progress=lambda done, total: progress.append((done, total)),
+    )
+    assert list(table.index) == list(range(6))
+    assert list(table['window']) == [5, 5, 10, 10, 20, 20]
+    assert progress[-1] == (6, 6)
+    assert not table.attrs['cancelled']
+
+    # same as running serially in process, and across repeated sweeps
+    for i, params in enumerate(grid):
+        params = {**params, 'seed': table.loc[i, 'seed']}
+        expected = momentum_backtest(params, {'prices': prices})
+        assert table.loc[i, 'sharpe'] == expected.sharpe
+    again = run_sweep(momentum_backtest, grid, data={'prices': prices}, max_workers=3, seed=42)
+    assert again.equals(table)
+
+
+def test_run_sweep_cancel():
+    prices = random_walk(2000, seed=0)
+    grid = parameter_grid(window=list(range(1, 41)), commission=[0.0])
+    cancel = threading.Event()
+
+    table = run_sweep(
+        momentum_backtest,
+        grid,
+        data={'prices': prices},
+        max_workers=1,
+        seed=1,
+        progress=lambda done, total: cancel.set(),
+        cancel=cancel,
+    )
+    assert table.attrs['cancelled']
+    assert 1 <= len(table) < len(grid)
+
+
+def test_run_sweep_event_driven():
+    data = _bars(5, 60)
+    grid = parameter_grid(window=[3, 10], commission=[0.0, 0.01])
+    backtest = EventDrivenBacktest(build_momentum, initial_capital=1e5)
+
+    table = run_sweep(backtest, grid, data=data, max_workers=2)
+    assert list(table['window']) == [3, 3, 10, 10]
+    assert (table['turnover'] > 0).all()
+    for i, params in enumerate(grid):
+        assert table.loc[i, 'sharpe'] == backtest(params, data).sharpe
+    # commissions only ever cost money
+    assert table.loc[1, 'total_pnl'] < table.loc[0, 'total_pnl']
+
+
+def test_run_sweep_failure_cancels_pending_runs(tmp_path: Path):
+    log = tmp_path / 'runs.log'
+    grid = parameter_grid(window=list(range(40)), log=[str(log)])
+
+    with pytest.raises(RuntimeError, match='bad window'):
+        run_sweep(failing_backtest, grid, data={'prices': np.zeros(1)}, max_workers=1)
+    assert len(log.read_text().splitlines()) < len(grid)
+
+
+def test_run_sweep_cancel_ignores_failures_of_started_runs():
+    grid = [{'sleep': 0.05, 'fail': False}, {'sleep': 0.5, 'fail': True}]
+    cancel = threading.Event()
+
+    table = run_sweep(
+        slow_failing_backtest,
+        grid,
+        data={'prices': np.zeros(1)},
+        max_workers=2,
+        progress=lambda done, total: cancel.set(),
+        cancel=cancel,
+    )
+    assert table.attrs['cancelled']
+    assert list(table.index) == [0]
+
+
+def test_shared_arrays_reject_objects():
+    with pytest.raises(ValueError, match='objects'):
+        SharedArrays({'symbols': np.array(['SPY', None], dtype=object)})
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from anvil.clock import SimulationClock
+from anvil.core import MbteProcessor, Strategy
+from anvil.event_processing import EventSequencer, EventStore
+from anvil.events import Event, MarketCloseEvent, SignalEvent
+from anvil.execution import ExecutionSimulator
+from anvil.indicators import SMA
+from anvil.portfolio import ArrayPortfolio
+from anvil.synthetic import GBMStore, JumpModel, RandomWalkStore, VolumeModel
+from anvil.vectorized import CostModel, run_vectorized
+
+COSTS = CostModel(fixed_slippage=0.01, proportional_slippage=0.0005, commission=0.0002)
+
+
+def _drain_slices(store: EventStore) -> tuple[np.ndarray, list[str], np.ndarray, np.ndarray]:
+    timestamps, symbols, prices, volumes = [], [], [], []
+    while (bar := store.pop_slice()) is not None:
+        timestamps.append(bar.timestamp)
+        symbols.extend(bar.symbols.tolist())
+        prices.append(bar.prices)
+        volumes.append(bar.volumes)
+    return np.array(timestamps), symbols, np.concatenate(prices), np.concatenate(volumes)
+
+
+def _path(store: RandomWalkStore | GBMStore) -> np.ndarray:
+    return np.concatenate([block.prices for block in store.blocks()])
+
+
+def test_same_seed_same_stream_whatever_the_chunk_size():
+    kwargs = dict(
+        symbols=['A', 'B', 'C'],
+        jumps=JumpModel(0.05, std=3.0),
+        volume=VolumeModel(1000.0),
+        block_size=64,
+    )
+    small = _drain_slices(RandomWalkStore(1000, seed=3, chunk_size=7, **kwargs)) # type: ignore
+    large = _drain_slices(RandomWalkStore(1000, seed=3, chunk_size=10_000, **kwargs)) # type: ignore
+    np.testing.assert_array_equal(small[0], large[0])
+    assert small[1] == large[1] == ['A', 'B', 'C'] * 1000
+    np.testing.assert_array_equal(small[2], large[2])
+    np.testing.assert_array_equal(small[3], large[3])
+
+    other = _drain_slices(RandomWalkStore(1000, seed=4, chunk_size=7, **kwargs)) # type: ignore
+    assert not np.array_equal(small[2], other[2])
+
+
+def test_events_follow_the_blocks():
+    store = GBMStore(500, seed=1, symbols=['X', 'Y'], start=datetime(2024, 1, 2),
+                     interval=timedelta(minutes=1), block_size=100, chunk_size=33)
+    path = _path(store)
+    assert path.shape == (500, 2)
+    assert store.peek() == MarketCloseEvent(
+        timestamp=datetime(2024, 1, 2), symbol='X', price=path[0, 0], volume=0.0,
+    )
+    timestamps, _, prices, _ = _drain_slices(store)
+    np.testing.assert_array_equal(prices, path.ravel())
+    assert timestamps[-1] == datetime(2024, 1, 2) + timedelta(minutes=499)
+
+
+def test_fingerprint_covers_the_parameters():
+    store = RandomWalkStore(100, seed=1)
+    assert store.fingerprint() == RandomWalkStore(100, seed=1, chunk_size=5).fingerprint()
+    assert store.fingerprint() != RandomWalkStore(100, seed=2).fingerprint()
+    assert store.fingerprint() != RandomWalkStore(100, seed=1, volatility=2.0).fingerprint()
+    assert store.fingerprint() != GBMStore(100, seed=1).fingerprint()
+    assert store.fingerprint() != RandomWalkStore(100, seed=1, block_size=10).fingerprint()
+
+
+def test_model_moments():
+    n = 200_000
+    walk = _path(RandomWalkStore(n, seed=5, drift=0.01, volatility=2.0))[:, 0]
+    steps = np.diff(walk)
+    assert np.mean(steps) == pytest.approx(0.01, abs=0.02)
+    assert np.std(steps) == pytest.approx(2.0, rel=0.01)
+
+    gbm = _path(GBMStore(n, seed=5, volatility=0.01))[:, 0]
+    assert np.all(gbm > 0)
+    assert np.std(np.diff(np.log(gbm))) == pytest.approx(0.01, rel=0.01)
+
+    jumpy = np.diff(_path(RandomWalkStore(n, seed=5, jumps=JumpModel(0.01, std=20.0)))[:, 0])
+    # fat tails: far more moves beyond 6 sigma of the diffusion
+    assert np.sum(np.abs(jumpy) > 6.0) > 100
+    assert np.sum(np.abs(steps - 0.01) > 12.0) == 0
+
+    store = RandomWalkStore(n, seed=5, volume=VolumeModel(500.0, dispersion=0.3))
+    volumes = np.concatenate([block.volumes for block in store.blocks()])
+    assert np.all(volumes > 0)
+    assert np.mean(volumes) == pytest.approx(500.0, rel=0.01)
+
+
+def test_memory_is_bounded_by_the_block():
+    store = RandomWalkStore(1_000_000, seed=0, block_size=1 << 14, chunk_size=1 << 12)
+    tracemalloc.start()
+    try:
+        while store.pop_batch(1 << 16):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # the whole path would take 8 MB of prices alone
+    assert peak < 4 << 20
+
+
+##################### README validation tests #####################
+
+class ConstantStrategy(Strategy):
+    def __init__(self, value: float):
+        self._value = value
+
+    def on_event(self, event: Event) -> SignalEvent | None:
+        return SignalEvent(timestamp=event.timestamp, symbol=event.symbol, value=self._value)
+
+
+def test_zero_signal_event_driven():
+    store = RandomWalkStore(20_000, seed=11, symbols=['A', 'B'])
+    portfolio = ArrayPortfolio(initial_capital=1e6)
+    execution = ExecutionSimulator(COSTS)
+    sequencer = EventSequencer(SimulationClock(store.peek().timestamp), [store]) # type: ignore
+    sequencer.set_processor(MbteProcessor(ConstantStrategy(0.0), portfolio, execution))
+    sequencer.run()
+    assert portfolio.equity() == 1e6
+    assert execution.costs() == 0.0
+    assert execution.traded() == 0.0
+
+
+def _blockwise(store: GBMStore, signal_fn) -> tuple[float, float]: # type: ignore
+    '''
+    Total P&L and Sharpe of signal_fn, run block by block
+    '''
+    pnl = 0.0
+    sharpes = []
+    for block in store.blocks():
+        result = run_vectorized(block.prices[:, 0], signal_fn, costs=COSTS, initial_capital=1e6)
+        pnl += result.metrics.total_pnl
+        sharpes.append(result.metrics.sharpe)
+    return pnl, float(np.mean(sharpes))
+
+
+def test_random_signal_loses_after_costs():
+    store = GBMStore(1_000_000, seed=12, block_size=100_000)
+    rng = np.random.default_rng(12)
+    pnl, sharpe = _blockwise(store, lambda prices: rng.choice([-1.0, 1.0], size=len(prices)))
+    assert pnl < 0
+    assert sharpe < 0
+
+
+def test_moving_average_crossover_has_no_alpha_on_a_random_walk():
+    def crossover(prices: np.ndarray) -> np.ndarray:
+        fast, slow = SMA(10), SMA(50)
+        signal = np.zeros(len(prices))
+        for i, price in enumerate(prices):
+            f, s = fast.update(price), slow.update(price)
+            if not np.isnan(s):
+                signal[i] = 1.0 if f > s else -1.0
+        return signal
+
+    store = GBMStore(400_000, seed=13, block_size=100_000)
+    pnl, sharpe = _blockwise(store, crossover)
+    assert sharpe < 0.3
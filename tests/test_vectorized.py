@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from anvil.vectorized import CostModel, check_equivalence, run_vectorized
+from helpers import random_walk
+
+COSTS = CostModel(fixed_slippage=0.01, proportional_slippage=0.0005, commission=0.0001)
+
+
+def _moving_average(prices: np.ndarray, window: int) -> np.ndarray:
+    sums = np.cumsum(np.concatenate(([0.0], prices)))
+    ma = np.full(len(prices), np.nan)
+    ma[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return ma
+
+
+def ma_crossover(prices: np.ndarray, fast: int = 5, slow: int = 20) -> np.ndarray:
+    fast_ma = _moving_average(prices, fast)
+    slow_ma = _moving_average(prices, slow)
+    signal = np.sign(fast_ma - slow_ma)
+    return np.nan_to_num(signal)
+
+
+def zero_signal(prices: np.ndarray) -> np.ndarray:
+    return np.zeros(len(prices))
+
+
+def look_ahead(prices: np.ndarray) -> np.ndarray:
+    # uses the next bar's price change, a leak
+    signal = np.zeros(len(prices))
+    signal[:-1] = np.sign(np.diff(prices))
+    return signal
+
+
+class TestVectorized(object):
+    def test_zero_signal(self):
+        result = run_vectorized(random_walk(1000, 1), zero_signal, costs=COSTS)
+        assert result.metrics.total_pnl == 0
+        assert result.metrics.total_costs == 0
+        assert result.metrics.sharpe == 0
+        assert result.metrics.turnover == 0
+        assert result.metrics.max_drawdown == 0
+
+    def test_random_signal_loses_after_costs(self):
+        prices = random_walk(20000, 2)
+        rng = np.random.default_rng(3)
+        signals = rng.choice([-1.0, 1.0], size=len(prices))
+        result = run_vectorized(prices, lambda _: signals, costs=COSTS)
+        assert result.metrics.total_pnl < 0
+        assert result.metrics.sharpe < 0.5
+
+    def test_ma_crossover_onrandom_walk(self):
+        sharpes = [
+            run_vectorized(random_walk(5000, seed), ma_crossover, costs=COSTS).metrics.sharpe
+            for seed in range(10)
+        ]
+        # no persistent alpha on a pure random walk
+        assert np.mean(sharpes) < 0.5
+
+    def test_lag(self):
+        prices = np.array([10.0, 11.0, 12.0, 11.0])
+        result = run_vectorized(prices, lambda p: np.ones(len(p)), lag=2)
+        np.testing.assert_array_equal(result.positions, [0, 0, 1, 1])
+        np.testing.assert_array_equal(result.pnl, [0, 0, 0, -1])
+        with pytest.raises(ValueError):
+            run_vectorized(prices, zero_signal, lag=0)
+
+    @pytest.mark.parametrize('lag', [1, 3])
+    def test_matches_event_path(self, lag: int):
+        report = check_equivalence(
+            random_walk(300, 4), 
+            ma_crossover, 
+            lag=lag, 
+            position_size=10.0, 
+            costs=COSTS,
+        )
+        assert report.matches, report.max_abs_diff
+        assert report.vectorized.metrics.turnover > 0
+
+    def test_detects_look_ahead(self):
+        report = check_equivalence(random_walk(100, 5), look_ahead)
+        assert not report.matches